@@ -0,0 +1,8 @@
+'''
+Offline benchmark suite for the Pitch Deck Generator backend.
+
+mock_llm.py is a local OpenAI-compatible server with configurable latency, token rate,
+error rate and streaming; loadgen.py drives every route of main.py against it and reports
+latency percentiles, throughput, memory and cache hit rates as JSON. Run it with
+`python -m benchmark` from apps/backend (see __main__.py).
+'''
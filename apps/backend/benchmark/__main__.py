@@ -0,0 +1,155 @@
+'''
+Runs the end-to-end benchmark and writes a JSON report.
+
+By default it starts the mock OpenAI server and the backend (each with uvicorn, on free local
+ports, with a throwaway user store and export directory), drives every route, then stops both:
+
+    cd apps/backend
+    python -m benchmark --duration 30 --concurrency 20 --output bench.json
+    python -m benchmark --duration 30 --concurrency 20 --compare bench.json  # exits 1 on a regression
+
+Use --backend-url to benchmark a server that is already running instead.
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import httpx
+
+from benchmark import mock_llm
+from benchmark.loadgen import Workload, compare, run_load, select_routes
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} during startup")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not start within {timeout}s")
+
+
+def start_process(args, env: Optional[Dict[str, str]] = None, cwd: str = BACKEND_DIR) -> subprocess.Popen:
+    # Child output goes to stderr so it never mixes with the JSON report on stdout.
+    return subprocess.Popen([sys.executable, *args], cwd=cwd, env={**os.environ, **(env or {})}, stdout=sys.stderr)
+
+
+def stop_process(process: Optional[subprocess.Popen]):
+    if process is not None and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark for the Pitch Deck Generator backend")
+    parser.add_argument("--backend-url", help="Benchmark an already running backend instead of starting one")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Unmeasured seconds before the run")
+    parser.add_argument("--routes", help="Comma-separated route names to drive (default: all)")
+    parser.add_argument("--unique-ratio", type=float, default=0.5, help="Share of AI requests with a new payload (cache misses)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started backend")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown before a metric counts as a regression")
+    mock_llm.add_arguments(parser)
+    args = parser.parse_args()
+
+    mock = backend = None
+    base_url = args.backend_url
+    with tempfile.TemporaryDirectory(prefix="pitchdeck-bench-") as workdir:
+        try:
+            if not base_url:
+                mock_port, backend_port = free_port(), free_port()
+                mock = start_process([
+                    "-m", "benchmark.mock_llm", "--port", str(mock_port),
+                    "--latency-ms", str(args.latency_ms), "--latency-sigma", str(args.latency_sigma),
+                    "--tokens-per-second", str(args.tokens_per_second), "--error-rate", str(args.error_rate),
+                    "--rate-limit-rate", str(args.rate_limit_rate), "--seed", str(args.seed),
+                ])
+                wait_until_ready(f"http://127.0.0.1:{mock_port}/v1/models", mock)
+                # The backend runs in the temp directory so a legacy user_data.json in apps/backend is never migrated.
+                backend = start_process(
+                    ["-m", "uvicorn", "main:create_app", "--factory", "--app-dir", BACKEND_DIR, "--port", str(backend_port),
+                     "--workers", str(args.workers), "--log-level", "warning"],
+                    env={
+                        "OPENAI_BASE_URL": f"http://127.0.0.1:{mock_port}/v1",
+                        "OPENAI_API_KEY": "mock",
+                        "USER_STORE_PATH": os.path.join(workdir, "user_data.db"),
+                        "EXPORT_DIR": os.path.join(workdir, "exports"),
+                        "CACHE_DB_PATH": os.getenv("CACHE_DB_PATH", ""),
+                    },
+                    cwd=workdir,
+                )
+                base_url = f"http://127.0.0.1:{backend_port}"
+                wait_until_ready(f"{base_url}/cache-stats", backend)
+
+            report = asyncio.run(run_load(
+                base_url,
+                routes=select_routes(args.routes),
+                concurrency=args.concurrency,
+                duration=args.duration,
+                warmup=args.warmup,
+                workload=Workload(unique_ratio=args.unique_ratio, seed=args.seed),
+                backend_pid=backend.pid if backend is not None and args.workers == 1 else None,
+            ))
+        finally:
+            stop_process(backend)
+            stop_process(mock)
+
+    report["meta"] = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "backend_url": args.backend_url or "local",
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "unique_ratio": args.unique_ratio,
+        "mock": None if args.backend_url else vars(mock_llm.settings_from_args(args)),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print(f"Wrote {args.output}: {report['overall']['requests']} requests, {report['overall']['throughput_rps']} req/s, "
+              f"p95 {report['overall']['p95_ms']} ms")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
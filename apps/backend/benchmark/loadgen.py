@@ -0,0 +1,412 @@
+'''
+Load generator for the Pitch Deck Generator backend.
+
+Drives the editor-facing routes in main.py at a fixed concurrency for a fixed duration, picking routes by
+weight. A share of the AI requests reuse a small pool of payloads (cache hits) and the rest are
+unique (cache misses), so cache behaviour looks like real traffic. Reports p50/p95/p99 latency,
+throughput and errors per route, the backend's cache hit rates and (when it runs locally) its memory.
+
+Routes that depend on earlier responses (deck versions and ETags for conditional and delta reads and
+patches, export job ids for polling and downloads, deck context ids for context-based AI calls) use what
+the Workload has seen so far.
+'''
+
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+import httpx
+
+SLIDE_TITLES = ["The Problem", "Our Solution", "Market Opportunity", "Traction", "Business Model", "Team", "Funding Ask"]
+VISUAL_TYPES = ["pie", "bar", "line", "scatter", "table"]
+
+
+@dataclass
+class Route:
+    name: str
+    method: str
+    path: str
+    build: Callable[["Workload"], Dict[str, Any]]  # Returns httpx request kwargs (json, params, headers) and optionally "path".
+    weight: float = 1.0
+    stream: bool = False  # SSE / chunked - time to first byte is recorded as well.
+    # Called with the request kwargs, response and body of successful requests, to keep state later requests build on.
+    observe: Optional[Callable[["Workload", Dict[str, Any], httpx.Response, bytes], None]] = None
+
+
+@dataclass
+class RouteStats:
+    latencies: List[float] = field(default_factory=list)
+    first_byte: List[float] = field(default_factory=list)
+    statuses: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+    bytes: int = 0
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    # Nearest-rank percentile.
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))]
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    # Latency summary in milliseconds.
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+    return {
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "max_ms": ms(max(values)) if values else None,
+    }
+
+
+class Workload:
+    """
+    Builds request payloads. With probability `unique_ratio` a payload is new; otherwise it comes from a small
+    shared pool, so repeated requests exercise the response cache.
+    """
+
+    def __init__(self, unique_ratio: float = 0.5, pool_size: int = 8, users: int = 20, deck_size: int = 13, seed: int = 0):
+        self.unique_ratio = unique_ratio
+        self.pool_size = pool_size
+        self.users = users
+        self.deck_size = deck_size
+        self.random = random.Random(seed)
+        self.decks: Dict[str, Dict[str, Any]] = {}  # user -> last seen {"version", "ids", "etag"}
+        self.export_jobs: Deque[str] = deque(maxlen=50)  # Recently submitted export job ids.
+        self.deck_contexts: Deque[str] = deque(maxlen=50)  # Recently stored deck context ids.
+
+    def topic(self) -> str:
+        if self.random.random() < self.unique_ratio:
+            return f"topic {uuid.uuid4().hex[:10]}"
+        return f"shared topic {self.random.randrange(self.pool_size)}"
+
+    def user_id(self) -> str:
+        return f"bench-user-{self.random.randrange(self.users)}"
+
+    def slides(self, count: Optional[int] = None) -> List[Dict[str, str]]:
+        topic = self.topic()
+        return [
+            {"title": SLIDE_TITLES[i % len(SLIDE_TITLES)], "content": f"{topic}\n- Point one for slide {i}\n- Point two with 42% growth"}
+            for i in range(count or self.deck_size)
+        ]
+
+    def known_user(self) -> str:
+        # A user whose deck has been saved during the run, so versions, ids and ETags are known.
+        return self.random.choice(list(self.decks)) if self.decks else self.user_id()
+
+    def export_job_path(self, suffix: str = "") -> Dict[str, Any]:
+        job_id = self.random.choice(self.export_jobs) if self.export_jobs else "none-yet"  # 404 until a job is submitted.
+        return {"path": f"/export-jobs/{job_id}{suffix}"}
+
+    def deck_context_id(self) -> str:
+        return self.random.choice(self.deck_contexts) if self.deck_contexts else "none-yet"  # 404 until a context is stored.
+
+    def context_slide_request(self) -> Dict[str, Any]:
+        # A per-slide AI request that names a stored deck context instead of sending the deck.
+        return {"contextId": self.deck_context_id(), "slide_title": self.random.choice(SLIDE_TITLES)}
+
+    def slide_request(self) -> Dict[str, Any]:
+        topic = self.topic()
+        return {"problem": f"Problem about {topic}", "solution": f"Solution for {topic}", "slide_title": self.random.choice(SLIDE_TITLES)}
+
+
+def get_slides_request(workload: Workload, delta: bool = False) -> Dict[str, Any]:
+    # Sends If-None-Match when the deck's ETag is known (304 path) and, for delta reads, the last seen version.
+    user = workload.known_user()
+    deck = workload.decks.get(user, {})
+    params: Dict[str, Any] = {"userId": user}
+    if delta:
+        params["since"] = max(0, deck.get("version", 1) - 1)
+    etag = deck.get("etag") if not delta else deck.get("delta_etag")
+    return {"params": params, "headers": {"If-None-Match": etag} if etag else {}}
+
+
+def patch_slides_request(workload: Workload) -> Dict[str, Any]:
+    # Updates one slide of a known deck against the last seen version (409 when another request got there first).
+    user = workload.known_user()
+    deck = workload.decks.get(user, {})
+    if deck.get("ids"):
+        change = {"op": "update", "id": workload.random.choice(deck["ids"]), "slide": {"content": f"Edited {workload.topic()}"}}
+    else:
+        change = {"op": "insert", "slide": {"title": "Traction", "content": workload.topic()}}
+    patch = {"userId": user, "baseVersion": deck.get("version", 0), "changes": [change]}
+    if workload.deck_contexts:
+        patch["contextId"] = workload.deck_context_id()  # Also refreshes that deck context.
+    return {"json": patch}
+
+
+def json_body(body: bytes) -> Dict[str, Any]:
+    # Bodies are read raw (as sent); large ones may be compressed, and only the small save/patch/submit replies are needed.
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def observe_deck(workload: Workload, kwargs: Dict[str, Any], response: httpx.Response, body: bytes):
+    # Remembers deck versions, slide ids and ETags from save/patch/get responses.
+    user = (kwargs.get("json") or kwargs.get("params") or {}).get("userId")
+    if not user or response.status_code not in (200, 304):
+        return
+    deck = workload.decks.setdefault(user, {})
+    if response.status_code == 200:
+        data = json_body(body)
+        if "version" in data:
+            deck["version"] = data["version"]
+        if "ids" in data:
+            deck["ids"] = data["ids"]
+    if response.headers.get("etag"):
+        deck["delta_etag" if "since" in (kwargs.get("params") or {}) else "etag"] = response.headers["etag"]
+
+
+def observe_export_job(workload: Workload, kwargs: Dict[str, Any], response: httpx.Response, body: bytes):
+    job_id = json_body(body).get("id") if response.status_code == 202 else None
+    if job_id:
+        workload.export_jobs.append(job_id)
+
+
+def observe_deck_context(workload: Workload, kwargs: Dict[str, Any], response: httpx.Response, body: bytes):
+    context_id = json_body(body).get("contextId") if response.status_code == 200 else None
+    if context_id:
+        workload.deck_contexts.append(context_id)
+
+
+def default_routes() -> List[Route]:
+    """
+    The editor-facing routes in main.py, weighted roughly like editor traffic (many reads and small AI actions, few
+    exports). The stats, metrics and warm-up endpoints are not driven.
+    """
+    return [
+        Route("generate-slides", "POST", "/generate-slides",
+              lambda w: {"json": {"problem": f"Problem about {w.topic()}", "solution": "An AI assistant"}}, 1.0),
+        Route("generate-slides-stream", "POST", "/generate-slides",
+              lambda w: {"json": {"problem": f"Problem about {w.topic()}", "solution": "An AI assistant"}, "params": {"stream": "true"}}, 0.5, True),
+        Route("generate-slide-content", "POST", "/generate-slide-content", lambda w: {"json": w.slide_request()}, 2.0),
+        Route("generate-slide-content-stream", "POST", "/generate-slide-content",
+              lambda w: {"json": w.slide_request(), "params": {"stream": "true"}}, 1.0, True),
+        Route("generate-design-suggestions", "POST", "/generate-design-suggestions", lambda w: {"json": w.slide_request()}, 1.0),
+        Route("generate-slide-content-batch", "POST", "/generate-slide-content-batch",
+              lambda w: {"json": {"items": [w.slide_request() for _ in range(4)]}}, 0.3),
+        Route("deck-context-put", "POST", "/deck-context",
+              lambda w: {"json": {"problem": f"Problem about {w.topic()}", "solution": "An AI assistant", "slides": w.slides()}}, 0.5,
+              observe=observe_deck_context),
+        Route("deck-context-update", "POST", "/deck-context/{id}/slides",
+              lambda w: {"path": f"/deck-context/{w.deck_context_id()}/slides",
+                         "json": {"slides": [{"title": w.random.choice(SLIDE_TITLES), "content": w.topic()}]}}, 0.5),
+        Route("deck-context-get", "GET", "/deck-context/{id}", lambda w: {"path": f"/deck-context/{w.deck_context_id()}"}, 0.3),
+        Route("generate-slide-content-context", "POST", "/generate-slide-content", lambda w: {"json": w.context_slide_request()}, 1.0),
+        Route("generate-design-suggestions-context", "POST", "/generate-design-suggestions", lambda w: {"json": w.context_slide_request()}, 0.5),
+        Route("generate-suggestion", "POST", "/generate-suggestion",
+              lambda w: {"json": {"type": w.random.choice(["Content", "Design"]), "slide_title": "Traction", "content": w.topic(), "design": w.topic()}}, 2.0),
+        Route("generate-visual-data", "POST", "/generate-visual-data",
+              lambda w: {"json": {"type": w.random.choice(VISUAL_TYPES), "context": w.topic()}}, 1.5),
+        Route("analyze-pitch-deck", "POST", "/analyze-pitch-deck", lambda w: {"json": {"slides": w.slides()}}, 0.5),
+        Route("export-pdf", "POST", "/export-pdf", lambda w: {"json": {"slides": w.slides()}}, 0.3),
+        Route("export-pdf-stream", "POST", "/export-pdf", lambda w: {"json": {"slides": w.slides(60)}, "params": {"stream": "true"}}, 0.1, True),
+        Route("export-ppt", "POST", "/export-ppt", lambda w: {"json": {"slides": w.slides()}}, 0.3),
+        Route("export-job-submit", "POST", "/export-jobs",
+              lambda w: {"json": {"slides": w.slides(), "format": w.random.choice(["pdf", "pptx"])}}, 0.3, observe=observe_export_job),
+        Route("export-job-status", "GET", "/export-jobs/{id}", lambda w: w.export_job_path(), 0.6),
+        Route("export-job-events", "GET", "/export-jobs/{id}/events", lambda w: w.export_job_path("/events"), 0.2, True),
+        Route("export-job-download", "GET", "/export-jobs/{id}/download", lambda w: w.export_job_path("/download"), 0.3),
+        Route("save-slides", "POST", "/save-slides", lambda w: {"json": {"userId": w.user_id(), "slides": w.slides()}}, 1.5,
+              observe=observe_deck),
+        Route("patch-slides", "POST", "/patch-slides", patch_slides_request, 1.5, observe=observe_deck),
+        Route("get-slides", "GET", "/get-slides", lambda w: {"params": {"userId": w.user_id()}}, 2.0, observe=observe_deck),
+        Route("get-slides-conditional", "GET", "/get-slides", get_slides_request, 1.5, observe=observe_deck),
+        Route("get-slides-since", "GET", "/get-slides", lambda w: get_slides_request(w, delta=True), 0.5, observe=observe_deck),
+        Route("dashboard-stats", "GET", "/dashboard-stats", lambda w: {"params": {"userId": w.user_id()}}, 1.0),
+    ]
+
+
+def read_memory(pid: Optional[int]) -> Optional[Dict[str, int]]:
+    # Resident and peak resident memory of a local process in KB (Linux /proc only).
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {"rss_kb": int(fields["VmRSS"].split()[0]), "peak_rss_kb": int(fields["VmHWM"].split()[0])}
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+async def fetch_json(client: httpx.AsyncClient, path: str) -> Optional[Dict[str, Any]]:
+    try:
+        response = await client.get(path)
+        return response.json() if response.status_code == 200 else None
+    except httpx.HTTPError:
+        return None
+
+
+def cache_delta(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    # Hit rate of the lookups made during the run only.
+    if not before or not after:
+        return None
+    hits = after.get("hits", 0) - before.get("hits", 0)
+    misses = after.get("misses", 0) - before.get("misses", 0)
+    result = {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "evictions": after.get("evictions", 0) - before.get("evictions", 0),
+        "entries": after.get("entries"),
+        "bytes": after.get("bytes"),
+    }
+    singleflight_before, singleflight_after = before.get("singleflight") or {}, after.get("singleflight") or {}
+    if singleflight_after:
+        result["coalesced"] = singleflight_after.get("coalesced", 0) - singleflight_before.get("coalesced", 0)
+    return result
+
+
+async def run_load(base_url: str, routes: Optional[List[Route]] = None, concurrency: int = 20, duration: float = 30,
+                   warmup: float = 3, workload: Optional[Workload] = None, backend_pid: Optional[int] = None,
+                   timeout: float = 120) -> Dict[str, Any]:
+    """
+    Runs the load for `duration` seconds (after `warmup` seconds that are not measured) and returns the report.
+    """
+    routes = routes or default_routes()
+    workload = workload or Workload()
+    weights = [route.weight for route in routes]
+    stats: Dict[str, RouteStats] = {route.name: RouteStats() for route in routes}
+    peak_memory: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def one_request(route: Route, record: bool):
+            started = time.perf_counter()
+            first_byte = None
+            size = 0
+            status = "error"
+            kwargs = route.build(workload)
+            body = bytearray()
+            try:
+                async with client.stream(route.method, kwargs.pop("path", route.path), **kwargs) as response:
+                    async for chunk in response.aiter_raw():
+                        if first_byte is None:
+                            first_byte = time.perf_counter() - started
+                        size += len(chunk)
+                        if route.observe is not None:
+                            body += chunk
+                    status = str(response.status_code)
+                if route.observe is not None:
+                    route.observe(workload, kwargs, response, bytes(body))
+            except httpx.HTTPError:
+                pass
+            if not record:
+                return
+            route_stats = stats[route.name]
+            route_stats.latencies.append(time.perf_counter() - started)
+            if route.stream and first_byte is not None:
+                route_stats.first_byte.append(first_byte)
+            route_stats.statuses[status] = route_stats.statuses.get(status, 0) + 1
+            route_stats.bytes += size
+            if status == "error" or int(status) >= 500:
+                route_stats.errors += 1
+
+        async def worker(stop_at: float, record: bool):
+            while time.perf_counter() < stop_at:
+                route = workload.random.choices(routes, weights)[0]
+                await one_request(route, record)
+
+        async def sample_memory(stop_at: float):
+            while time.perf_counter() < stop_at:
+                memory = read_memory(backend_pid)
+                if memory:
+                    peak_memory["rss_kb"] = max(peak_memory.get("rss_kb", 0), memory["rss_kb"])
+                    peak_memory["peak_rss_kb"] = memory["peak_rss_kb"]
+                await asyncio.sleep(0.5)
+
+        if warmup > 0:
+            stop_at = time.perf_counter() + warmup
+            await asyncio.gather(*[worker(stop_at, False) for _ in range(concurrency)])
+
+        cache_before = await fetch_json(client, "/cache-stats")
+        memory_before = read_memory(backend_pid)
+        started = time.perf_counter()
+        stop_at = started + duration
+        await asyncio.gather(sample_memory(stop_at), *[worker(stop_at, True) for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+        cache_after = await fetch_json(client, "/cache-stats")
+        llm_stats = await fetch_json(client, "/llm-stats")
+
+    all_latencies = [latency for route_stats in stats.values() for latency in route_stats.latencies]
+    total = len(all_latencies)
+    errors = sum(route_stats.errors for route_stats in stats.values())
+    report: Dict[str, Any] = {
+        "overall": {
+            "requests": total,
+            "errors": errors,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            **summarize(all_latencies),
+        },
+        "routes": {},
+        "cache": cache_delta(cache_before, cache_after),
+        "memory": {"before": memory_before, "after": read_memory(backend_pid), "max_rss_kb": peak_memory.get("rss_kb"),
+                   "peak_rss_kb": peak_memory.get("peak_rss_kb")} if backend_pid else None,
+        "upstream": llm_stats,
+        "elapsed_s": round(elapsed, 2),
+    }
+    for name, route_stats in stats.items():
+        count = len(route_stats.latencies)
+        if not count:
+            continue
+        entry = {
+            "requests": count,
+            "errors": route_stats.errors,
+            "statuses": route_stats.statuses,
+            "throughput_rps": round(count / elapsed, 2),
+            "avg_bytes": int(route_stats.bytes / count),
+            **summarize(route_stats.latencies),
+        }
+        if route_stats.first_byte:
+            entry["first_byte"] = summarize(route_stats.first_byte)
+        report["routes"][name] = entry
+    return report
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.2) -> List[str]:
+    """
+    Lists regressions against a baseline report: latency percentiles more than `tolerance` slower, throughput more than
+    `tolerance` lower, or a higher error rate.
+    """
+    regressions = []
+
+    def check(label: str, before: Dict[str, Any], after: Dict[str, Any]):
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            if before.get(key) and after.get(key) and after[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{label} {key}: {before[key]} -> {after[key]}")
+        if before.get("throughput_rps") and after.get("throughput_rps", 0) < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{label} throughput_rps: {before['throughput_rps']} -> {after.get('throughput_rps')}")
+
+    check("overall", baseline.get("overall", {}), current.get("overall", {}))
+    if current.get("overall", {}).get("error_rate", 0) > baseline.get("overall", {}).get("error_rate", 0) + 0.01:
+        regressions.append(f"overall error_rate: {baseline['overall'].get('error_rate')} -> {current['overall']['error_rate']}")
+    for name, before in baseline.get("routes", {}).items():
+        if name in current.get("routes", {}):
+            check(name, before, current["routes"][name])
+    return regressions
+
+
+def select_routes(names: Optional[str]) -> List[Route]:
+    # Comma-separated route names (see default_routes), or all routes.
+    routes = default_routes()
+    if not names:
+        return routes
+    wanted = {name.strip() for name in names.split(",") if name.strip()}
+    unknown = wanted - {route.name for route in routes}
+    if unknown:
+        raise ValueError(f"Unknown routes: {', '.join(sorted(unknown))}")
+    return [route for route in routes if route.name in wanted]
@@ -0,0 +1,206 @@
+'''
+Local OpenAI-compatible stand-in for benchmarking (POST /v1/chat/completions, streaming and not).
+
+Answers look like what the backend expects for each prompt (JSON following the requested schema
+for slides, analyses and chart data, free text otherwise), so every route can be exercised without
+calling OpenAI.
+Latency, token rate and error rates are configurable:
+
+    python -m benchmark.mock_llm --port 8100 --latency-ms 800 --latency-sigma 0.5 --tokens-per-second 40 --error-rate 0.02
+
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:8100/v1 (any OPENAI_API_KEY works).
+'''
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+STANDARD_SLIDES = [
+    "The Problem", "Our Solution", "Product Demo", "Market Opportunity", "Traction", "Customer Love",
+    "Competitive Landscape", "Business Model", "Financial Projections", "Go-to-Market Strategy", "Team",
+    "Funding Ask", "Thank You",
+]
+
+
+@dataclass
+class MockSettings:
+    latency_ms: float = 800  # Median time to first token.
+    latency_sigma: float = 0.5  # Log-normal spread of the time to first token (0 = fixed latency).
+    tokens_per_second: float = 40  # Completion speed after the first token (0 = instant).
+    error_rate: float = 0.0  # Fraction of calls that fail with a 500.
+    rate_limit_rate: float = 0.0  # Fraction of calls that fail with a 429.
+    seed: int = 0
+
+
+def first_token_delay(settings: MockSettings) -> float:
+    if settings.latency_sigma <= 0:
+        return settings.latency_ms / 1000
+    return random.lognormvariate(math.log(max(settings.latency_ms, 1) / 1000), settings.latency_sigma)
+
+
+_SCHEMA_INSTRUCTION = re.compile(r"JSON object named (\w+)")
+
+
+def schema_name(body: dict, prompt: str) -> Optional[str]:
+    # The requested JSON schema, from response_format or from the prompt instruction used for older models.
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return response_format["json_schema"]["name"]
+    match = _SCHEMA_INSTRUCTION.search(prompt)
+    return match.group(1) if match else None
+
+
+def structured_answer(schema: str) -> Optional[dict]:
+    if schema == "pitch_deck_slides":
+        return {"slides": [
+            {"title": title, "headline": f"A compelling headline for {title.lower()}", "bullets": ["First key point with a number", "Second key point"]}
+            for title in STANDARD_SLIDES
+        ]}
+    if schema == "slide_review":
+        return {"score": random.randint(50, 95), "review": "Clear headline, but the bullets need concrete numbers and a source."}
+    if schema == "deck_analysis":
+        return {
+            "score": random.randint(55, 92),
+            "narrative_flow": "The story moves from problem to solution clearly, but traction arrives late.",
+            "visual_design": "Slides are text heavy; use one chart per data slide.",
+            "data_credibility": "Market sizing needs sources and a bottom-up estimate.",
+            "feedback": "1. Lead with traction.\n2. Cut bullets to three per slide.\n3. Add sources.",
+        }
+    if schema == "visual_data_scatter":
+        return {"points": [{"x": random.randint(1, 100), "y": random.randint(1, 100)} for _ in range(5)]}
+    if schema == "visual_data_table":
+        return {"columns": ["Year", "Revenue"], "rows": [["2024", "$1M"], ["2025", "$2.4M"]]}
+    if schema == "visual_data_points":
+        return {"points": [{"name": f"Item {i}", "value": random.randint(5, 60)} for i in range(4)]}
+    return None
+
+
+def completion_text(messages: List[dict], max_tokens: int, schema: Optional[str] = None) -> str:
+    """
+    Builds a plausible answer for the backend prompt in `messages` (JSON if a known `schema` was requested).
+    """
+    prompt = " ".join(message.get("content") or "" for message in messages)
+    answer = structured_answer(schema) if schema else None
+    if answer is not None:
+        return json.dumps(answer)
+    if "design suggestions" in prompt or "design expert" in prompt:
+        return "1. Layout: one idea per slide.\n2. Visuals: a single bar chart.\n3. Colors: navy and white.\n4. Typography: 32pt headline.\n5. Data: label every axis."
+    if "single, actionable improvement" in prompt:
+        return "Replace the second bullet with a customer quote that includes a measurable result."
+    words = ["Headline:", "Investors", "care", "about", "traction,", "so", "lead", "with", "40%", "month-over-month", "growth.",
+             "\n-", "Market", "of", "$12B", "growing", "18%", "yearly.", "\n-", "Three", "pilots", "converted", "to", "paid."]
+    return " ".join(words[: max(1, min(len(words), max_tokens))])
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def create_mock_app(settings: MockSettings) -> FastAPI:
+    app = FastAPI(title="Mock OpenAI")
+    app.state.calls = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        roll = random.random()
+        if roll < settings.rate_limit_rate:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (mock)", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429, headers={"retry-after": "1"},
+            )
+        if roll < settings.rate_limit_rate + settings.error_rate:
+            await asyncio.sleep(first_token_delay(settings))
+            return JSONResponse({"error": {"message": "The server had an error (mock)", "type": "server_error"}}, status_code=500)
+
+        messages = body.get("messages", [])
+        model = body.get("model", "gpt-4")
+        prompt = " ".join(message.get("content") or "" for message in messages)
+        text = completion_text(messages, body.get("max_tokens") or 2000, schema_name(body, prompt))
+        prompt_tokens = sum(count_tokens(message.get("content") or "") for message in messages)
+        completion_tokens = count_tokens(text)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        await asyncio.sleep(first_token_delay(settings))
+
+        if not body.get("stream"):
+            if settings.tokens_per_second > 0:
+                await asyncio.sleep(completion_tokens / settings.tokens_per_second)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+            }
+
+        async def events():
+            pieces = [text[i:i + 4] for i in range(0, len(text), 4)]  # ~1 token per chunk.
+            for index, piece in enumerate(pieces):
+                delta = {"role": "assistant", "content": piece} if index == 0 else {"content": piece}
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+                if settings.tokens_per_second > 0:
+                    await asyncio.sleep(1 / settings.tokens_per_second)
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "gpt-4", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/stats")
+    async def stats():
+        return {"calls": app.state.calls}
+
+    return app
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    defaults = MockSettings()
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Median time to first token")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma, help="Log-normal spread of the latency")
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Fraction of calls answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate, help="Fraction of calls answered with a 429")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def settings_from_args(args: argparse.Namespace) -> MockSettings:
+    return MockSettings(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    uvicorn.run(create_mock_app(settings_from_args(args)), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,509 @@
+'''
+Response cache for the AI endpoints - Cache Responses to save API costs.
+
+A bounded in-memory LRU cache with a TTL. Entries are evicted when the cache grows past
+its max entries or max bytes, and a background sweep removes expired entries even if
+nobody reads them again. Keys are built from normalized, hashed prompt inputs so that
+whitespace and case variants of the same prompt share one entry.
+
+SingleFlight coalesces concurrent cache misses for the same key into one upstream call.
+DiskCache is an optional second tier in a local SQLite file, shared by all workers on a node.
+SemanticCache is an opt-in MinHash/LSH index that maps near-duplicate prompts onto an existing key.
+'''
+
+import asyncio
+import bisect
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+
+def normalize_text(value: Any) -> str:
+    """
+    Collapses whitespace and case so equivalent prompts map to the same key.
+    """
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True)
+    return " ".join(value.split()).casefold()
+
+
+def make_cache_key(namespace: str, *parts: Any) -> str:
+    """
+    Builds a cache key like 'generate-slides:<sha256>' from the normalized request parts.
+    """
+    digest = hashlib.sha256(json.dumps([normalize_text(part) for part in parts]).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def estimate_size(value: Any) -> int:
+    # Approximate memory cost of an entry - the size of its JSON encoding.
+    try:
+        return len(json.dumps(value, default=str).encode("utf-8"))
+    except (TypeError, ValueError):
+        return len(str(value).encode("utf-8"))
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU + TTL cache with entry-count and byte-size bounds and hit/miss/eviction counters.
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 50 * 1024 * 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, _, value = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)  # Mark as most recently used.
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return  # Never cache a single entry bigger than the whole cache.
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + (ttl if ttl is not None else self.ttl), size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """
+        Removes every expired entry. Returns the number of entries removed.
+        """
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (expires_at, _, _) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        return len(expired)
+
+    async def sweep_forever(self, interval: float = 60):
+        # Background TTL sweep - started with the app (see lifespan in main.py).
+        while True:
+            await asyncio.sleep(interval)
+            self.sweep()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        # Unexpired entry present - does not count as a lookup or refresh the LRU order.
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.time()
+
+    def _remove(self, key: str):
+        # Caller must hold the lock.
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key starts the work and every
+    caller that arrives while it is in flight awaits the same future, sharing its result or error.
+    A caller that is cancelled leaves the others waiting; the work itself is cancelled once the
+    last caller waiting on it gives up.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        self._waiters: Dict["asyncio.Future", int] = {}  # Shared task -> callers awaiting it
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # Shield the shared task so one disconnecting client does not cancel it for everyone else.
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[task] == 1 and not task.done():
+                task.cancel()  # Nobody else is waiting for the result.
+                self.abandoned += 1
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "leaders": self.leaders, "coalesced": self.coalesced,
+                "abandoned": self.abandoned}
+
+    def _finish(self, key: str, task: "asyncio.Future"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark the error as retrieved even if every caller went away.
+
+
+class DiskCache:
+    """
+    Second-level cache in a local SQLite file (WAL mode), shared by every worker on the node and kept
+    across restarts. Reads go straight to SQLite (read-through from the memory tier); writes are queued
+    and flushed in batches by a background thread (write-behind). Expired entries are deleted and the
+    least recently used ones are dropped when the file grows past `max_bytes` (compaction).
+    """
+
+    def __init__(self, path: str, ttl: float = 86400, max_bytes: int = 500 * 1024 * 1024,
+                 flush_interval: float = 1.0, compact_interval: float = 300):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self._local = threading.local()
+        self._pending: Dict[str, Tuple[float, str]] = {}  # key -> (expires_at, json value) waiting to be written
+        self._touched: Dict[str, float] = {}  # key -> last access time waiting to be written
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer: Optional[threading.Thread] = None
+        self._last_compact = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.compacted = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread - SQLite connections must not be shared across threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")  # Readers never block the writer (and vice versa) across workers.
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._pending_lock:
+            pending = self._pending.get(key)
+        if pending is not None and pending[0] > now:
+            self.hits += 1
+            return json.loads(pending[1])
+        row = self._connect().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        with self._pending_lock:
+            self._touched[key] = now
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None):
+        # Queued - the background writer persists it on its next flush.
+        with self._pending_lock:
+            self._pending[key] = (time.time() + (ttl if ttl is not None else self.ttl), json.dumps(value, default=str))
+
+    def flush(self):
+        """
+        Writes all queued entries and access times in one transaction.
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            touched, self._touched = self._touched, {}
+        if not pending and not touched:
+            return
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                [(key, value, len(value), expires_at, now) for key, (expires_at, value) in pending.items()],
+            )
+            conn.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?", [(at, key) for key, at in touched.items()])
+        self.writes += len(pending)
+
+    def compact(self) -> int:
+        """
+        Deletes expired entries, then the least recently used ones until the cache is under 90% of max_bytes.
+        Returns the number of entries removed.
+        """
+        conn = self._connect()
+        with conn:
+            removed = conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+            if total > self.max_bytes:
+                target = int(self.max_bytes * 0.9)
+                rows = conn.execute("SELECT key, size FROM cache ORDER BY accessed_at").fetchall()
+                victims = []
+                for key, size in rows:
+                    if total <= target:
+                        break
+                    victims.append((key,))
+                    total -= size
+                conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+                removed += len(victims)
+        self.compacted += removed
+        return removed
+
+    def start(self):
+        if self._writer is None:
+            self._stop.clear()
+            self._writer = threading.Thread(target=self._run, name="disk-cache-writer", daemon=True)
+            self._writer.start()
+
+    def stop(self):
+        if self._writer is not None:
+            self._stop.set()
+            self._writer.join()
+            self._writer = None
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        row = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        return {
+            "path": self.path,
+            "entries": row[0],
+            "bytes": row[1],
+            "max_bytes": self.max_bytes,
+            "pending_writes": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "compacted": self.compacted,
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.time() - self._last_compact >= self.compact_interval:
+                    self.compact()
+                    self._last_compact = time.time()
+            except sqlite3.Error as e:
+                print(f"Disk cache error: {str(e)}")
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_RECENT_SIGNATURES = 256
+_NON_WORD_RE = re.compile(r"[^\w\s]+")
+
+
+class SemanticCache:
+    """
+    Near-duplicate index for prompts. Each text is reduced to a MinHash signature over character shingles;
+    the signature is a one-permutation MinHash (each shingle is hashed once and falls into one of `num_perm`
+    bins, empty bins borrow from their neighbour), so it costs one pass over the shingles rather than one per
+    permutation. Locality-sensitive hashing (signature bands) finds candidates, and the share of matching signature values
+    estimates their Jaccard similarity. `lookup` returns the cache key of the most similar text in the same
+    scope if it reaches `threshold`. Entries expire after `ttl` and the least recently used are evicted past
+    `max_entries`. It only stores keys - the responses stay in the response cache.
+    """
+
+    def __init__(self, threshold: float = 0.75, num_perm: int = 64, bands: int = 16, shingle_size: int = 4,
+                 max_entries: int = 10000, ttl: float = 3600, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        rng = random.Random(seed)
+        self._hash = (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+        self._bin_range = _MERSENNE_PRIME // num_perm + 1  # Values within a bin are below this.
+        # Signatures of recent texts - a miss looks the text up and then adds it, which needs the same signature.
+        self._signatures: "OrderedDict[bytes, Tuple[int, ...]]" = OrderedDict()
+        self._entries: "OrderedDict[str, Tuple[float, str, Tuple[int, ...]]]" = OrderedDict()  # key -> (expires_at, scope, signature)
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _shingles(self, text: str) -> Set[int]:
+        text = " ".join(_NON_WORD_RE.sub(" ", normalize_text(text)).split())
+        size = self.shingle_size
+        grams = {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+        return {int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big") for gram in grams}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            signature = self._signatures.get(digest)
+            if signature is not None:
+                self._signatures.move_to_end(digest)
+                return signature
+        signature = self._compute_signature(text)
+        with self._lock:
+            self._signatures[digest] = signature
+            while len(self._signatures) > _RECENT_SIGNATURES:
+                self._signatures.popitem(last=False)
+        return signature
+
+    def _compute_signature(self, text: str) -> Tuple[int, ...]:
+        a, b = self._hash
+        num_perm = self.num_perm
+        bins: List[Optional[int]] = [None] * num_perm
+        for shingle in self._shingles(text):
+            value = (a * shingle + b) % _MERSENNE_PRIME
+            index, value = value % num_perm, value // num_perm
+            current = bins[index]
+            if current is None or value < current:
+                bins[index] = value
+        # Densification: an empty bin takes the value of the next non-empty bin (circularly), offset by the
+        # distance so borrowed values only match when the same bins are empty in both texts.
+        filled = [index for index, value in enumerate(bins) if value is not None]
+        signature = list(bins)
+        for index in range(num_perm):
+            if bins[index] is None:
+                position = bisect.bisect_left(filled, index)
+                source = filled[position % len(filled)]
+                distance = (source - index) % num_perm
+                signature[index] = bins[source] + distance * self._bin_range
+        return tuple(signature)
+
+    def _band_keys(self, scope: str, signature: Tuple[int, ...]) -> List[Tuple[str, int, Tuple[int, ...]]]:
+        return [(scope, band, signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+
+    def add(self, scope: str, text: str, key: str):
+        signature = self.signature(text)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.time() + self.ttl, scope, signature)
+            for band_key in self._band_keys(scope, signature):
+                self._buckets.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def lookup(self, scope: str, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Returns (key, estimated similarity) of the closest entry in `scope` at or above the threshold.
+        """
+        signature = self.signature(text)
+        now = time.time()
+        best: Optional[Tuple[str, float]] = None
+        with self._lock:
+            candidates: Set[str] = set()
+            for band_key in self._band_keys(scope, signature):
+                candidates |= self._buckets.get(band_key, set())
+            for key in candidates:
+                expires_at, _, other = self._entries[key]
+                if expires_at <= now:
+                    self._remove(key)
+                    continue
+                similarity = sum(1 for mine, theirs in zip(signature, other) if mine == theirs) / self.num_perm
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (key, similarity)
+            if best is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best[0])
+            self.hits += 1
+            return best
+
+    def discard(self, key: str):
+        # Drops a key whose response is no longer cached.
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key: str):
+        # Caller must hold the lock.
+        _, scope, signature = self._entries.pop(key)
+        for band_key in self._band_keys(scope, signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
@@ -0,0 +1,100 @@
+'''
+Response compression for the Pitch Deck Generator backend.
+
+Negotiates brotli (when the optional `brotli` package is installed) or gzip from the
+request's Accept-Encoding header and compresses responses above a minimum size. Builds on
+Starlette's GZip responders, so streamed responses are compressed chunk by chunk. Event
+streams and formats that are already compressed (PPTX, PDF, images, zip) are sent as they are.
+'''
+
+from typing import Dict
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli  # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+EXCLUDED_CONTENT_TYPES = (
+    "text/event-stream",  # SSE must be flushed event by event.
+    "application/vnd.openxmlformats-officedocument",  # PPTX is already a zip archive.
+    "application/zip",
+    "application/pdf",  # Page streams and fonts are already Flate-compressed.
+    "image/",
+    "video/",
+)
+
+
+def parse_accept_encoding(value: str) -> Dict[str, float]:
+    """
+    Parses an Accept-Encoding header into {encoding: q-value}.
+    """
+    encodings = {}
+    for part in value.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            encodings[name.strip().lower()] = q
+    return encodings
+
+
+class _ExcludingResponder:
+    # Extends Starlette's excluded content types (which only cover text/event-stream).
+    async def send_with_compression(self, message: Message) -> None:
+        await super().send_with_compression(message)
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            self.content_type_is_excluded = content_type.startswith(EXCLUDED_CONTENT_TYPES)
+
+
+class GzipCompressionResponder(_ExcludingResponder, GZipResponder):
+    pass
+
+
+class BrotliResponder(_ExcludingResponder, IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        compressed = self.compressor.process(body)
+        return compressed + (self.compressor.flush() if more_body else self.compressor.finish())
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of at least `minimum_size` bytes with brotli or gzip, whichever the client prefers.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accepted = parse_accept_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+        br_q = accepted.get("br", 0.0) if brotli is not None else 0.0
+        gzip_q = accepted.get("gzip", 0.0)
+        if br_q > 0 and br_q >= gzip_q:
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif gzip_q > 0:
+            responder = GzipCompressionResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        await responder(scope, receive, send)
@@ -0,0 +1,326 @@
+'''
+Deck context store for the Pitch Deck Generator backend.
+
+Per-slide AI calls (slide content, design suggestions, suggestions) need the deck's problem, solution
+and slide content. Instead of re-sending them with every call, a client stores them once under a deck
+or session id (POST /deck-context) and passes that id as `contextId`; the server fills in what the
+request leaves out.
+
+Prompts for these calls are assembled stable-part first: the shared system text, then the deck context,
+then the endpoint's own instructions and the slide being worked on. Calls for the same deck therefore
+start with an identical prefix, which the provider's prompt caching can reuse (OpenAI caches identical
+prompt prefixes of 1024 tokens and more).
+
+Contexts are bounded by entry count and idle TTL. By default they live in a SQLite file shared by every
+worker on the node (SQLiteContextTier), so a contextId stored through one worker resolves on all of them.
+Without it they live in each worker's memory, which only works with a single worker or sticky sessions.
+A request naming an unknown or expired context falls back to the fields it sent itself; if it sent none,
+it gets a 404 and the client stores the context again.
+'''
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+tokens_saved = metrics.REGISTRY.counter(
+    "deck_context_tokens_saved_total", "Estimated prompt tokens clients did not send because a stored deck context supplied them.", ("endpoint",))
+
+# Shared by every deck-context prompt, so the prefix is identical across endpoints.
+DECK_SYSTEM_PROMPT = (
+    "You are a pitch deck expert helping a founder improve their startup pitch deck. "
+    "The deck is described in the next message; the request after it says what to do."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    # Same rough ~4 characters per token as llm.estimate_tokens.
+    return len(text or "") // 4
+
+
+@dataclass
+class DeckContext:
+    id: str
+    problem: str
+    solution: str
+    slides: Dict[str, str] = field(default_factory=dict)  # Slide title -> content, in deck order.
+    version: int = 1
+    updated_at: float = field(default_factory=time.time)
+
+    def slide_content(self, title: str) -> Optional[str]:
+        return self.slides.get(title)
+
+    def update_slides(self, contents: Dict[str, Optional[str]], replace: bool = False) -> bool:
+        """
+        Sets slide contents by title (None removes the slide; new titles are appended). With `replace`, slides
+        missing from `contents` are removed too. True if anything changed.
+        """
+        if replace:
+            contents = {**{title: None for title in self.slides}, **contents}
+        changed = False
+        for title, content in contents.items():
+            if content is None:
+                changed = self.slides.pop(title, None) is not None or changed
+            elif self.slides.get(title) != content:
+                self.slides[title] = content
+                changed = True
+        if changed:
+            self.version += 1
+            self.updated_at = time.time()
+        return changed
+
+    def prompt(self) -> str:
+        # Deterministic rendering - the same deck always gives the same text, so it can be a cached prefix.
+        parts = [f"Pitch deck: {self.problem}", f"Description: {self.solution}"]
+        if self.slides:
+            parts.append("Slides:")
+            parts.extend(f"## {title}\n{content}" if content else f"## {title}" for title, content in self.slides.items())
+        return "\n\n".join(parts)
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.prompt())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "contextId": self.id,
+            "version": self.version,
+            "problem": self.problem,
+            "solution": self.solution,
+            "slides": [{"title": title, "content": content} for title, content in self.slides.items()],
+            "tokens": self.tokens(),
+            "updated_at": self.updated_at,
+        }
+
+
+def deck_messages(context: DeckContext, role: str, task: str) -> List[Dict[str, str]]:
+    """
+    Messages for a call about `context`: shared system text and the deck first (the reusable prefix),
+    then the endpoint's role and the task.
+    """
+    return [
+        {"role": "system", "content": DECK_SYSTEM_PROMPT},
+        {"role": "user", "content": context.prompt()},
+        {"role": "system", "content": role},
+        {"role": "user", "content": task},
+    ]
+
+
+class SQLiteContextTier:
+    """
+    Deck contexts in a local SQLite file (WAL mode), one row per context, shared by every worker on the node.
+    Rows unused for longer than the store's TTL count as gone. Blocking - ContextStore calls it in a worker thread.
+    """
+
+    TOUCH_INTERVAL = 60  # Seconds - reads refresh a row's last use at most this often.
+
+    def __init__(self, path: str = "deck_contexts.db"):
+        self.path = path
+        self._local = threading.local()
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS deck_contexts ("
+            "context_id TEXT PRIMARY KEY, data TEXT NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._connect().execute("CREATE INDEX IF NOT EXISTS deck_contexts_used_at ON deck_contexts (used_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread - SQLite connections must not be shared across threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # A context lost in a crash is simply stored again by the client.
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(context: DeckContext) -> str:
+        return json.dumps({
+            "problem": context.problem, "solution": context.solution, "slides": list(context.slides.items()),
+            "version": context.version, "updated_at": context.updated_at,
+        })
+
+    @staticmethod
+    def _decode(context_id: str, data: str) -> DeckContext:
+        fields = json.loads(data)
+        return DeckContext(context_id, fields["problem"], fields["solution"], dict(fields["slides"]),
+                           fields["version"], fields["updated_at"])
+
+    def load(self, context_id: str, ttl: float) -> Optional[DeckContext]:
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT data, used_at FROM deck_contexts WHERE context_id = ? AND used_at > ?", (context_id, now - ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        if now - row[1] >= self.TOUCH_INTERVAL:
+            conn.execute("UPDATE deck_contexts SET used_at = ? WHERE context_id = ?", (now, context_id))
+        return self._decode(context_id, row[0])
+
+    def update(self, context_id: str, ttl: float,
+               fn: Callable[[Optional[DeckContext]], Optional[DeckContext]]) -> Optional[DeckContext]:
+        """
+        Read-modify-write of one context under the write lock, so concurrent updates from other workers are not lost.
+        `fn` gets the current context (None if unknown or expired) and returns the one to store (None stores nothing).
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT data FROM deck_contexts WHERE context_id = ? AND used_at > ?", (context_id, now - ttl)
+            ).fetchone()
+            context = fn(self._decode(context_id, row[0]) if row else None)
+            if context is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO deck_contexts (context_id, data, used_at) VALUES (?, ?, ?)",
+                    (context_id, self._encode(context), now),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return context
+
+    def sweep(self, ttl: float, max_entries: int) -> Tuple[int, int]:
+        """
+        Deletes expired contexts, then the least recently used beyond `max_entries`. Returns (expired, evicted).
+        """
+        conn = self._connect()
+        expired = conn.execute("DELETE FROM deck_contexts WHERE used_at <= ?", (time.time() - ttl,)).rowcount
+        evicted = conn.execute(
+            "DELETE FROM deck_contexts WHERE context_id IN "
+            "(SELECT context_id FROM deck_contexts ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (max_entries,)
+        ).rowcount
+        return expired, evicted
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM deck_contexts").fetchone()[0]
+
+
+class ContextStore:
+    """
+    Deck contexts, least recently used evicted beyond `max_entries`, dropped after `ttl` seconds unused.
+    Kept in this worker's memory, or in `shared` (every worker on the node) when one is given.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600, shared: Optional[SQLiteContextTier] = None,
+                 sweep_interval: float = 300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+        self._entries: "OrderedDict[str, DeckContext]" = OrderedDict()
+        self._used: Dict[str, float] = {}  # id -> time.monotonic() of the last use
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.tokens_saved = 0
+
+    async def put(self, context_id: Optional[str], problem: str, solution: str, slides: List[Dict[str, Any]]) -> DeckContext:
+        # Stores (or replaces) a context; a new id is generated if none is given.
+        context_id = context_id or uuid.uuid4().hex
+        contents = {slide.get("title") or "": slide.get("content") or "" for slide in slides}
+
+        def replace(previous: Optional[DeckContext]) -> DeckContext:
+            return DeckContext(context_id, problem, solution, contents, version=previous.version + 1 if previous else 1)
+
+        if self.shared is not None:
+            context = await asyncio.to_thread(self.shared.update, context_id, self.ttl, replace)
+            await self._sweep_shared()
+            return context
+        context = replace(self._entries.get(context_id))
+        self._store(context)
+        return context
+
+    async def update_slides(self, context_id: str, contents: Dict[str, Optional[str]], replace: bool = False) -> Optional[DeckContext]:
+        """
+        Applies DeckContext.update_slides to a stored context. None if the context is unknown.
+        """
+        if self.shared is not None:
+            def apply(context: Optional[DeckContext]) -> Optional[DeckContext]:
+                return context if context is not None and context.update_slides(contents, replace) else None
+
+            context = await asyncio.to_thread(self.shared.update, context_id, self.ttl, apply)
+            return context if context is not None else await self.get(context_id, count=False)  # Unchanged (or unknown).
+        context = self._get_local(context_id, count=False)
+        if context is not None:
+            context.update_slides(contents, replace)
+        return context
+
+    async def get(self, context_id: str, count: bool = True) -> Optional[DeckContext]:
+        if self.shared is None:
+            return self._get_local(context_id, count)
+        context = await asyncio.to_thread(self.shared.load, context_id, self.ttl)
+        if count:
+            if context is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return context
+
+    async def _sweep_shared(self):
+        # Runs after writes, at most every `sweep_interval` seconds (any worker's sweep serves them all).
+        if time.monotonic() - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = time.monotonic()
+        expired, evicted = await asyncio.to_thread(self.shared.sweep, self.ttl, self.max_entries)
+        self.expirations += expired
+        self.evictions += evicted
+
+    def _get_local(self, context_id: str, count: bool = True) -> Optional[DeckContext]:
+        context = self._entries.get(context_id)
+        if context is not None and time.monotonic() - self._used[context_id] > self.ttl:
+            self._remove(context_id)
+            self.expirations += 1
+            context = None
+        if context is None:
+            if count:
+                self.misses += 1
+            return None
+        self._entries.move_to_end(context_id)
+        self._used[context_id] = time.monotonic()
+        if count:
+            self.hits += 1
+        return context
+
+    def record_saved(self, endpoint: str, tokens: int):
+        # Called when a request relied on the stored context instead of sending these tokens itself.
+        if tokens > 0:
+            self.tokens_saved += tokens
+            tokens_saved.inc(tokens, endpoint=endpoint)
+
+    def _store(self, context: DeckContext):
+        self._entries[context.id] = context
+        self._entries.move_to_end(context.id)
+        self._used[context.id] = time.monotonic()
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, context_id: str):
+        self._entries.pop(context_id, None)
+        self._used.pop(context_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "sqlite" if self.shared is not None else "memory",
+            "entries": self.shared.count() if self.shared is not None else len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "tokens_saved": self.tokens_saved,
+        }
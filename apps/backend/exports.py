@@ -0,0 +1,547 @@
+'''
+Export subsystem for the Pitch Deck Generator backend (PDF and PPTX).
+
+Exports run as jobs: submit, then poll or subscribe, then download. Rendering is CPU-bound,
+so it runs in a process pool instead of the request threadpool, and the finished file is
+written to disk rather than held in memory. Artifacts are content-addressed - keyed by a
+hash of the slides plus the format - so re-exporting an unchanged deck returns the cached
+file straight away.
+
+PDFs are produced by a small incremental writer with embedded, subset TrueType fonts, so a
+PDF can also be streamed to the client page by page with flat memory use, however many
+slides the deck has.
+'''
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import metrics
+
+Slides = List[Dict[str, Any]]
+
+
+# ===== STREAMING PDF WRITER =====
+# reportlab's canvas keeps every page in memory until save(), so PDFs are written here one page at a time instead:
+# each page is compressed and emitted as soon as it is laid out, and only the object offsets are kept for the xref
+# table at the end. Text is set in embedded TrueType fonts (composite fonts addressed by glyph, with a ToUnicode map),
+# so every character the font covers is drawn and all text stays searchable. The fonts are subset to the characters
+# used and written after the last page. reportlab reads and subsets the font files.
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792  # US letter, in points.
+_CATALOG, _PAGES, _FONT_REGULAR, _FONT_BOLD = 1, 2, 3, 4
+
+# TrueType (.ttf) files for PDF text - read here rather than in main.py so the export worker processes see them too.
+# The default is the Bitstream Vera family bundled with reportlab (Latin, Greek and common punctuation); set these to
+# e.g. DejaVu Sans or a TrueType CJK font for wider coverage. Characters a font lacks keep their text but draw as boxes.
+PDF_FONT = os.getenv("EXPORT_PDF_FONT", "")
+PDF_BOLD_FONT = os.getenv("EXPORT_PDF_BOLD_FONT", "")
+
+_subset_lock = threading.Lock()  # Font faces are shared and makeSubset() moves the face's read position.
+
+
+class EmbeddedFont:
+    """
+    One TrueType face as used by one PDF. Characters get codes (CIDs) in order of first use; the font is written
+    at the end of the file, subset to those characters.
+    """
+
+    def __init__(self, face: Any):
+        self.face = face
+        self.cids: Dict[str, int] = {}  # Character -> CID (0 is .notdef).
+
+    def width(self, text: str, size: float) -> float:
+        widths, default = self.face.charWidths, self.face.defaultWidth
+        return sum(widths.get(ord(char), default) for char in text) * size / 1000
+
+    def encode(self, text: str) -> bytes:
+        # PDF hex string of two-byte CIDs (Identity-H encoding).
+        codes = []
+        for char in text:
+            cid = self.cids.get(char)
+            if cid is None:
+                cid = self.cids[char] = len(self.cids) + 1 if len(self.cids) < 0xFFFE else 0
+            codes.append(b"%04X" % cid)
+        return b"<" + b"".join(codes) + b">"
+
+
+def _to_unicode_cmap(chars: List[str]) -> bytes:
+    # Maps CIDs 1..n back to their characters (UTF-16BE), so text can be searched and copied.
+    entries = [b"<%04X> <%s>" % (cid, char.encode("utf-16-be").hex().upper().encode()) for cid, char in enumerate(chars, 1)]
+    blocks = [b"%d beginbfchar\n" % len(entries[i:i + 100]) + b"\n".join(entries[i:i + 100]) + b"\nendbfchar"
+              for i in range(0, len(entries), 100)]
+    return b"\n".join([
+        b"/CIDInit /ProcSet findresource begin 12 dict begin begincmap",
+        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+        b"/CMapName /Adobe-Identity-UCS def /CMapType 2 def",
+        b"1 begincodespacerange <0000> <FFFF> endcodespacerange",
+        *blocks,
+        b"endcmap CMapName currentdict /CMap defineresource pop end end",
+    ])
+
+
+class StreamingPDFWriter:
+    """
+    Minimal incremental PDF writer: begin(), then page() for each page, then end(). Each call returns the bytes to emit.
+    Page content addresses `fonts` as /F1 (regular) and /F2 (bold), encoding text with EmbeddedFont.encode.
+    """
+
+    def __init__(self, fonts: Dict[str, EmbeddedFont], width: float = PAGE_WIDTH, height: float = PAGE_HEIGHT):
+        self.fonts = fonts
+        self.width = width
+        self.height = height
+        self.offset = 0
+        self.offsets: Dict[int, int] = {}
+        self.page_ids: List[int] = []
+        self.next_id = _FONT_BOLD + 1
+
+    def _object(self, number: int, body: bytes) -> bytes:
+        self.offsets[number] = self.offset
+        data = b"%d 0 obj\n" % number + body + b"\nendobj\n"
+        self.offset += len(data)
+        return data
+
+    def _stream(self, number: int, content: bytes, extra: bytes = b"") -> bytes:
+        compressed = zlib.compress(content)
+        return self._object(
+            number, b"<< /Length %d /Filter /FlateDecode%s >>\nstream\n" % (len(compressed), extra) + compressed + b"\nendstream"
+        )
+
+    def _ids(self, count: int) -> List[int]:
+        ids = list(range(self.next_id, self.next_id + count))
+        self.next_id += count
+        return ids
+
+    def begin(self) -> bytes:
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self.offset = len(header)
+        return header
+
+    def page(self, content: bytes) -> bytes:
+        stream_id, page_id = self._ids(2)
+        self.page_ids.append(page_id)
+        return self._stream(stream_id, content) + self._object(
+            page_id,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> >>"
+            % (_PAGES, self.width, self.height, stream_id, _FONT_REGULAR, _FONT_BOLD),
+        )
+
+    def _font(self, font_id: int, font: EmbeddedFont) -> bytes:
+        # Type0 font -> CIDFontType2 with the subset TrueType program; CIDs map to the subset's glyph ids.
+        face = font.face
+        chars = sorted(font.cids, key=font.cids.get)
+        codes = [ord(char) for char in chars]
+        glyphs: Dict[int, int] = {0: 0}  # Original glyph -> subset glyph, numbered the way makeSubset() numbers them.
+        gids = [0] + [glyphs.setdefault(face.charToGlyph.get(code, 0), len(glyphs)) for code in codes]
+        with _subset_lock:
+            program = face.makeSubset(codes)
+        tag = "".join(chr(65 + byte % 26) for byte in hashlib.sha1("".join(chars).encode("utf-8", "surrogatepass")).digest()[:6])
+        name = tag.encode() + b"+" + bytes(byte for byte in face.name if chr(byte).isalnum() or chr(byte) in "-_.")
+        widths = b" ".join(b"%d" % round(face.charWidths.get(code, face.defaultWidth)) for code in codes)
+        cid_font_id, descriptor_id, program_id, cid_map_id, to_unicode_id = self._ids(5)
+        return (
+            self._object(font_id, b"<< /Type /Font /Subtype /Type0 /BaseFont /%s /Encoding /Identity-H "
+                                  b"/DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>" % (name, cid_font_id, to_unicode_id))
+            + self._object(cid_font_id, b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont /%s "
+                                        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+                                        b"/FontDescriptor %d 0 R /DW %d /W [1 [%s]] /CIDToGIDMap %d 0 R >>"
+                           % (name, descriptor_id, round(face.defaultWidth), widths, cid_map_id))
+            + self._object(descriptor_id, b"<< /Type /FontDescriptor /FontName /%s /Flags %d /FontBBox [%s] /ItalicAngle %d "
+                                          b"/Ascent %d /Descent %d /CapHeight %d /StemV %d /FontFile2 %d 0 R >>"
+                           % (name, face.flags, b" ".join(b"%d" % round(v) for v in face.bbox), round(face.italicAngle),
+                              round(face.ascent), round(face.descent), round(face.capHeight), round(face.stemV), program_id))
+            + self._stream(program_id, program, b" /Length1 %d" % len(program))
+            + self._stream(cid_map_id, struct.pack(">%dH" % len(gids), *gids))
+            + self._stream(to_unicode_id, _to_unicode_cmap(chars))
+        )
+
+    def end(self) -> bytes:
+        data = self._font(_FONT_REGULAR, self.fonts["F1"]) + self._font(_FONT_BOLD, self.fonts["F2"])
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.page_ids)
+        data += self._object(_PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_ids)))
+        data += self._object(_CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % _PAGES)
+        xref_offset = self.offset
+        size = self.next_id
+        xref = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        xref += [b"%010d 00000 n \n" % self.offsets[number] for number in range(1, size)]
+        trailer = b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, _CATALOG, xref_offset)
+        return data + b"".join(xref) + trailer
+
+
+# ===== RENDERING BACKENDS =====
+# reportlab and python-pptx are imported on first use (or by warm_up_backends), not when the app starts.
+@lru_cache(maxsize=None)
+def font_face(path: str) -> Any:
+    from reportlab.pdfbase.ttfonts import TTFontFace
+    return TTFontFace(path)
+
+
+@lru_cache(maxsize=None)
+def pdf_font_faces() -> Tuple[Any, Any]:
+    # (regular, bold) - EXPORT_PDF_FONT / EXPORT_PDF_BOLD_FONT, or the Vera fonts that ship with reportlab.
+    import reportlab
+    bundled = os.path.join(os.path.dirname(reportlab.__file__), "fonts")
+    regular = PDF_FONT or os.path.join(bundled, "Vera.ttf")
+    bold = PDF_BOLD_FONT or PDF_FONT or os.path.join(bundled, "VeraBd.ttf")
+    return font_face(regular), font_face(bold)
+
+
+@lru_cache(maxsize=None)
+def pptx_presentation() -> Callable[[], Any]:
+    from pptx import Presentation
+    return Presentation
+
+
+def warm_up_backends() -> int:
+    """
+    Loads every installed rendering backend, in this process or an export worker. Returns the process id.
+    """
+    for loader in (pdf_font_faces, pptx_presentation):
+        try:
+            loader()
+        except ImportError:
+            pass  # The format reports its missing package when an export is requested.
+    return os.getpid()
+
+
+def wrap_text(text: str, font: EmbeddedFont, size: float, max_width: float) -> List[str]:
+    """
+    Splits text into lines that fit `max_width`, breaking on spaces (or inside words that are too long on their own).
+    """
+    lines = []
+    for paragraph in text.replace("\r", "").replace("\t", " ").split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if font.width(candidate, size) <= max_width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            while font.width(word, size) > max_width and len(word) > 1:
+                cut = len(word) - 1
+                while cut > 1 and font.width(word[:cut], size) > max_width:
+                    cut -= 1
+                lines.append(word[:cut])
+                word = word[cut:]
+            line = word
+        lines.append(line)
+    return lines
+
+
+def iter_pdf_pages(slides: Slides, fonts: Dict[str, EmbeddedFont]) -> Iterator[bytes]:
+    """
+    Lays out the slides and yields each page's content stream as soon as the page is full.
+    Each slide's text is wrapped once, and the lines that land on one page are drawn with a single text object.
+    """
+    regular, bold = fonts["F1"], fonts["F2"]
+    page: List[bytes] = []
+    y = PAGE_HEIGHT - 50
+    for slide in slides:
+        title_lines = wrap_text(slide.get('title', '') or '', bold, 16, PAGE_WIDTH - 100)
+        page.append(b"BT /F2 16 Tf 50 %.2f Td %s Tj ET" % (y, bold.encode(" ".join(title_lines))) if len(title_lines) == 1
+                    else b"BT /F2 16 Tf 18 TL 50 %.2f Td " % y + b" T* ".join(bold.encode(line) + b" Tj" for line in title_lines) + b" ET")
+        y -= 30 + 18 * (len(title_lines) - 1)
+        lines = wrap_text(slide.get('content', '') or '', regular, 12, PAGE_WIDTH - 110)
+        while lines:
+            fit = max(1, int((y - 80) // 20) + 1)  # Lines that fit before the bottom margin.
+            chunk, lines = lines[:fit], lines[fit:]
+            page.append(b"BT /F1 12 Tf 20 TL 60 %.2f Td " % y + b" T* ".join(regular.encode(line) + b" Tj" for line in chunk) + b" ET")
+            y -= 20 * len(chunk)
+            if y < 80:
+                yield b"\n".join(page)
+                page, y = [], PAGE_HEIGHT - 50
+        y -= 20
+        if y < 80:
+            yield b"\n".join(page)
+            page, y = [], PAGE_HEIGHT - 50
+    if page or not slides:
+        yield b"\n".join(page)
+
+
+def iter_pdf(slides: Slides) -> Iterator[bytes]:
+    """
+    Yields the PDF file in chunks - the header, then one chunk per page, then the trailer. Memory stays flat with deck size.
+    """
+    regular, bold = pdf_font_faces()
+    writer = StreamingPDFWriter({"F1": EmbeddedFont(regular), "F2": EmbeddedFont(bold)})
+    yield writer.begin()
+    for content in iter_pdf_pages(slides, writer.fonts):
+        yield writer.page(content)
+    yield writer.end()
+
+
+# ===== RENDERERS (run in the worker processes) =====
+def render_pdf(slides: Slides, path: str):
+    # PDF export (requires reportlab to read and subset the fonts)
+    with open(path, "wb") as f:
+        for chunk in iter_pdf(slides):
+            f.write(chunk)
+
+
+def render_pptx(slides: Slides, path: str):
+    # PPTX export (requires python-pptx)
+    prs = pptx_presentation()()
+    for slide_data in slides:
+        slide = prs.slides.add_slide(prs.slide_layouts[1])
+        title = slide.shapes.title
+        title.text = slide_data['title']
+        content = slide.placeholders[1]
+        content.text = slide_data.get('content', '') or ''
+    prs.save(path)
+
+
+# Supported formats: renderer, file extension, media type and the package the renderer needs.
+EXPORT_FORMATS: Dict[str, Dict[str, Any]] = {
+    "pdf": {
+        "render": render_pdf,
+        "extension": "pdf",
+        "media_type": "application/pdf",
+        "requires": "reportlab",
+    },
+    "pptx": {
+        "render": render_pptx,
+        "extension": "pptx",
+        "media_type": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        "requires": "python-pptx",
+    },
+}
+
+
+def render_artifact(fmt: str, slides: Slides, path: str) -> int:
+    """
+    Renders to a temp file next to `path` and renames it into place, so a half-written artifact is never served.
+    Returns the artifact size in bytes.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        EXPORT_FORMATS[fmt]["render"](slides, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(path)
+
+
+def artifact_key(fmt: str, slides: Slides) -> str:
+    # Content address of an export: same slides + same format (+ same PDF fonts) = same file.
+    renderer = {"fonts": [PDF_FONT, PDF_BOLD_FONT]} if fmt == "pdf" else {}
+    payload = json.dumps({"format": fmt, "slides": slides, **renderer}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExportError(Exception):
+    pass
+
+
+class ExportJob:
+    def __init__(self, fmt: str, key: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.format = fmt
+        self.key = key
+        self.path = path
+        self.status = "queued"  # queued -> running -> done | failed
+        self.error: Optional[str] = None
+        self.cached = False
+        self.size: Optional[int] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "format": self.format,
+            "status": self.status,
+            "cached": self.cached,
+            "size": self.size,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ExportManager:
+    """
+    Runs export jobs in a process pool and keeps finished artifacts in `directory`, bounded by `max_bytes`.
+    Identical exports that are already running share one job, and so do repeated exports of a cached artifact.
+    """
+
+    def __init__(self, directory: str = "exports", workers: int = 2, max_bytes: int = 1024 * 1024 * 1024, job_ttl: float = 3600):
+        self.directory = directory
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.job_ttl = job_ttl
+        self.jobs: Dict[str, ExportJob] = {}
+        self._running: Dict[str, ExportJob] = {}  # artifact key -> running job
+        self._finished: Dict[str, str] = {}  # artifact key -> id of the job that last produced or served it
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._tasks: Set["asyncio.Task"] = set()  # Strong references - the event loop only holds tasks weakly.
+        self.cache_hits = 0
+        self.renders = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def warm_up(self) -> int:
+        """
+        Starts the worker processes and loads the rendering backends in each of them, so the first export
+        does not pay for process start-up and imports. The backends are also loaded here, for streamed PDFs.
+        Returns the number of worker processes that ran a warm-up task.
+        """
+        await asyncio.to_thread(warm_up_backends)
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        # One task per worker - submitted together, so the pool starts all of its processes.
+        pids = await asyncio.gather(*(loop.run_in_executor(pool, warm_up_backends) for _ in range(self.workers)))
+        return len(set(pids))
+
+    def shutdown(self):
+        # Cancels running jobs (their waiters see them fail) and stops the worker processes.
+        for task in list(self._tasks):
+            task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def artifact_path(self, fmt: str, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.{EXPORT_FORMATS[fmt]['extension']}")
+
+    def is_cached(self, fmt: str, slides: Slides) -> bool:
+        return os.path.exists(self.artifact_path(fmt, artifact_key(fmt, slides)))
+
+    def submit(self, fmt: str, slides: Slides) -> ExportJob:
+        """
+        Starts an export job (must be called from the event loop). Returns a finished job right away if the artifact is cached.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ExportError(f"Unknown export format '{fmt}'. Must be one of: {', '.join(EXPORT_FORMATS)}")
+        self._prune_jobs()
+        key = artifact_key(fmt, slides)
+        if key in self._running:
+            return self._running[key]
+        path = self.artifact_path(fmt, key)
+        if os.path.exists(path):
+            os.utime(path)  # Mark as recently used for the size-based cleanup.
+            self.cache_hits += 1
+            job = self.jobs.get(self._finished.get(key, ""))
+            if job is None:
+                job = ExportJob(fmt, key, path)
+                job.status, job.cached, job.size, job.finished_at = "done", True, os.path.getsize(path), time.time()
+                job.done.set()
+                self.jobs[job.id] = job
+                self._finished[key] = job.id
+            return job
+        job = ExportJob(fmt, key, path)
+        self.jobs[job.id] = job
+        self._running[key] = job
+        task = asyncio.get_running_loop().create_task(self._run(job, slides))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def wait(self, job: ExportJob) -> ExportJob:
+        await job.done.wait()
+        return job
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "jobs": len(self.jobs),
+            "running": len(self._running),
+            "workers": self.workers,
+            "cache_hits": self.cache_hits,
+            "renders": self.renders,
+        }
+
+    async def _run(self, job: ExportJob, slides: Slides):
+        job.status = "running"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            job.size = await loop.run_in_executor(self._get_pool(), render_artifact, job.format, slides, job.path)
+            metrics.export_render_duration.observe(time.perf_counter() - started, format=job.format, mode="job")
+            metrics.export_size.observe(job.size, format=job.format)
+            job.status = "done"
+            self._finished[job.key] = job.id
+            self.renders += 1
+        except asyncio.CancelledError:
+            job.status, job.error = "failed", "Export cancelled - the server is shutting down"
+            raise
+        except ImportError:
+            job.status, job.error = "failed", f"{EXPORT_FORMATS[job.format]['requires']} is required for {job.format.upper()} export. Please install it."
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+        finally:
+            job.finished_at = time.time()
+            self._running.pop(job.key, None)
+            job.done.set()
+        if job.status == "done":
+            await asyncio.to_thread(self._enforce_size_limit)
+
+    def stream_pdf(self, slides: Slides, memory_cap: int = 8 * 1024 * 1024) -> Iterator[bytes]:
+        """
+        Streams a PDF to the client page by page while spooling a copy (in memory up to `memory_cap`, then on disk)
+        that is added to the artifact cache once the export completes. Runs in the request threadpool.
+        """
+        key = artifact_key("pdf", slides)
+        path = self.artifact_path("pdf", key)
+        os.makedirs(self.directory, exist_ok=True)
+        started = time.perf_counter()
+        with tempfile.SpooledTemporaryFile(max_size=memory_cap, dir=self.directory) as spool:
+            for chunk in iter_pdf(slides):
+                spool.write(chunk)
+                yield chunk
+            metrics.export_render_duration.observe(time.perf_counter() - started, format="pdf", mode="stream")
+            metrics.export_size.observe(spool.tell(), format="pdf")
+            spool.seek(0)
+            tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    shutil.copyfileobj(spool, f)
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        self.renders += 1
+        self._enforce_size_limit()
+
+    def _enforce_size_limit(self):
+        # Deletes the least recently used artifacts once the export directory grows past max_bytes.
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.endswith(".tmp")]
+        except FileNotFoundError:
+            return
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            total -= entry.stat().st_size
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def _prune_jobs(self):
+        # Forgets finished jobs after job_ttl (their artifacts stay cached on disk).
+        cutoff = time.time() - self.job_ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished_at and job.finished_at < cutoff]:
+            job = self.jobs.pop(job_id)
+            if self._finished.get(job.key) == job_id:
+                del self._finished[job.key]
@@ -0,0 +1,204 @@
+'''
+Shared OpenAI client for the Pitch Deck Generator backend.
+
+One AsyncOpenAI client is created on first use (or by the app's warm-up) and reused by every AI endpoint,
+so all requests share one pooled set of HTTP connections instead of opening a new client
+(and new TLS connections) per request.
+
+Every call is admitted by one shared UpstreamScheduler (see scheduler.py), which applies the
+request/token rate limits, priorities, retries and the circuit breaker.
+'''
+
+import json
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI  # The library is imported when the client is created - it is the slowest import at startup.
+
+import metrics
+from scheduler import PRIORITY_STANDARD, UpstreamScheduler
+
+# Connection pool settings - tune these through the .env file.
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))  # Max concurrent connections to the OpenAI API.
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "50"))  # Idle connections kept open for reuse.
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))  # Seconds an idle connection is kept alive.
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))  # Seconds to wait for a new connection.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))  # Default per-call timeout in seconds.
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))  # Retries done by the scheduler (the openai library's own retries are off).
+
+# Shared upstream budget - set these to your OpenAI account's rate limits.
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "500"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "80000"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "1000"))  # Calls allowed to wait for capacity before new ones are rejected.
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", "0.5"))  # Seconds - first retry backoff, doubled on each attempt.
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))  # Consecutive failures that open the circuit.
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))  # Seconds the circuit stays open before a probe call.
+
+# Model name prefixes that accept a JSON-schema response_format; other models get the schema in the prompt.
+LLM_JSON_SCHEMA_MODELS = tuple(
+    prefix.strip() for prefix in os.getenv("LLM_JSON_SCHEMA_MODELS", "gpt-4o,gpt-4.1,o1,o3,o4").split(",") if prefix.strip()
+)
+
+scheduler = UpstreamScheduler(
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    max_queue=LLM_MAX_QUEUE,
+    max_retries=LLM_MAX_RETRIES,
+    retry_base=LLM_RETRY_BASE,
+    retry_max_delay=LLM_RETRY_MAX_DELAY,
+    failure_threshold=LLM_BREAKER_THRESHOLD,
+    reset_timeout=LLM_BREAKER_RESET,
+)
+
+_client: Optional["AsyncOpenAI"] = None
+_client_lock = threading.Lock()  # The warm-up creates the client in a worker thread while requests may ask for it.
+
+
+def create_client() -> "AsyncOpenAI":
+    """
+    Creates the app-lifetime AsyncOpenAI client with a pooled HTTP transport.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            return _client
+        from openai import AsyncOpenAI
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        )
+        _client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=http_client,
+            max_retries=0,  # Retries go through the scheduler so they count against the shared budget.
+        )
+    return _client
+
+
+def get_client() -> "AsyncOpenAI":
+    """
+    Returns the shared client, creating it on first use (main.warm_up can do this ahead of the first request).
+    """
+    return _client or create_client()
+
+
+async def close_client():
+    """
+    Closes the shared client and its connection pool (called on app shutdown).
+    """
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    # Rough upper bound used to reserve budget: ~4 characters per prompt token, plus the completion allowance.
+    return sum(len(message.get("content") or "") for message in messages) // 4 + max_tokens
+
+
+def structured_request(model: str, messages: List[Dict[str, str]], response_format: Optional[Dict[str, Any]]) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """
+    Messages and extra create() arguments for a call that should answer in JSON following `response_format`.
+    Models without structured outputs get the schema as a final system instruction instead.
+    """
+    if response_format is None:
+        return messages, {}
+    if model.startswith(LLM_JSON_SCHEMA_MODELS):
+        return messages, {"response_format": response_format}
+    schema = response_format["json_schema"]
+    instruction = f"Respond with only a JSON object named {schema['name']} that matches this JSON schema: {json.dumps(schema['schema'])}"
+    return [*messages, {"role": "system", "content": instruction}], {}
+
+
+async def chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = "gpt-4",
+    max_tokens: int = 2000,
+    timeout: Optional[float] = None,
+    priority: int = PRIORITY_STANDARD,
+    response_format: Optional[Dict[str, Any]] = None,
+):
+    """
+    Awaits a chat completion on the shared client. `timeout` overrides the default per-call timeout and
+    also bounds the time spent queueing and retrying. `response_format` asks for JSON following a schema.
+    """
+    timeout = timeout if timeout is not None else LLM_TIMEOUT
+    deadline = time.monotonic() + timeout
+    messages, extra = structured_request(model, messages, response_format)
+
+    async def create():
+        started = time.perf_counter()
+        try:
+            response = await get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                timeout=max(1.0, deadline - time.monotonic()),
+                **extra,
+            )
+        except Exception as e:
+            metrics.record_llm_call(model, False, time.perf_counter() - started, error=e)
+            raise
+        metrics.record_llm_call(model, False, time.perf_counter() - started, usage=getattr(response, "usage", None))
+        return response
+
+    return await scheduler.call(create, estimate_tokens(messages, max_tokens), priority, deadline)
+
+
+async def stream_chat_completion(
+    messages: List[Dict[str, str]],
+    model: str = "gpt-4",
+    max_tokens: int = 2000,
+    timeout: Optional[float] = None,
+    priority: int = PRIORITY_STANDARD,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> AsyncIterator[str]:
+    """
+    Streams a chat completion on the shared client, yielding the text deltas as they arrive.
+    Only opening the stream is retried - once text has been yielded, errors are raised to the caller.
+    """
+    timeout = timeout if timeout is not None else LLM_TIMEOUT
+    deadline = time.monotonic() + timeout
+    messages, extra = structured_request(model, messages, response_format)
+
+    started = time.perf_counter()
+
+    async def create():
+        nonlocal started
+        started = time.perf_counter()
+        try:
+            return await get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                timeout=max(1.0, deadline - time.monotonic()),
+                stream=True,
+                stream_options={"include_usage": True},  # The last chunk carries the token usage.
+                **extra,
+            )
+        except Exception as e:
+            metrics.record_llm_call(model, True, time.perf_counter() - started, error=e)
+            raise
+
+    stream = await scheduler.call(create, estimate_tokens(messages, max_tokens), priority, deadline)
+    usage = None
+    try:
+        async for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    except Exception as e:
+        metrics.record_llm_call(model, True, time.perf_counter() - started, error=e)
+        raise
+    metrics.record_llm_call(model, True, time.perf_counter() - started, usage=usage)
@@ -7,64 +7,151 @@ Deploy backend to a cloud platform such as AWS, Google Cloud, Azure, Heroku, etc
 Deploy frontend on a static hosting service such as Vercel, Netlify, etc. 
 '''
 
-from fastapi import FastAPI, HTTPException, Depends, Body, Request # Importing the FastAPI class and the HTTPException class. 
+import time # Importing the time library - used for the startup report.
+IMPORT_STARTED = time.perf_counter()  # Start of the main.py import (see startup_stats).
+
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Body, Request # Importing the FastAPI class and the HTTPException class. 
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Literal, Any
-from fastapi.responses import StreamingResponse
-import io
+from typing import List, Optional, Dict, Literal, Any, Tuple
+from fastapi.responses import StreamingResponse, Response, FileResponse
 import json
 import os
 import re
 
 # Unomitted: 
 
-import openai # Importing the openai library - to be implemented in the future. 
+# openai is not imported here - llm.py loads it with the shared client on first use (or during warm-up), which keeps cold starts fast.
 import os # Importing the os library - to be implemented in the future.
-from dotenv import load_dotenv # Importing the dotenv library - to be implemented in the future. 
-import time # Importing the time library - to be implemented in the future. 
 from functools import lru_cache # Importing the lru_cache decorator - to be implemented in the future. - this is a decorator that caches the results of a function call based on the input arguments. 
+from contextlib import asynccontextmanager # Used to run the app's startup and shutdown work.
 
-# Load environment variables from .env file. 
-load_dotenv()
+# Load environment variables from the .env file next to this module (skipped, along with the dotenv import, when there is none).
+ENV_FILE = os.getenv("ENV_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+if os.path.exists(ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(ENV_FILE)
 
-# Set your OpenAI API key. 
-openai.api_key = os.getenv("OPENAI_API_KEY") # This is the OpenAI API key in order to access the OpenAI API - this is a secret key that is stored in the .env file and is used to authenticate the user. 
+import llm # Shared AsyncOpenAI client with pooled connections (see llm.py) - imported after load_dotenv so it picks up the .env settings.
+from cache import DiskCache, ResponseCache, SemanticCache, SingleFlight, make_cache_key # Bounded LRU + TTL response cache, disk tier and single-flight (see cache.py).
+import asyncio
+from compression import CompressionMiddleware # Negotiated brotli/gzip compression (see compression.py).
+import hashlib
+from exports import EXPORT_FORMATS, ExportJob, ExportManager # Background export jobs (see exports.py).
+from storage import SlideNotFound, VersionConflict, create_store, migrate_json_file # Pluggable per-user storage (see storage.py).
+from scheduler import PRIORITY_BACKGROUND, PRIORITY_BATCH, PRIORITY_INTERACTIVE, SchedulerError, is_openai_error # Shared rate limits, priorities, retries and circuit breaker (see scheduler.py).
+import metrics # Prometheus metrics and the slow-request profiler (see metrics.py).
+import routing # Per-route model choice from latency/cost SLOs, with escalation on invalid answers (see routing.py).
+import structured # JSON-schema answers and the incremental, truncation-repairing parser (see structured.py).
+from prefetch import PrefetchJob, Prefetcher # Speculative background calls after deck generation (see prefetch.py).
+from context import ContextStore, DeckContext, SQLiteContextTier, deck_messages, estimate_tokens # Stored deck contexts and prefix-first prompts (see context.py).
 
 # End of unomitted.
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    # The shared AsyncOpenAI client is created on first use (llm.get_client) or by the warm-up below.
+    # Background TTL sweep for the response cache.
+    sweeper = asyncio.create_task(response_cache.sweep_forever(CACHE_SWEEP_INTERVAL))
+    tombstone_sweeper = asyncio.create_task(purge_tombstones_forever())
+    if disk_cache is not None:
+        disk_cache.start()
+    # One-shot import of the legacy user_data.json into the user store.
+    migrated = await asyncio.to_thread(migrate_json_file, DATA_FILE, user_store)
+    if migrated:
+        print(f"Migrated {migrated} users from {DATA_FILE} into the {USER_STORE} user store")
+    if WARMUP_ON_STARTUP:
+        # Runs next to the first requests instead of delaying readiness.
+        warmup_task = asyncio.ensure_future(warm_up())
+        background_tasks.add(warmup_task)
+        warmup_task.add_done_callback(_finish_background)
+    record_startup("startup", time.perf_counter() - started)
+    record_startup("ready", time.perf_counter() - IMPORT_STARTED)
+    print(f"Startup: ready {startup_timings['ready']:.3f}s after import began "
+          f"(import {startup_timings['import']:.3f}s, create_app {startup_timings['create_app']:.3f}s, startup {startup_timings['startup']:.3f}s)")
+    yield
+    sweeper.cancel()
+    tombstone_sweeper.cancel()
+    if disk_cache is not None:
+        disk_cache.stop()  # Flushes any queued writes.
+    export_manager.shutdown()  # Cancels running export jobs and stops the worker processes.
+    await llm.close_client()
+
+# Every endpoint is registered on this router; create_app() (bottom of the file) builds the FastAPI app around it.
+api = APIRouter()
+
+# CORS origins allowed to call the API from the frontend.
+CORS_ORIGINS = ["http://localhost:3000"] # Need to eventually change this to production URL such as "https://pitchdeck.com" - your public domain.
+
+# Compress large JSON bodies and exports (brotli if installed, otherwise gzip).
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # Bytes - smaller responses are sent as they are.
 
-# Add CORS middleware to allow requests from the frontend. 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"], # Need to eventually change this to production URL such as "https://pitchdeck.com" - your public domain.
-    allow_credentials=True,
-    allow_methods=["GET", "POST", "OPTIONS"],  # Explicitly allow OPTIONS (eventually change to "*" to allow all methods)
-    allow_headers=["*"],
+# Per-route latency, status and in-flight metrics.
+# METRICS_PROFILE_SAMPLE_RATE > 0 profiles that share of requests and keeps the slowest ones (see /metrics/slow-requests).
+slow_request_profiler = metrics.SlowRequestProfiler(
+    sample_rate=float(os.getenv("METRICS_PROFILE_SAMPLE_RATE", "0")),
+    keep=int(os.getenv("METRICS_PROFILE_KEEP", "20")),
+    min_seconds=float(os.getenv("METRICS_PROFILE_MIN_SECONDS", "0.5")),
+    directory=os.getenv("METRICS_PROFILE_DIR", ""),
 )
 
 # ===== MODELS =====
 class SlideRequest(BaseModel):  # creating a class called SlideRequest.
     problem: str # Create a new String for the object. 
     solution: str # Create a new String for the object. 
+    userId: str = "demo"  # Signed-in user - with contextId, decides who owns the prefetched follow-up calls (see PREFETCH).
+    contextId: Optional[str] = None  # Store the generated deck as this deck context (see DECK CONTEXT).
 
 class SlideContentRequest(BaseModel):
-    problem: str
-    solution: str
+    problem: str = ""  # May be left out when contextId is given.
+    solution: str = ""
     slide_title: str
-    current_content: Optional[str] = None
+    current_content: Optional[str] = None  # Taken from the deck context when left out.
     mode: Optional[str] = None  # New: mode can be 'optimize', 'improve', or None
+    contextId: Optional[str] = None  # Stored deck context (POST /deck-context) that fills in the fields above.
 
 class Slide(BaseModel):
     problem: str
     content: Optional[str] = None
     design: Optional[str] = None
 
+class SlideContentBatchRequest(BaseModel):
+    items: List[SlideContentRequest]
+    include_design: bool = False  # Also generate design suggestions for each slide.
+    concurrency: Optional[int] = None  # Max items generated at once (capped by BATCH_MAX_CONCURRENCY).
+
+# ===== Deck Patches =====
+class SlideChange(BaseModel):
+    op: Literal["insert", "update", "delete"]
+    id: Optional[str] = None  # Slide id - required for update/delete, optional for insert.
+    index: Optional[int] = None  # Insert position (default: end of the deck).
+    slide: Optional[Dict[str, Any]] = None  # Full slide for insert, changed fields only for update.
+
+class SlidePatchRequest(BaseModel):
+    userId: str = "demo"
+    baseVersion: int  # Deck version the changes were made against.
+    changes: List[SlideChange]
+    contextId: Optional[str] = None  # Deck context kept in step with the patched deck (see DECK CONTEXT).
+
+# ===== Deck Context =====
+class DeckContextRequest(BaseModel):
+    contextId: Optional[str] = None  # Deck or session id - generated if left out.
+    problem: str
+    solution: str
+    slides: List[Dict[str, str]] = []  # Each slide: {title, content}
+
+class DeckContextSlidesRequest(BaseModel):
+    slides: List[Dict[str, Optional[str]]]  # Each slide: {title, content} - a null content removes the slide.
+
 # ===== Slide Analysis =====
 class SlideAnalysisRequest(BaseModel):
     slides: List[Dict[str, str]]  # Each slide: {title, content}
 
+class ExportJobRequest(BaseModel):
+    slides: List[Dict[str, str]]  # Each slide: {title, content}
+    format: Literal["pdf", "pptx"] = "pdf"
+
 class SlideAnalysisResponse(BaseModel):
     score: float
     narrative_flow: str
@@ -117,55 +204,73 @@ async def generate_slides(request: SlideRequest):
 
 # To be unomitted:
 
+# This is the auto-generated system prompt sent to the OpenAI API behind the scenes, with the user's input for problem and solution being passed in along with the system prompt to generate the slides. 
+def build_slides_messages(request: SlideRequest) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": "You are a pitch deck expert. You are given a problem statement and a solution to the problem. You are to generate content for all slides in a startup pitch deck. For each slide, provide a compelling headline and 2-3 bullet points of key information. Make the content concise, impactful, and investor-ready, ensuring the slides are engaging and can instantly grab the attention of the audience and investors."},
+        {"role": "user", "content": f"Generate content for all slides in a pitch deck about: Problem: '{request.problem}', Solution: '{request.solution}'. For each slide, provide its title, a compelling headline and 2-3 bullet points of key information. The slides should be, in this order: The Problem, Our Solution, Product Demo, Market Opportunity, Traction, Customer Love, Competitive Landscape, Business Model, Financial Projections, Go-to-Market Strategy, Team, Funding Ask, and Thank You."}
+    ]
+
+# Slides are generated as {"slides": [{title, headline, bullets}]} with the title limited to STANDARD_SLIDES.
+SLIDES_RESULT_VERSION = 2  # Bumped when the cached /generate-slides result changes shape (2: one line per slide).
+SLIDES_FORMAT = structured.response_format(structured.SLIDES_SCHEMA_NAME, structured.slides_schema(STANDARD_SLIDES))
+
+def missing_standard_slides(slides: List[structured.GeneratedSlide]) -> List[str]:
+    # Standard slides the model did not generate (these get back-filled at the end of the deck).
+    generated = {slide.title.lower() for slide in slides}
+    return [title for title in STANDARD_SLIDES if title.lower() not in generated]
+
+def deck_result(slides: List[structured.GeneratedSlide]) -> dict:
+    # "slides" keeps the line format the frontend reads (one line per slide); "deck" holds the typed slides.
+    return {"slides": [slide.line() for slide in slides] + missing_standard_slides(slides), "deck": [slide.model_dump() for slide in slides]}
+
 # This is a function that generates slides using OpenAI API. 
-@app.post("/generate-slides")
-async def generate_slides(request: SlideRequest):
+# Pass ?stream=true to receive the slides as Server-Sent Events while they are being generated.
+@api.post("/generate-slides")
+async def generate_slides(request: SlideRequest, stream: bool = False):
     try:
         # Create a cache key from the request data - Cache Responses to save API costs
-        cache_key = f"{request.problem}:{request.solution}"
+        cache_key = make_cache_key("generate-slides", SLIDES_RESULT_VERSION, request.problem, request.solution)
         
         # Check if we have a cached response
-        cached_response = get_cached_response(cache_key)
+        near = ((), f"{request.problem}\n{request.solution}")
+        cached_response = await get_cached_response(cache_key, near)
+        if stream:
+            return sse_response(stream_slides(request, cache_key, cached_response, near))
         if cached_response:
+            await remember_generated_deck(request, cached_response["slides"])
+            schedule_prefetch(request, cached_response["slides"])
             return cached_response
 
-        # Call OpenAI API to generate content for each slide. 
-        client = openai.OpenAI()  # Initialize the client
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4", # Using model gpt-4 to generate the slides. 
-            messages=[
-                # This is the auto-generated system prompt sent to the OpenAI API behind the scenes, with the user's input for problem and solution being passed in along with the system prompt to generate the slides. 
-                {"role": "system", "content": "You are a pitch deck expert. You are given a problem statement and a solution to the problem. You are to generate content for all slides in a startup pitch deck. For each slide, provide a compelling headline and 2-3 bullet points of key information. Make the content concise, impactful, and investor-ready, ensuring the slides are engaging and can instantly grab the attention of the audience and investors."},
-                {"role": "user", "content": f"Generate content for all slides in a pitch deck about: Problem: '{request.problem}', Solution: '{request.solution}'. For each slide, provide a compelling headline and 2-3 bullet points of key information. The slides should be: The Problem, Our Solution, Product Demo, Market Opportunity, Traction, Customer Love, Competitive Landscape, Business Model, Financial Projections, Go-to-Market Strategy, Team, Funding Ask, and Thank You."}
-            ],
-            max_tokens=2000, # This is the maximum number of tokens that can be generated. 
-        )
-        except Exception as api_error:
-            print(f"OpenAI API Error: {str(api_error)}")  # Print the error for debugging
-            raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(api_error)}")
-
-        # Extract the generated content and split into slides
-        if not response.choices or not response.choices[0].message:
-            raise HTTPException(status_code=500, detail="No response content received from OpenAI")
-            
-        generated_text = response.choices[0].message.content
-        if not generated_text:
-            raise HTTPException(status_code=500, detail="Empty response content received from OpenAI")
-            
-        slides = [slide.strip() for slide in generated_text.split('\n') if slide.strip()]
-        
-        # Ensure we have all standard slides
-        missing_slides = [slide for slide in STANDARD_SLIDES if not any(slide.lower() in s.lower() for s in slides)]
-        if missing_slides:
-            # Add any missing standard slides
-            slides.extend(missing_slides)
+        # Identical in-flight requests share one upstream call (single-flight).
+        async def generate():
+            # Call OpenAI API to generate content for each slide (shared async client - does not block the event loop). 
+            try:
+                # The model comes from the route's routing config (GPT-4 unless LLM_ROUTE_MODELS says otherwise).
+                # A truncated answer is repaired by the parser; one with no usable slide is retried on the next model tier.
+                _, slides, _ = await routing.routed_completion(
+                    "generate-slides",
+                    build_slides_messages(request),
+                    max_tokens=2000, # This is the maximum number of tokens that can be generated. 
+                    timeout=120,
+                    validate=structured.parse_slides,
+                    response_format=SLIDES_FORMAT,
+                )
+            except Exception as api_error:
+                print(f"OpenAI API Error: {str(api_error)}")  # Print the error for debugging
+                raise upstream_error(api_error)
 
-        result = {"slides": slides}
+            # Ensure we have all standard slides (missing ones are back-filled at the end)
+            result = deck_result(slides)
         
-        # Cache the response - Cache Responses to save API costs
-        cache_response(cache_key, result)
+            # Cache the response - Cache Responses to save API costs
+            cache_response(cache_key, result, near)
         
+            return result
+
+        result = await inflight.do(cache_key, generate)
+        await remember_generated_deck(request, result["slides"])
+        schedule_prefetch(request, result["slides"])
         return result
     except HTTPException as he:
         # Re-raise HTTP exceptions
@@ -178,80 +283,375 @@ async def generate_slides(request: SlideRequest):
         print(f"Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-# Simple in-memory cache implementation - Cache Responses to save API costs
-_response_cache = {}
-_cache_ttl = 3600  # Cache TTL in seconds (1 hour)
+# ===== STREAMING (SERVER-SENT EVENTS) =====
+def sse_event(event: str, data: Any) -> str:
+    # Formats one Server-Sent Event with a JSON payload.
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-def get_cached_response(key: str):
-    if key in _response_cache:
-        timestamp, response = _response_cache[key]
-        if time.time() - timestamp < _cache_ttl:
-            return response
-        else:
-            del _response_cache[key]
-    return None
+def sse_response(events) -> StreamingResponse:
+    # Wraps an async generator of SSE strings; disables proxy buffering so each event is flushed straight away.
+    return StreamingResponse(events, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-def cache_response(key: str, response: dict):
-    _response_cache[key] = (time.time(), response)
+def slide_event(index: int, slide: structured.GeneratedSlide) -> str:
+    return sse_event("slide", {"index": index, "lines": [slide.line()], "slide": slide.model_dump()})
 
-# ===== AI IMPLEMENTATION - SLIDE CONTENT ENDPOINT =====
-@app.post("/generate-slide-content")
-async def generate_slide_content(request: SlideContentRequest):
+async def stream_slides(request: SlideRequest, cache_key: str, cached_response: Optional[dict] = None, near: Optional[Tuple[tuple, str]] = None):
+    """
+    Emits one `slide` event per completed slide and a final `done` event with the full slide list
+    (including the STANDARD_SLIDES back-fill). The full result is cached once the stream finishes.
+    """
     try:
-        # Validate slide title is in standard slides
-        if request.slide_title not in STANDARD_SLIDES:
-            raise HTTPException(status_code=400, detail=f"Invalid slide title. Must be one of: {', '.join(STANDARD_SLIDES)}")
+        if cached_response:
+            # Cache hit - replay the cached deck slide by slide.
+            yield sse_event("meta", {"cached": True})
+            slides = [structured.GeneratedSlide.model_validate(slide) for slide in cached_response.get("deck", [])]
+            for index, slide in enumerate(slides):
+                yield slide_event(index, slide)
+            yield sse_event("done", {"slides": cached_response["slides"], "backfill": missing_standard_slides(slides)})
+            await remember_generated_deck(request, cached_response["slides"])
+            schedule_prefetch(request, cached_response["slides"])
+            return
 
-        # Adjust prompt based on mode
-        if request.mode == "optimize":
-            prompt = f"""Given the pitch deck titled '{request.problem}' with description: '{request.solution}',\n"""
-            if request.current_content:
-                prompt += f"and the current content of the slide '{request.slide_title}': '{request.current_content}',\n"
-            prompt += "Please optimize this slide to be more compelling and persuasive for investors. Focus on what investors care about most: market size, traction, defensibility, and growth potential. Provide a compelling headline and 2-3 bullet points of key information."
-        elif request.mode == "improve":
-            prompt = f"""Given the pitch deck titled '{request.problem}' with description: '{request.solution}',\n"""
-            if request.current_content:
-                prompt += f"and the current content of the slide '{request.slide_title}': '{request.current_content}',\n"
-            prompt += "Please improve the messaging of this slide to be clearer, more persuasive, and more memorable. Provide a compelling headline and 2-3 bullet points of key information."
-        else:
-            # Default: generate or regenerate content
-            if request.current_content:
-                prompt = f"""Given the pitch deck titled '{request.problem}' with description: '{request.solution}',\n"""
-                prompt += f"and the current content of the slide '{request.slide_title}': '{request.current_content}',\n"
-                prompt += "please improve and enhance this slide's content while maintaining its core message. Make it more engaging and impactful for investors. Provide a compelling headline and 2-3 bullet points of key information."
+        # Each slide is sent as soon as the parser sees its closing brace.
+        parser = structured.JSONStreamParser(item_depth=structured.SLIDE_ITEM_DEPTH)
+        slides: List[structured.GeneratedSlide] = []
+        items = 0
+        async for chunk in routing.routed_stream("generate-slides", build_slides_messages(request), max_tokens=2000, timeout=120,
+                                                 response_format=SLIDES_FORMAT):
+            for item in parser.feed(chunk):
+                items += 1
+                slide = structured.to_slide(item)
+                if slide:
+                    yield slide_event(len(slides), slide)
+                    slides.append(slide)
+        try:
+            # A truncated stream is repaired; its last, partial slide is sent if it has a title.
+            for item in structured.slide_items(parser.finish())[items:]:
+                slide = structured.to_slide(item)
+                if slide:
+                    yield slide_event(len(slides), slide)
+                    slides.append(slide)
+            if parser.repaired:
+                structured.output_repairs.inc(schema=structured.SLIDES_SCHEMA_NAME)
+        except ValueError:
+            pass
+        if not slides:
+            yield sse_event("error", {"detail": "Empty response content received from OpenAI"})
+            return
+        result = deck_result(slides)
+        cache_response(cache_key, result, near)
+        yield sse_event("done", {"slides": result["slides"], "backfill": missing_standard_slides(slides)})
+        await remember_generated_deck(request, result["slides"])
+        schedule_prefetch(request, result["slides"])
+    except Exception as e:
+        print(f"Error while streaming slides: {str(e)}")
+        error = upstream_error(e)
+        yield sse_event("error", {"status": error.status_code, "detail": error.detail})
+
+# Bounded in-memory cache shared by every AI endpoint - Cache Responses to save API costs
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(50 * 1024 * 1024)))  # 50 MB
+CACHE_TTL = float(os.getenv("CACHE_TTL", "3600"))  # Cache TTL in seconds (1 hour)
+CACHE_SWEEP_INTERVAL = float(os.getenv("CACHE_SWEEP_INTERVAL", "60"))  # Seconds between background TTL sweeps
+
+response_cache = ResponseCache(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_TTL)
+
+# Optional second-level cache on local disk, shared by all workers on the node and kept across restarts.
+# Enabled by setting CACHE_DB_PATH (e.g. CACHE_DB_PATH=cache.db).
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "")
+CACHE_DB_TTL = float(os.getenv("CACHE_DB_TTL", "86400"))  # 24 hours
+CACHE_DB_MAX_BYTES = int(os.getenv("CACHE_DB_MAX_BYTES", str(500 * 1024 * 1024)))  # 500 MB
+CACHE_DB_FLUSH_INTERVAL = float(os.getenv("CACHE_DB_FLUSH_INTERVAL", "1"))  # Seconds between write-behind flushes
+CACHE_DB_COMPACT_INTERVAL = float(os.getenv("CACHE_DB_COMPACT_INTERVAL", "300"))  # Seconds between compactions
+
+disk_cache = DiskCache(
+    CACHE_DB_PATH,
+    ttl=CACHE_DB_TTL,
+    max_bytes=CACHE_DB_MAX_BYTES,
+    flush_interval=CACHE_DB_FLUSH_INTERVAL,
+    compact_interval=CACHE_DB_COMPACT_INTERVAL,
+) if CACHE_DB_PATH else None
+
+# Concurrent cache misses for the same key await one upstream call instead of each calling OpenAI.
+inflight = SingleFlight()
+
+# Opt-in near-duplicate matching: prompts that differ only slightly from a cached one reuse its response.
+# Enabled per endpoint (cache key namespace), e.g. SEMANTIC_CACHE_ENDPOINTS=generate-slides,generate-suggestion
+SEMANTIC_CACHE_ENDPOINTS = {name.strip() for name in os.getenv("SEMANTIC_CACHE_ENDPOINTS", "").split(",") if name.strip()}
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.75"))  # Estimated Jaccard similarity (0-1).
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+
+semantic_cache = SemanticCache(threshold=SEMANTIC_CACHE_THRESHOLD, max_entries=SEMANTIC_CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+
+# A `near` argument is (exact_parts, text): fields that must match exactly (slide title, mode...) and the free text
+# that may differ slightly.
+NearKey = Tuple[tuple, str]
+
+def semantic_scope(key: str, exact_parts: tuple) -> Optional[str]:
+    namespace = key.split(":", 1)[0]
+    if namespace not in SEMANTIC_CACHE_ENDPOINTS:
+        return None
+    return make_cache_key(namespace, *exact_parts)
+
+async def get_cached_response(key: str, near: Optional[NearKey] = None):
+    cached = response_cache.get(key)
+    if cached is None and disk_cache is not None:
+        # Read-through: fall back to the disk tier and promote hits into memory.
+        cached = await asyncio.to_thread(disk_cache.get, key)
+        if cached is not None:
+            response_cache.set(key, cached)
+    if cached is None and near is not None:
+        scope = semantic_scope(key, near[0])
+        match = semantic_cache.lookup(scope, near[1]) if scope else None
+        if match is not None:
+            cached = await get_cached_response(match[0])
+            if cached is None:
+                semantic_cache.discard(match[0])  # Its response has been evicted.
             else:
-                prompt = f"""Given the pitch deck titled '{request.problem}' with description: '{request.solution}',\n"""
-                prompt += f"please generate detailed content for the slide '{request.slide_title}'. Make it engaging and impactful for investors. Provide a compelling headline and 2-3 bullet points of key information."
-
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a pitch deck expert. Generate compelling and concise content for individual slides."},
-                {"role": "user", "content": prompt}
-            ],
+                response_cache.set(key, cached)  # Exact repeats of this prompt now hit directly.
+    if cached is not None:
+        prefetcher.record_hit(key)
+    return cached
+
+def cache_response(key: str, response: dict, near: Optional[NearKey] = None):
+    response_cache.set(key, response)
+    if disk_cache is not None:
+        disk_cache.put(key, response)  # Write-behind - persisted by the disk cache's writer thread.
+    if near is not None:
+        scope = semantic_scope(key, near[0])
+        if scope:
+            semantic_cache.add(scope, near[1], key)
+
+# ===== UPSTREAM ERRORS =====
+# Every OpenAI call goes through llm.scheduler, which retries rate limits and transient errors before they get here.
+def upstream_error(e: Exception) -> HTTPException:
+    # Maps an exception from a generation call to the HTTP error returned to the client.
+    if isinstance(e, HTTPException):
+        return e
+    if isinstance(e, SchedulerError):
+        # Circuit open or queue full - fail fast and tell the client when to come back.
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(int(e.retry_after + 0.5))})
+    if isinstance(e, asyncio.TimeoutError):
+        return HTTPException(status_code=504, detail="The AI service took too long to respond. Please try again.")
+    if not is_openai_error(e):
+        return HTTPException(status_code=500, detail=str(e))
+    import openai  # Already loaded by the client that raised `e` - imported here so main.py does not pay for it at startup.
+    if isinstance(e, openai.RateLimitError):
+        return HTTPException(status_code=429, detail="API rate limit exceeded. Please try again later.", headers={"Retry-After": "10"})
+    if isinstance(e, openai.APITimeoutError):
+        return HTTPException(status_code=504, detail="The AI service took too long to respond. Please try again.")
+    if isinstance(e, openai.APIError):
+        return HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
+    return HTTPException(status_code=500, detail=str(e))
+
+def is_upstream_error(e: Exception) -> bool:
+    # Errors from the OpenAI API or the scheduler (as opposed to bugs in the endpoint itself).
+    if isinstance(e, (SchedulerError, asyncio.TimeoutError)):
+        return True
+    if not is_openai_error(e):
+        return False
+    import openai
+    return isinstance(e, openai.APIError)
+
+@api.get("/llm-stats")
+async def llm_stats():
+    # Queue depth, in-flight calls, adaptive rate, retries and circuit breaker state of the shared upstream scheduler.
+    return {**llm.scheduler.stats(), "deadlines": deadline_stats, "background_calls": len(background_tasks), "routing": routing.router.stats(), "prefetch": prefetcher.stats(),
+            "deck_context": deck_contexts.stats()}
+
+@api.get("/cache-stats")
+async def cache_stats():
+    # Hit/miss/eviction counters for the response cache, plus single-flight coalescing counters.
+    stats = {**response_cache.stats(), "singleflight": inflight.stats(), "semantic": {**semantic_cache.stats(), "endpoints": sorted(SEMANTIC_CACHE_ENDPOINTS)}}
+    if disk_cache is not None:
+        stats["disk"] = await asyncio.to_thread(disk_cache.stats)
+    return stats
+
+# ===== DECK CONTEXT =====
+# Clients store the deck once and pass `contextId` to the per-slide endpoints instead of re-sending the problem,
+# solution and slide content. Prompts put the shared system text and the deck first, so calls for one deck share
+# a prefix the provider can cache (see context.py).
+DECK_CONTEXT_MAX_ENTRIES = int(os.getenv("DECK_CONTEXT_MAX_ENTRIES", "1000"))
+DECK_CONTEXT_TTL = float(os.getenv("DECK_CONTEXT_TTL", "3600"))  # Seconds a context is kept after its last use.
+# SQLite file shared by all workers on the node. Empty keeps contexts in each worker's memory - only for a single
+# worker or sticky sessions, since a contextId stored on one worker is unknown to the others.
+DECK_CONTEXT_DB_PATH = os.getenv("DECK_CONTEXT_DB_PATH", "deck_contexts.db")
+
+deck_contexts = ContextStore(
+    max_entries=DECK_CONTEXT_MAX_ENTRIES,
+    ttl=DECK_CONTEXT_TTL,
+    shared=SQLiteContextTier(DECK_CONTEXT_DB_PATH) if DECK_CONTEXT_DB_PATH else None,
+)
+
+async def load_deck_context(context_id: str, count: bool = True, required: bool = True) -> Optional[DeckContext]:
+    """
+    The stored context. If it is unknown or expired: None when the request can do without it (it sent the fields
+    itself), else a 404 telling the client to store it again. `count` records a store hit/miss.
+    """
+    deck_context = await deck_contexts.get(context_id, count=count)
+    if deck_context is None and required:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired deck context '{context_id}'. Store it again with POST /deck-context.")
+    return deck_context
+
+def deck_context_summary(deck_context: DeckContext) -> Dict[str, Any]:
+    # What the write endpoints return: the id, the version and the size in tokens (not the whole deck).
+    return {"contextId": deck_context.id, "version": deck_context.version, "tokens": deck_context.tokens()}
+
+async def resolve_slide_request(request: SlideContentRequest, endpoint: str) -> Tuple[SlideContentRequest, DeckContext]:
+    """
+    The request with the fields it left out taken from its deck context, and the context to build the prompt on.
+    Requests without a contextId (or whose context is gone) get a context made of their own problem and solution.
+    """
+    inline = bool(request.problem and request.solution)
+    deck_context = await load_deck_context(request.contextId, required=not inline) if request.contextId else None
+    if deck_context is None:
+        if not inline:
+            raise HTTPException(status_code=400, detail="problem and solution are required unless a contextId is given")
+        return request, DeckContext("", request.problem, request.solution)
+    filled = {
+        "problem": request.problem or deck_context.problem,
+        "solution": request.solution or deck_context.solution,
+        "current_content": request.current_content if request.current_content is not None else deck_context.slide_content(request.slide_title),
+    }
+    deck_contexts.record_saved(endpoint, sum(estimate_tokens(value) for field, value in filled.items() if value != getattr(request, field)))
+    return request.model_copy(update=filled), deck_context
+
+def slide_reference(deck_context: DeckContext, title: str, content: Optional[str]) -> str:
+    # Names the slide; its content is repeated only when the deck context does not already hold it.
+    if not content:
+        return f"the slide '{title}'"
+    if deck_context.slide_content(title) == content:
+        return f"the slide '{title}' (its current content is in the deck above)"
+    return f"the slide '{title}' with current content: '{content}'"
+
+@api.post("/deck-context")
+async def put_deck_context(request: DeckContextRequest):
+    # Stores (or replaces) a deck context. Returns its id, version and size in tokens.
+    return deck_context_summary(await deck_contexts.put(request.contextId, request.problem, request.solution, request.slides))
+
+@api.post("/deck-context/{context_id}/slides")
+async def update_deck_context_slides(context_id: str, request: DeckContextSlidesRequest):
+    # Updates individual slides after an edit, so the next calls see the new content.
+    await load_deck_context(context_id, count=False)
+    deck_context = await deck_contexts.update_slides(context_id, {slide.get("title") or "": slide.get("content") for slide in request.slides})
+    return deck_context_summary(deck_context)
+
+@api.get("/deck-context/{context_id}")
+async def get_deck_context(context_id: str):
+    return (await load_deck_context(context_id)).to_dict()
+
+async def remember_generated_deck(request: SlideRequest, lines: List[str]):
+    # Stores a freshly generated deck as the context the client asked for, with each slide as the editor will show it.
+    if request.contextId:
+        blocks = editor_slide_blocks(lines)
+        await deck_contexts.put(request.contextId, request.problem, request.solution,
+                          [{"title": title, "content": "\n\n".join(blocks[title])} for title in STANDARD_SLIDES])
+
+# ===== AI IMPLEMENTATION - SLIDE CONTENT ENDPOINT =====
+def build_slide_content_messages(request: SlideContentRequest, deck_context: DeckContext) -> List[Dict[str, str]]:
+    # The deck comes first (the cacheable prefix); the slide and what to do with it come last.
+    slide = slide_reference(deck_context, request.slide_title, request.current_content)
+    # Adjust prompt based on mode
+    if request.mode == "optimize":
+        task = f"Please optimize {slide} to be more compelling and persuasive for investors. Focus on what investors care about most: market size, traction, defensibility, and growth potential."
+    elif request.mode == "improve":
+        task = f"Please improve the messaging of {slide} to be clearer, more persuasive, and more memorable."
+    elif request.current_content:
+        # Default: generate or regenerate content
+        task = f"Please improve and enhance {slide} while maintaining its core message. Make it more engaging and impactful for investors."
+    else:
+        task = f"Please generate detailed content for {slide}. Make it engaging and impactful for investors."
+    task += " Provide a compelling headline and 2-3 bullet points of key information."
+    return deck_messages(
+        deck_context,
+        "You are a pitch deck expert. Generate compelling and concise content for individual slides.",
+        task,
+    )
+
+def slide_content_cache_key(request: SlideContentRequest) -> str:
+    return make_cache_key("generate-slide-content", request.problem, request.solution, request.slide_title, request.current_content, request.mode)
+
+def slide_near_key(request: SlideContentRequest, *exact_parts) -> NearKey:
+    # Near-duplicate matching for per-slide prompts: the pitch and current content may be reworded.
+    return (exact_parts, f"{request.problem}\n{request.solution}\n{request.current_content or ''}")
+
+async def fetch_slide_content(request: SlideContentRequest, priority: int = PRIORITY_INTERACTIVE, deck_context: Optional[DeckContext] = None) -> dict:
+    # Cached, single-flight slide content generation (shared by the single and batch endpoints).
+    # `deck_context` is passed when the request was already resolved (see resolve_slide_request).
+    if deck_context is None:
+        request, deck_context = await resolve_slide_request(request, "generate-slide-content")
+    cache_key = slide_content_cache_key(request)
+    near = slide_near_key(request, request.slide_title, request.mode)
+    cached_response = await get_cached_response(cache_key, near)
+    if cached_response:
+        return cached_response
+
+    async def generate():
+        content, _, _ = await routing.routed_completion(
+            "generate-slide-content",
+            build_slide_content_messages(request, deck_context),
             max_tokens=2000,
+            timeout=120,
+            priority=priority,
         )
 
-        content = response.choices[0].message.content.strip()
-        return {"content": content}
-    except openai.error.RateLimitError:
-        raise HTTPException(status_code=429, detail="API rate limit exceeded. Please try again later.")
-    except openai.error.APIError as e:
-        raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        result = {"content": content}
+        cache_response(cache_key, result, near)
+        return result
 
-# ===== AI IMPLEMENTATION - DESIGN SUGGESTIONS ENDPOINT =====
-@app.post("/generate-design-suggestions")
-async def generate_design_suggestions(request: SlideContentRequest):
+    return await inflight.do(cache_key, generate)
+
+# Pass ?stream=true to receive the content as Server-Sent Events (`delta` events, then a final `done` event).
+@api.post("/generate-slide-content")
+async def generate_slide_content(request: SlideContentRequest, stream: bool = False):
     try:
         # Validate slide title is in standard slides
         if request.slide_title not in STANDARD_SLIDES:
             raise HTTPException(status_code=400, detail=f"Invalid slide title. Must be one of: {', '.join(STANDARD_SLIDES)}")
 
-        prompt = f"""Given the pitch deck titled '{request.problem}' with description: '{request.solution}',
-        and the slide '{request.slide_title}' with content: '{request.current_content}',
-        provide specific design suggestions to make this slide more visually appealing and effective.
+        request, deck_context = await resolve_slide_request(request, "generate-slide-content")
+        if stream:
+            cache_key = slide_content_cache_key(request)
+            cached_response = await get_cached_response(cache_key, slide_near_key(request, request.slide_title, request.mode))
+            return sse_response(stream_slide_content(request, deck_context, cache_key, cached_response))
+        return await fetch_slide_content(request, deck_context=deck_context)
+    except Exception as e:
+        raise upstream_error(e)
+
+async def stream_slide_content(request: SlideContentRequest, deck_context: DeckContext, cache_key: str, cached_response: Optional[dict] = None):
+    """
+    Emits `delta` events with the text as it is generated and a final `done` event with the full content.
+    """
+    try:
+        if cached_response:
+            yield sse_event("done", {"content": cached_response["content"], "cached": True})
+            return
+        parts: List[str] = []
+        async for chunk in routing.routed_stream("generate-slide-content", build_slide_content_messages(request, deck_context), max_tokens=2000, timeout=120, priority=PRIORITY_INTERACTIVE):
+            parts.append(chunk)
+            yield sse_event("delta", {"text": chunk})
+        result = {"content": "".join(parts).strip()}
+        cache_response(cache_key, result, slide_near_key(request, request.slide_title, request.mode))
+        yield sse_event("done", result)
+    except Exception as e:
+        error = upstream_error(e)
+        yield sse_event("error", {"status": error.status_code, "detail": error.detail})
+
+# ===== AI IMPLEMENTATION - DESIGN SUGGESTIONS ENDPOINT =====
+def design_suggestions_cache_key(request: SlideContentRequest) -> str:
+    return make_cache_key("generate-design-suggestions", request.problem, request.solution, request.slide_title, request.current_content)
+
+async def fetch_design_suggestions(request: SlideContentRequest, priority: int = PRIORITY_INTERACTIVE, deck_context: Optional[DeckContext] = None) -> dict:
+    # Cached, single-flight design suggestions (shared by the single and batch endpoints and prefetching).
+    if deck_context is None:
+        request, deck_context = await resolve_slide_request(request, "generate-design-suggestions")
+    cache_key = design_suggestions_cache_key(request)
+    near = slide_near_key(request, request.slide_title)
+    cached_response = await get_cached_response(cache_key, near)
+    if cached_response:
+        return cached_response
+
+    task = f"""Provide specific design suggestions to make {slide_reference(deck_context, request.slide_title, request.current_content)} more visually appealing and effective.
         Include recommendations for:
         1. Layout and structure
         2. Visual elements (charts, images, icons)
@@ -259,35 +659,131 @@ async def generate_design_suggestions(request: SlideContentRequest):
         4. Typography
         5. Data visualization (if applicable)"""
 
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are a presentation design expert. Provide specific and actionable design suggestions for pitch deck slides."},
-                {"role": "user", "content": prompt}
-            ],
+    async def generate():
+        suggestions, _, _ = await routing.routed_completion(
+            "generate-design-suggestions",
+            deck_messages(
+                deck_context,
+                "You are a presentation design expert. Provide specific and actionable design suggestions for pitch deck slides.",
+                task,
+            ),
             max_tokens=500,
+            timeout=60,
+            priority=priority,
+            validate=routing.require_text,
         )
 
-        suggestions = response.choices[0].message.content.strip()
-        return {"suggestions": suggestions}
-    except openai.error.RateLimitError:
-        raise HTTPException(status_code=429, detail="API rate limit exceeded. Please try again later.")
-    except openai.error.APIError as e:
-        raise HTTPException(status_code=500, detail=f"OpenAI API error: {str(e)}")
+        result = {"suggestions": suggestions}
+        cache_response(cache_key, result, near)
+        return result
+
+    return await inflight.do(cache_key, generate)
+
+@api.post("/generate-design-suggestions")
+async def generate_design_suggestions(request: SlideContentRequest):
+    try:
+        # Validate slide title is in standard slides
+        if request.slide_title not in STANDARD_SLIDES:
+            raise HTTPException(status_code=400, detail=f"Invalid slide title. Must be one of: {', '.join(STANDARD_SLIDES)}")
+
+        return await fetch_design_suggestions(request)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise upstream_error(e)
 # END OF AI IMPLEMENTATION 
 
-#@app.get("/health")
+# ===== BATCH SLIDE CONTENT ENDPOINT =====
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "5"))  # Max upstream calls in flight per batch request.
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+
+async def generate_batch_item(index: int, item: SlideContentRequest, include_design: bool, semaphore: asyncio.Semaphore) -> dict:
+    """
+    Generates one batch item under the batch's concurrency limit. Errors are reported per item.
+    """
+    result: Dict[str, Any] = {"index": index, "slide_title": item.slide_title}
+    try:
+        if item.slide_title not in STANDARD_SLIDES:
+            raise HTTPException(status_code=400, detail=f"Invalid slide title. Must be one of: {', '.join(STANDARD_SLIDES)}")
+        async with semaphore:
+            if include_design:
+                content, design = await asyncio.gather(
+                    fetch_slide_content(item, priority=PRIORITY_BATCH), fetch_design_suggestions(item, priority=PRIORITY_BATCH)
+                )
+                result.update(content)
+                result.update(design)
+            else:
+                result.update(await fetch_slide_content(item, priority=PRIORITY_BATCH))
+    except Exception as e:
+        error = upstream_error(e)
+        result["error"] = {"status": error.status_code, "detail": error.detail}
+    return result
+
+# Regenerates many slides in one request. Items run concurrently (bounded by `concurrency`) and reuse the response cache.
+# Pass ?stream=true to receive an `item` event as each slide finishes, then a final `done` event.
+@api.post("/generate-slide-content-batch")
+async def generate_slide_content_batch(request: SlideContentBatchRequest, stream: bool = False):
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Too many items. A batch can contain at most {BATCH_MAX_ITEMS} slides.")
+    semaphore = asyncio.Semaphore(max(1, min(request.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)))
+    tasks = [
+        asyncio.create_task(generate_batch_item(index, item, request.include_design, semaphore))
+        for index, item in enumerate(request.items)
+    ]
+    if not stream:
+        return {"results": await asyncio.gather(*tasks)}
+
+    async def events():
+        try:
+            failed = 0
+            for finished in asyncio.as_completed(tasks):
+                item = await finished
+                failed += "error" in item
+                yield sse_event("item", item)
+            yield sse_event("done", {"count": len(tasks), "failed": failed})
+        finally:
+            for task in tasks:
+                task.cancel()  # Client went away - stop the remaining items.
+
+    return sse_response(events())
+
+#@api.get("/health")
 #def health_check():
 #    return {"status": "ok"}
 
+# ===== DEADLINES FOR INTERACTIVE ENDPOINTS =====
+# Editor actions get a latency budget. If the AI has not answered in time, the endpoint returns the placeholder output
+# marked `"provisional": true`; the AI call keeps running in the background and fills the cache for the next request.
+SUGGESTION_DEADLINE = float(os.getenv("SUGGESTION_DEADLINE", "3"))  # Seconds. 0 disables the fallback.
+VISUAL_DATA_DEADLINE = float(os.getenv("VISUAL_DATA_DEADLINE", "4"))
+
+deadline_stats: Dict[str, Dict[str, int]] = {}
+background_tasks = set()  # Strong references to AI calls that outlived their request.
+
+def _finish_background(task: asyncio.Future):
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Background AI call failed: {str(task.exception())}")
+
+async def within_deadline(endpoint: str, cache_key: str, generate, deadline: float, placeholder) -> dict:
+    """
+    Runs `generate` (single-flight on `cache_key`) and returns its result if it finishes within `deadline` seconds,
+    otherwise returns `placeholder()` marked provisional. The circuit breaker failing fast also gets the placeholder.
+    """
+    stats = deadline_stats.setdefault(endpoint, {"on_time": 0, "provisional": 0})
+    task = asyncio.ensure_future(inflight.do(cache_key, generate))
+    try:
+        result = await asyncio.wait_for(asyncio.shield(task), deadline) if deadline > 0 else await task
+    except (asyncio.TimeoutError, SchedulerError):
+        if not task.done():
+            background_tasks.add(task)
+            task.add_done_callback(_finish_background)
+        stats["provisional"] += 1
+        return {**placeholder(), "provisional": True}
+    stats["on_time"] += 1
+    return result
+
 # ===== SUGGESTION ENDPOINT =====
-# Placeholder implementation for /generate-suggestion
-@app.post("/generate-suggestion")
-def generate_suggestion(
-    data: Dict = Body(...)
-):
+# Placeholder implementation for /generate-suggestion - now the provisional fallback of the AI endpoint below.
+def placeholder_suggestion(data: Dict):
     """
     Placeholder: Returns a static suggestion based on type.
     """
@@ -300,37 +796,65 @@ def generate_suggestion(
 
 # ===== AI IMPLEMENTATION - SUGGESTION ENDPOINT =====
 # START OF AI IMPLEMENTATION - To be uncommented later
-@app.post("/generate-suggestion")
+@api.post("/generate-suggestion")
 async def generate_suggestion(
     data: Dict = Body(...)
 ):
     """
     AI implementation: Returns an AI-generated suggestion for the slide.
+    With a `contextId`, the slide content may be left out and the suggestion is made with the whole deck in view.
     """
     suggestion_type = data.get("type", "Content")
     slide_title = data.get("slide_title", "")
     content = data.get("content", "")
     design = data.get("design", "")
-    if suggestion_type == "Content":
-        prompt = f"""Given the slide titled '{slide_title}' with content: '{content}', suggest a single, actionable improvement to the slide's content for a startup pitch deck. Respond with only the suggestion."""
-    else:
-        prompt = f"""Given the slide titled '{slide_title}' with design notes: '{design}', suggest a single, actionable improvement to the slide's design (layout, visuals, colors, etc.) for a startup pitch deck. Respond with only the suggestion."""
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a pitch deck expert. Provide concise, actionable suggestions for improving slide content or design."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=100,
-    )
-    suggestion = response.choices[0].message.content.strip()
-    return {"suggestion": suggestion}
+    sent = content if suggestion_type == "Content" else design
+    deck_context = await load_deck_context(data["contextId"], required=not sent) if data.get("contextId") else None
+    if deck_context is not None and not content:
+        content = deck_context.slide_content(slide_title) or ""
+        if suggestion_type == "Content":
+            deck_contexts.record_saved("generate-suggestion", estimate_tokens(content))
+    cache_key = make_cache_key("generate-suggestion", suggestion_type, slide_title, content if suggestion_type == "Content" else design)
+    near = ((suggestion_type, slide_title), content if suggestion_type == "Content" else design)
+    cached_response = await get_cached_response(cache_key, near)
+    if cached_response:
+        return cached_response
+    role = "You are a pitch deck expert. Provide concise, actionable suggestions for improving slide content or design."
+    async def generate():
+        # Fixed instructions first and the slide last, so only the tail of the prompt changes between calls.
+        if suggestion_type == "Content":
+            prompt = "Suggest a single, actionable improvement to the slide's content for a startup pitch deck. Respond with only the suggestion."
+            slide = f"Slide: '{slide_title}'\nContent: '{content}'"
+            if deck_context is not None:
+                slide = f"The slide is {slide_reference(deck_context, slide_title, content)}."
+        else:
+            prompt = "Suggest a single, actionable improvement to the slide's design (layout, visuals, colors, etc.) for a startup pitch deck. Respond with only the suggestion."
+            slide = f"Slide: '{slide_title}'\nDesign notes: '{design}'"
+        if deck_context is not None:
+            messages = deck_messages(deck_context, role, f"{prompt}\n\n{slide}")
+        else:
+            messages = [{"role": "system", "content": role}, {"role": "user", "content": f"{prompt}\n\n{slide}"}]
+        suggestion, _, _ = await routing.routed_completion(
+            "generate-suggestion",
+            messages,
+            max_tokens=100,
+            timeout=30,
+            priority=PRIORITY_INTERACTIVE,
+            validate=routing.require_text,
+        )
+        result = {"suggestion": suggestion}
+        cache_response(cache_key, result, near)
+        return result
+
+    try:
+        return await within_deadline("generate-suggestion", cache_key, generate, SUGGESTION_DEADLINE, lambda: placeholder_suggestion(data))
+    except Exception as e:
+        raise upstream_error(e)
 #END OF AI IMPLEMENTATION 
 
 # ===== VISUAL DATA ENDPOINT =====
-# Placeholder implementation for /generate-visual-data
-@app.post("/generate-visual-data")
-def generate_visual_data(data: Dict = Body(...)):
+# Placeholder implementation for /generate-visual-data - now the provisional fallback of the AI endpoint below.
+def placeholder_visual_data(data: Dict):
     """
     Placeholder: Returns static chart/table data for the requested type.
     """
@@ -372,33 +896,211 @@ def generate_visual_data(data: Dict = Body(...)):
 
 # ===== AI IMPLEMENTATION - VISUAL DATA ENDPOINT =====
 # START OF AI IMPLEMENTATION - To be uncommented later
-@app.post("/generate-visual-data")
-async def generate_visual_data(data: Dict = Body(...)):
+def visual_data_call(data: Dict, priority: int = PRIORITY_INTERACTIVE):
     """
-    AI implementation: Returns chart/table data generated by OpenAI for the requested type and context.
+    (cache key, near key, generate) for a visual-data request - shared by the endpoint and prefetching.
     """
     visual_type = data.get("type", "pie")
     context = data.get("context", "")
+    cache_key = make_cache_key("generate-visual-data", visual_type, context)
+    near = ((visual_type,), context)
     prompt = f"""Generate JSON data for a {visual_type} chart for a startup pitch deck. Context: {context}. 
-    For pie/bar/line, use a list of objects with 'name' and 'value'. For scatter, use a list of objects with 'x' and 'y'. For table, use an object with 'columns' and 'rows'. Respond with only the JSON data."""
-    response = openai.ChatCompletion.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are a data visualization expert. Generate chart/table data for pitch decks."},
-            {"role": "user", "content": prompt}
-        ],
-        max_tokens=300,
-    )
-    import json
+    For pie/bar/line, use 'points' with 'name' and 'value'. For scatter, use 'points' with 'x' and 'y'. For table, use 'columns' and 'rows'. Respond with only the JSON data."""
+    async def generate():
+        try:
+            # Truncated JSON is repaired; output with no usable data is retried one model tier up.
+            _, data_json, _ = await routing.routed_completion(
+                "generate-visual-data",
+                [
+                    {"role": "system", "content": "You are a data visualization expert. Generate chart/table data for pitch decks."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=300,
+                timeout=30,
+                priority=priority,
+                validate=lambda text: structured.parse_visual_data(visual_type, text),
+                response_format=structured.visual_data_format(visual_type),
+            )
+        except routing.ValidationError as e:
+            # Unparseable output from every tier is returned as-is but not cached, so a retry can do better.
+            return {"data": e.text}
+        result = {"data": data_json}
+        cache_response(cache_key, result, near)
+        return result
+
+    return cache_key, near, generate
+
+@api.post("/generate-visual-data")
+async def generate_visual_data(data: Dict = Body(...)):
+    """
+    AI implementation: Returns chart/table data generated by OpenAI for the requested type and context.
+    """
+    cache_key, near, generate = visual_data_call(data)
+    cached_response = await get_cached_response(cache_key, near)
+    if cached_response:
+        return cached_response
     try:
-        data_json = json.loads(response.choices[0].message.content.strip())
-    except Exception:
-        data_json = response.choices[0].message.content.strip()
-    return {"data": data_json}
+        return await within_deadline("generate-visual-data", cache_key, generate, VISUAL_DATA_DEADLINE, lambda: placeholder_visual_data(data))
+    except Exception as e:
+        raise upstream_error(e)
 # END OF AI IMPLEMENTATION 
 
+# ===== SPECULATIVE PREFETCH =====
+# After /generate-slides, design suggestions and visual data for the slides the editor opens first are generated in the
+# background at the lowest priority, straight into the response cache. Opt-in with PREFETCH_ENABLED=true.
+# Jobs and budgets belong to the request's deck context or signed-in user (see prefetch_owner).
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+PREFETCH_DESIGN_SLIDES = [title.strip() for title in os.getenv("PREFETCH_DESIGN_SLIDES", "The Problem,Our Solution,Market Opportunity").split(",") if title.strip()]
+PREFETCH_VISUAL_SLIDES = [title.strip() for title in os.getenv("PREFETCH_VISUAL_SLIDES", "Market Opportunity,Traction,Financial Projections").split(",") if title.strip()]
+PREFETCH_VISUAL_TYPE = os.getenv("PREFETCH_VISUAL_TYPE", "pie")  # The editor's "add visual" action asks for a pie chart.
+PREFETCH_USER_BUDGET = float(os.getenv("PREFETCH_USER_BUDGET", "0.05"))  # Estimated $ of prefetch calls per owner per window.
+PREFETCH_BUDGET_WINDOW = float(os.getenv("PREFETCH_BUDGET_WINDOW", "3600"))  # Seconds.
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))  # Prefetch calls in flight per process.
+
+prefetcher = Prefetcher(
+    inflight,
+    is_cached=lambda key: key in response_cache,
+    user_budget=PREFETCH_USER_BUDGET,
+    budget_window=PREFETCH_BUDGET_WINDOW,
+    concurrency=PREFETCH_CONCURRENCY,
+)
+
+def editor_slide_blocks(lines: List[str]) -> Dict[str, List[str]]:
+    """
+    Mirrors how the editor turns /generate-slides lines into slide text blocks (handleGenerateSlides in the
+    frontend): each line goes to the standard slide it starts with, or else to the first one it names, minus a
+    leading "Title:". The slide content is the blocks joined by blank lines, and the first block is the context
+    of its visual data requests.
+    """
+    blocks: Dict[str, List[str]] = {title: [] for title in STANDARD_SLIDES}
+    for line in lines:
+        lowered = line.lower()
+        title = next((title for title in STANDARD_SLIDES if lowered.startswith(title.lower())), None) \
+            or next((title for title in STANDARD_SLIDES if title.lower() in lowered), None)
+        if title is None:
+            continue
+        content = re.sub(rf"^{re.escape(title)}:?\s*", "", line, flags=re.IGNORECASE).strip()
+        if content:
+            blocks[title].append(content)
+    return blocks
+
+def prefetch_jobs(request: SlideRequest, lines: List[str]) -> List[PrefetchJob]:
+    # Builds the same requests (and so the same cache keys) the editor is about to send.
+    blocks = editor_slide_blocks(lines)
+    jobs = []
+    for title in PREFETCH_DESIGN_SLIDES:
+        if title not in blocks:
+            continue
+        content = "\n\n".join(blocks[title])
+        design_request = SlideContentRequest(problem=request.problem, solution=request.solution, slide_title=title, current_content=content,
+                                             contextId=request.contextId)
+        jobs.append(PrefetchJob(
+            endpoint="generate-design-suggestions", slide=title, content=content,
+            cache_key=design_suggestions_cache_key(design_request),
+            # ~4 characters per prompt token, plus the prompt template and the 500-token completion.
+            cost=routing.router.estimate_cost("generate-design-suggestions", (len(request.problem) + len(request.solution) + len(content)) // 4 + 600),
+            run=lambda design_request=design_request: fetch_design_suggestions(design_request, priority=PRIORITY_BACKGROUND),
+        ))
+    for title in PREFETCH_VISUAL_SLIDES:
+        if title not in blocks:
+            continue
+        content = "\n\n".join(blocks[title])
+        context = blocks[title][0] if blocks[title] else ""
+        cache_key, _, generate = visual_data_call({"type": PREFETCH_VISUAL_TYPE, "context": context}, PRIORITY_BACKGROUND)
+        jobs.append(PrefetchJob(
+            endpoint="generate-visual-data", slide=title, content=content, cache_key=cache_key,
+            cost=routing.router.estimate_cost("generate-visual-data", len(context) // 4 + 400),
+            run=lambda cache_key=cache_key, generate=generate: inflight.do(cache_key, generate),
+        ))
+    return jobs
+
+def prefetch_owner(user_id: Optional[str], context_id: Optional[str]) -> Optional[str]:
+    """
+    Who a prefetch belongs to (its budget, and whose edits cancel it): the deck context if there is one, else a real
+    user. Anonymous requests all carry the "demo" default, so they would share one budget and cancel each other's
+    jobs - nothing is prefetched for them.
+    """
+    if context_id:
+        return f"context:{context_id}"
+    if user_id and user_id != "demo":
+        return f"user:{user_id}"
+    return None
+
+def schedule_prefetch(request: SlideRequest, lines: List[str]):
+    owner = prefetch_owner(request.userId, request.contextId)
+    if PREFETCH_ENABLED and owner:
+        prefetcher.submit(owner, prefetch_jobs(request, lines))
+
 # ===== PITCH DECK ANALYSIS ENDPOINT =====
-@app.post("/analyze-pitch-deck", response_model=SlideAnalysisResponse)
+# The analysis runs in two passes: each slide is scored on its own (cached by a hash of its title and content), then a
+# cheaper deck-level pass synthesizes the per-slide reviews. Re-analyzing a deck only re-scores the slides that changed.
+async def score_slide(title: str, content: str) -> Dict[str, Any]:
+    """
+    First pass: scores one slide and summarizes its strengths and weaknesses. Cached by the slide's title and content.
+    """
+    cache_key = make_cache_key("analyze-slide", title, content)
+    cached_response = await get_cached_response(cache_key)
+    if cached_response:
+        return cached_response
+
+    async def score():
+        try:
+            _, review, _ = await routing.routed_completion(
+                "analyze-slide",
+                [
+                    {"role": "system", "content": "You are an expert pitch deck reviewer. Review a single slide of a startup pitch deck for narrative, visual design and data credibility."},
+                    {"role": "user", "content": f"Slide: {title}\nContent: {content}\n\nReview this slide. Give a score from 0 to 100 and a review of 2-3 sentences covering narrative, visual design and data credibility, with the most important fix."}
+                ],
+                max_tokens=250,
+                timeout=60,
+                validate=structured.parse_slide_review,
+                response_format=structured.SLIDE_REVIEW_FORMAT,
+            )
+        except routing.ValidationError as e:
+            # No model produced a usable review - keep the raw answer unscored, uncached.
+            return {"title": title, "score": None, "review": e.text}
+        result = {"title": title, **review.model_dump()}
+        cache_response(cache_key, result)
+        return result
+
+    return await inflight.do(cache_key, score)
+
+async def synthesize_analysis(slide_reviews: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Second pass: turns the per-slide reviews into the deck-level SlideAnalysisResponse fields.
+    """
+    reviews = "\n\n".join(
+        f"Slide: {review['title']} (score: {review['score'] if review['score'] is not None else 'n/a'})\nReview: {review['review']}"
+        for review in slide_reviews
+    )
+    cache_key = make_cache_key("analyze-synthesis", reviews)
+    cached_response = await get_cached_response(cache_key)
+    if cached_response:
+        return cached_response
+
+    async def synthesize():
+        try:
+            _, analysis, _ = await routing.routed_completion(
+                "analyze-synthesis",
+                [
+                    {"role": "system", "content": "You are an expert pitch deck reviewer. Analyze the pitch deck and provide detailed feedback on narrative flow, visual design, data credibility, and overall effectiveness. Provide specific, actionable suggestions for improvement."},
+                    {"role": "user", "content": f"Here are reviews of each slide of a pitch deck, in order:\n\n{reviews}\n\nBased on these, analyze the deck as a whole. Give an overall score from 0 to 100, then a narrative flow analysis, a visual design analysis, a data credibility analysis, and specific feedback and suggestions."}
+                ],
+                max_tokens=1500,
+                timeout=120,
+                validate=structured.parse_deck_analysis,
+                response_format=structured.DECK_ANALYSIS_FORMAT,
+            )
+        except routing.ValidationError:
+            # No model produced a usable analysis - answer with the defaults, uncached.
+            return structured.DeckAnalysis().model_dump()
+        parsed_data = analysis.model_dump()
+        cache_response(cache_key, parsed_data)
+        return parsed_data
+
+    return await inflight.do(cache_key, synthesize)
+
+@api.post("/analyze-pitch-deck", response_model=SlideAnalysisResponse)
 async def analyze_pitch_deck(request: SlideAnalysisRequest):
     try:
         # Prepare the content for analysis
@@ -406,46 +1108,25 @@ async def analyze_pitch_deck(request: SlideAnalysisRequest):
             f"Slide: {slide.get('title', 'Untitled')}\nContent: {slide.get('content', '')}"
             for slide in request.slides
         ])
+        cache_key = make_cache_key("analyze-pitch-deck", slides_content)
+        cached_response = await get_cached_response(cache_key)
+        if cached_response:
+            return SlideAnalysisResponse(**cached_response)
 
-        # Call OpenAI API for analysis
-        client = openai.OpenAI()
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": "You are an expert pitch deck reviewer. Analyze the pitch deck and provide detailed feedback on narrative flow, visual design, data credibility, and overall effectiveness. Provide specific, actionable suggestions for improvement."},
-                {"role": "user", "content": f"Please analyze this pitch deck and provide feedback:\n\n{slides_content}\n\nProvide your analysis in the following distinct sections, using these exact titles, including the 'SECTION:' prefix:\n\nSECTION: Overall Score\n\nSECTION: Narrative Flow Analysis\n\nSECTION: Visual Design Analysis\n\nSECTION: Data Credibility Analysis\n\nSECTION: Specific Feedback and Suggestions"}
-            ],
-            max_tokens=2000,
-        )
+        async def analyze():
+            # Score the slides concurrently (unchanged slides come from the cache), then synthesize.
+            semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
 
-        # Parse the response
-        analysis_text = response.choices[0].message.content.strip()
-        
-        parsed_data = {
-            "score": 75.0,
-            "narrative_flow": "No narrative flow analysis provided.",
-            "visual_design": "No visual design analysis provided.",
-            "data_credibility": "No data credibility analysis provided.",
-            "feedback": "No specific feedback provided."
-        }
-
-        sections = analysis_text.split('SECTION:')[1:]
-
-        for section in sections:
-            section = section.strip()
-            if 'Overall Score' in section:
-                score_match = re.search(r'(\d+)', section)
-                if score_match:
-                    parsed_data["score"] = float(score_match.group(1))
-            elif 'Narrative Flow Analysis' in section:
-                parsed_data["narrative_flow"] = section.replace('Narrative Flow Analysis', '').strip()
-            elif 'Visual Design Analysis' in section:
-                parsed_data["visual_design"] = section.replace('Visual Design Analysis', '').strip()
-            elif 'Data Credibility Analysis' in section:
-                parsed_data["data_credibility"] = section.replace('Data Credibility Analysis', '').strip()
-            elif 'Specific Feedback and Suggestions' in section:
-                parsed_data["feedback"] = section.replace('Specific Feedback and Suggestions', '').strip()
+            async def score_with_limit(slide: Dict[str, str]):
+                async with semaphore:
+                    return await score_slide(slide.get('title', 'Untitled'), slide.get('content', ''))
+
+            slide_reviews = await asyncio.gather(*[score_with_limit(slide) for slide in request.slides])
+            parsed_data = await synthesize_analysis(list(slide_reviews))
+            cache_response(cache_key, parsed_data)
+            return parsed_data
 
+        parsed_data = await inflight.do(cache_key, analyze)
         return SlideAnalysisResponse(
             score=parsed_data["score"],
             narrative_flow=parsed_data["narrative_flow"],
@@ -455,106 +1136,332 @@ async def analyze_pitch_deck(request: SlideAnalysisRequest):
         )
     except Exception as e:
         print(f"Error in analyze_pitch_deck: {str(e)}")
+        if is_upstream_error(e):
+            raise upstream_error(e)
         raise HTTPException(status_code=500, detail=f"Error analyzing pitch deck: {str(e)}")
 
-# PDF export (requires reportlab)
-@app.post("/export-pdf")
-def export_pdf(request: SlideAnalysisRequest):
-    try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-        y = height - 50
-        for slide in request.slides:
-            p.setFont("Helvetica-Bold", 16)
-            p.drawString(50, y, slide['title'])
-            y -= 30
-            p.setFont("Helvetica", 12)
-            for line in (slide.get('content', '') or '').split('\n'):
-                p.drawString(60, y, line)
-                y -= 20
-                if y < 80:
-                    p.showPage()
-                    y = height - 50
-            y -= 20
-            if y < 80:
-                p.showPage()
-                y = height - 50
-        p.save()
-        buffer.seek(0)
-        return StreamingResponse(buffer, media_type="application/pdf", headers={"Content-Disposition": "attachment; filename=pitch_deck.pdf"})
-    except ImportError:
-        raise HTTPException(status_code=500, detail="reportlab is required for PDF export. Please install it.")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+# ===== EXPORTS =====
+# Rendering runs in a process pool and finished files are cached on disk by a hash of the slides + format (see exports.py).
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))  # Render processes.
+EXPORT_CACHE_MAX_BYTES = int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))  # 1 GB of cached artifacts.
+EXPORT_SPOOL_MEMORY_CAP = int(os.getenv("EXPORT_SPOOL_MEMORY_CAP", str(8 * 1024 * 1024)))  # Per streamed export, then spills to disk.
 
-# PPTX export (requires python-pptx)
-@app.post("/export-ppt")
-def export_ppt(request: SlideAnalysisRequest):
-    try:
-        from pptx import Presentation
-        prs = Presentation()
-        for slide_data in request.slides:
-            slide = prs.slides.add_slide(prs.slide_layouts[1])
-            title = slide.shapes.title
-            title.text = slide_data['title']
-            content = slide.placeholders[1]
-            content.text = slide_data.get('content', '') or ''
-        buffer = io.BytesIO()
-        prs.save(buffer)
-        buffer.seek(0)
-        return StreamingResponse(buffer, media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation", headers={"Content-Disposition": "attachment; filename=pitch_deck.pptx"})
-    except ImportError:
-        raise HTTPException(status_code=500, detail="python-pptx is required for PPTX export. Please install it.")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+export_manager = ExportManager(EXPORT_DIR, workers=EXPORT_WORKERS, max_bytes=EXPORT_CACHE_MAX_BYTES)
+
+def export_file_response(job: ExportJob) -> FileResponse:
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if not os.path.exists(job.path):
+        raise HTTPException(status_code=410, detail="Export file has expired. Please export again.")
+    extension = EXPORT_FORMATS[job.format]["extension"]
+    return FileResponse(job.path, media_type=EXPORT_FORMATS[job.format]["media_type"], headers={"Content-Disposition": f"attachment; filename=pitch_deck.{extension}"})
+
+# Job API: submit, then poll (or subscribe to the events stream), then download.
+@api.post("/export-jobs", status_code=202)
+async def submit_export_job(request: ExportJobRequest):
+    job = export_manager.submit(request.format, request.slides)
+    return job.to_dict()
+
+@api.get("/export-jobs/{job_id}")
+async def get_export_job(job_id: str):
+    job = export_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job.to_dict()
+
+@api.get("/export-jobs/{job_id}/events")
+async def export_job_events(job_id: str):
+    # SSE: the current status straight away, then a final event when the job finishes.
+    job = export_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+
+    async def events():
+        yield sse_event("status", job.to_dict())
+        if not job.done.is_set():
+            await export_manager.wait(job)
+            yield sse_event("status", job.to_dict())
+
+    return sse_response(events())
+
+@api.get("/export-jobs/{job_id}/download")
+async def download_export_job(job_id: str):
+    job = export_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if not job.done.is_set():
+        raise HTTPException(status_code=409, detail=f"Export job is still {job.status}")
+    return export_file_response(job)
+
+# One-shot exports (same as before for the frontend) - submit a job and send the file once it is ready.
+# Pass ?stream=true to receive the PDF page by page as it is rendered (chunked, no Content-Length) - for very large decks.
+@api.post("/export-pdf")
+async def export_pdf(request: SlideAnalysisRequest, stream: bool = False):
+    if stream and not export_manager.is_cached("pdf", request.slides):
+        return StreamingResponse(
+            export_manager.stream_pdf(request.slides, memory_cap=EXPORT_SPOOL_MEMORY_CAP),
+            media_type="application/pdf",
+            headers={"Content-Disposition": "attachment; filename=pitch_deck.pdf"},
+        )
+    job = await export_manager.wait(export_manager.submit("pdf", request.slides))
+    return export_file_response(job)
+
+@api.post("/export-ppt")
+async def export_ppt(request: SlideAnalysisRequest):
+    job = await export_manager.wait(export_manager.submit("pptx", request.slides))
+    return export_file_response(job)
 
 # Requirements:
 # pip install reportlab python-pptx
 
-DATA_FILE = "user_data.json"
+DATA_FILE = "user_data.json" # Legacy single-file storage - migrated into the user store on startup.
 
-def load_user_data(user_id):
-    if not os.path.exists(DATA_FILE):
-        return {}
-    with open(DATA_FILE, "r") as f:
-        data = json.load(f)
-    return data.get(user_id, {})
+# User data store - "sqlite" (default, safe with multiple workers) or "json" (single file, single worker).
+USER_STORE = os.getenv("USER_STORE", "sqlite")
+USER_STORE_PATH = os.getenv("USER_STORE_PATH", "user_data.db" if USER_STORE == "sqlite" else DATA_FILE)
+user_store = create_store(USER_STORE, USER_STORE_PATH)
 
-def save_user_data(user_id, user_data):
-    if os.path.exists(DATA_FILE):
-        with open(DATA_FILE, "r") as f:
-            data = json.load(f)
-    else:
-        data = {}
-    data[user_id] = user_data
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f)
+# The store is blocking, so the async handlers run it in a worker thread (timed for the metrics endpoint).
+async def store_call(fn, *args):
+    started = time.perf_counter()
+    try:
+        return await asyncio.to_thread(fn, *args)
+    finally:
+        metrics.store_duration.observe(time.perf_counter() - started, backend=USER_STORE, operation=fn.__name__)
+
+async def load_user_data(user_id):
+    return await store_call(user_store.get, user_id)
+
+# Deleted slides are kept as tombstones for "changes since version N" reads, then purged; older `since` get the full deck.
+DECK_TOMBSTONE_RETENTION = float(os.getenv("DECK_TOMBSTONE_RETENTION", str(7 * 86400)))  # Seconds - 7 days.
+DECK_TOMBSTONE_SWEEP_INTERVAL = float(os.getenv("DECK_TOMBSTONE_SWEEP_INTERVAL", "3600"))  # Seconds between purges.
 
-@app.post("/save-slides")
+async def purge_tombstones_forever():
+    while True:
+        await asyncio.sleep(DECK_TOMBSTONE_SWEEP_INTERVAL)
+        try:
+            await store_call(user_store.purge_tombstones, DECK_TOMBSTONE_RETENTION)
+        except Exception as e:
+            print(f"Tombstone purge failed: {str(e)}")
+
+async def sync_deck_context(context_id: str, slides: List[Dict[str, Any]]):
+    # Keeps the client's deck context in step with the saved deck, so later prompts see the new slide text.
+    await deck_contexts.update_slides(context_id, {slide.get("title") or "": slide.get("content") or "" for slide in slides}, replace=True)
+
+# Full save - only the slides that actually changed are rewritten and the deck version is bumped if anything changed.
+@api.post("/save-slides")
 async def save_slides(request: Request):
     body = await request.json()
     user_id = body.get("userId", "demo")  # Replace with real user/session ID
     slides = body.get("slides", [])
-    user_data = load_user_data(user_id)
-    user_data["slides"] = slides
-    save_user_data(user_id, user_data)
-    return {"status": "ok"}
-
-@app.get("/get-slides")
-async def get_slides(userId: str = "demo"):
-    user_data = load_user_data(userId)
-    return {"slides": user_data.get("slides", [])}
-
-@app.get("/dashboard-stats")
-async def dashboard_stats(userId: str = "demo"):
-    user_data = load_user_data(userId)
-    slides = user_data.get("slides", [])
+    version, saved = await store_call(user_store.save_deck, user_id, slides)
+    owner = prefetch_owner(user_id, body.get("contextId"))
+    if owner and prefetcher.pending(owner):
+        # Slides edited (or removed) before their prefetch finished make it pointless.
+        contents: Dict[str, Optional[str]] = {title: None for title in STANDARD_SLIDES}
+        contents.update({slide.get("title"): slide.get("content") or "" for slide in slides})
+        prefetcher.slides_edited(owner, contents)
+    if body.get("contextId"):
+        await sync_deck_context(body["contextId"], slides)
+    return {"status": "ok", "version": version, "ids": [slide["id"] for slide in saved]}
+
+# Delta save for autosaves - per-slide insert/update/delete against the deck version the client last saw.
+@api.post("/patch-slides")
+async def patch_slides(request: SlidePatchRequest):
+    for change in request.changes:
+        if change.op != "insert" and not change.id:
+            raise HTTPException(status_code=400, detail=f"Slide id is required for '{change.op}'")
+    # Content edits and deletes cancel pending prefetches for those slides; titles come from the deck before the patch.
+    edited = [change for change in request.changes if change.op == "delete" or (change.op == "update" and "content" in (change.slide or {}))]
+    titles: Dict[str, str] = {}
+    owner = prefetch_owner(request.userId, request.contextId)
+    if edited and owner and prefetcher.pending(owner):
+        _, deck = await store_call(user_store.get_deck, request.userId)
+        titles = {slide.get("id"): slide.get("title") for slide in deck}
+    try:
+        version = await store_call(
+            user_store.patch_deck, request.userId, request.baseVersion, [change.model_dump() for change in request.changes]
+        )
+    except VersionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": "Deck has changed since baseVersion", "version": e.current_version})
+    except SlideNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if titles:
+        prefetcher.slides_edited(owner, {
+            (change.slide or {}).get("title") or titles.get(change.id): None if change.op == "delete" else change.slide["content"]
+            for change in edited
+        })
+    if request.contextId:
+        _, deck = await store_call(user_store.get_deck, request.userId)
+        await sync_deck_context(request.contextId, deck)
+    return {"status": "ok", "version": version}
+
+# ===== CONDITIONAL GET (ETag / 304) =====
+def etag_matches(request: Request, etag: str) -> bool:
+    # Weak comparison (RFC 7232) - compressed and uncompressed bodies share one ETag.
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def deck_etag(user_id: str, version: int, since: Optional[int] = None) -> str:
+    suffix = f"-since-{since}" if since is not None else ""
+    return f'W/"deck-{hashlib.sha1(user_id.encode()).hexdigest()[:12]}-v{version}{suffix}"'
+
+# Pass ?since=N to get only the changes made after version N.
+# Polls send If-None-Match with the last ETag and get a 304 without the deck being loaded while the version is unchanged.
+@api.get("/get-slides")
+async def get_slides(request: Request, response: Response, userId: str = "demo", since: Optional[int] = None):
+    if request.headers.get("if-none-match"):
+        version, _ = await store_call(user_store.get_deck_info, userId)
+        etag = deck_etag(userId, version, since)
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+    if since is not None:
+        changes = await store_call(user_store.get_deck_changes, userId, since)
+        response.headers["ETag"] = deck_etag(userId, changes["version"], since)
+        return changes
+    version, slides = await store_call(user_store.get_deck, userId)
+    response.headers["ETag"] = deck_etag(userId, version)
+    return {"slides": slides, "version": version}
+
+@api.get("/dashboard-stats")
+async def dashboard_stats(request: Request, response: Response, userId: str = "demo"):
+    user_data = await load_user_data(userId)
+    _, slide_count = await store_call(user_store.get_deck_info, userId)
     # You can add more stats as you add more features
-    return {
-        "decksCreated": 1 if slides else 0,
+    stats = {
+        "decksCreated": 1 if slide_count else 0,
         "legalDocsGenerated": user_data.get("legalDocsGenerated", 0),
         "researchReports": user_data.get("researchReports", 0),
-    }
\ No newline at end of file
+    }
+    # Content-hash ETag of the stats.
+    etag = f'W/"{hashlib.sha1(json.dumps(stats, sort_keys=True).encode()).hexdigest()}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    return stats
+
+# ===== METRICS =====
+# Counters kept by the cache, scheduler and export manager are read when /metrics is scraped.
+metrics.REGISTRY.add_collector(metrics.stats_collector(
+    "response_cache", response_cache.stats, counters=("hits", "misses", "evictions", "expirations"), gauges=("entries", "bytes")))
+metrics.REGISTRY.add_collector(metrics.stats_collector(
+    "semantic_cache", semantic_cache.stats, counters=("hits", "misses", "evictions"), gauges=("entries",)))
+metrics.REGISTRY.add_collector(metrics.stats_collector(
+    "singleflight", inflight.stats, counters=("leaders", "coalesced"), gauges=("in_flight",)))
+metrics.REGISTRY.add_collector(metrics.stats_collector(
+    "llm_scheduler", llm.scheduler.stats, counters=("calls", "retries", "rate_limited", "failures", "rejected", "circuit_trips"),
+    gauges=("queue_depth", "in_flight", "rate_factor")))
+metrics.REGISTRY.add_collector(metrics.stats_collector(
+    "prefetch", prefetcher.stats, counters=("scheduled", "completed", "cancelled", "skipped_cached", "skipped_budget", "failed", "hits"),
+    gauges=("pending",)))
+metrics.REGISTRY.add_collector(metrics.stats_collector(
+    "deck_context", deck_contexts.stats, counters=("hits", "misses", "evictions", "expirations"), gauges=("entries",)))
+metrics.REGISTRY.add_collector(metrics.stats_collector(
+    "exports", export_manager.stats, counters=("cache_hits", "renders"), gauges=("jobs", "running")))
+if disk_cache is not None:
+    metrics.REGISTRY.add_collector(metrics.stats_collector(
+        "disk_cache", lambda: {"hits": disk_cache.hits, "misses": disk_cache.misses, "writes": disk_cache.writes, "compacted": disk_cache.compacted},
+        counters=("hits", "misses", "writes", "compacted")))
+
+@api.get("/metrics")
+async def prometheus_metrics():
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@api.get("/metrics/slow-requests")
+async def slow_requests():
+    # Profiles of the slowest sampled requests (empty unless METRICS_PROFILE_SAMPLE_RATE is set).
+    return {"sample_rate": slow_request_profiler.sample_rate, "requests": slow_request_profiler.slowest()}
+
+# ===== APP FACTORY, WARM-UP AND STARTUP REPORT =====
+# WARMUP_ON_STARTUP=true warms up in the background as soon as the app starts; GET /warmup does it on demand
+# (e.g. from a readiness probe, so an instance only takes traffic once the first calls will be fast).
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+
+startup_timings: Dict[str, float] = {}  # Seconds per phase: import, create_app, startup, ready, warmup_*.
+startup_seconds = metrics.REGISTRY.gauge("app_startup_seconds", "Time spent in each startup phase.", ("phase",))
+
+def record_startup(phase: str, seconds: float):
+    startup_timings[phase] = round(seconds, 4)
+    startup_seconds.set(seconds, phase=phase)
+
+_warmup: Optional[asyncio.Future] = None
+
+async def run_warm_up() -> Dict[str, float]:
+    timings = {}
+    started = time.perf_counter()
+    await asyncio.to_thread(llm.get_client)  # Imports openai and builds the pooled client off the event loop.
+    timings["llm_client"] = time.perf_counter() - started
+    started = time.perf_counter()
+    await export_manager.warm_up()
+    timings["exports"] = time.perf_counter() - started
+    for phase, seconds in timings.items():
+        record_startup(f"warmup_{phase}", seconds)
+    return startup_timings
+
+async def warm_up() -> Dict[str, float]:
+    """
+    Loads what the first AI call and the first export would otherwise pay for: the OpenAI library and client,
+    the rendering backends and the export worker processes. Runs once; concurrent and later calls share that run.
+    """
+    global _warmup
+    if _warmup is None:
+        _warmup = asyncio.ensure_future(run_warm_up())
+    try:
+        return await asyncio.shield(_warmup)
+    except Exception:
+        _warmup = None  # Let the next call try again.
+        raise
+
+@api.get("/warmup")
+async def warmup():
+    try:
+        return {"warm": True, "timings": await warm_up()}
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Warm-up failed: {str(e)}")
+
+@api.get("/startup-stats")
+async def startup_stats():
+    warm = _warmup is not None and _warmup.done() and not _warmup.cancelled() and _warmup.exception() is None
+    return {"warm": warm, "timings": startup_timings}
+
+def create_app() -> FastAPI:
+    """
+    Builds the FastAPI app: middleware plus every endpoint on `api`.
+    Run with `uvicorn main:create_app --factory` (`uvicorn main:app` also works - see __getattr__ below).
+    """
+    started = time.perf_counter()
+    app = FastAPI(lifespan=lifespan)
+
+    # Add CORS middleware to allow requests from the frontend. 
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["GET", "POST", "OPTIONS"],  # Explicitly allow OPTIONS (eventually change to "*" to allow all methods)
+        allow_headers=["*"],
+        expose_headers=["ETag"],
+    )
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+    # Added last so it is the outermost middleware and times the whole request, compression included.
+    app.add_middleware(metrics.MetricsMiddleware, routes=lambda: app.routes, profiler=slow_request_profiler)
+
+    app.include_router(api)
+    record_startup("create_app", time.perf_counter() - started)
+    return app
+
+_app: Optional[FastAPI] = None
+
+def __getattr__(name: str):
+    # `main.app` is built on first access, so importing main (tools, tests, the factory) does not create an app.
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+record_startup("import", time.perf_counter() - IMPORT_STARTED)
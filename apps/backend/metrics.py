@@ -0,0 +1,333 @@
+'''
+Metrics for the Pitch Deck Generator backend, exposed in the Prometheus text format at GET /metrics.
+
+A small self-contained registry (counters, gauges, histograms with labels) so no extra package
+is needed. MetricsMiddleware records per-route latency, status and in-flight requests; llm.py,
+exports.py and main.py record upstream LLM calls, export renders and user store operations.
+Values that other components already count (cache, scheduler) are read at scrape time through
+collectors.
+
+An optional sampling profiler (METRICS_PROFILE_SAMPLE_RATE) profiles a share of requests and
+keeps the profiles of the slowest ones for GET /metrics/slow-requests.
+'''
+
+import cProfile
+import heapq
+import io
+import itertools
+import os
+import pstats
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 * 1024, 10 * 1024 * 1024, 100 * 1024 * 1024)
+
+Labels = Tuple[str, ...]
+Sample = Tuple[str, Dict[str, str], float]  # (name suffix, labels, value)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Sample]:
+        return []
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield "", dict(zip(self.labelnames, key)), value
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def set(self, value: float, **labels: str):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield "", dict(zip(self.labelnames, key)), value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Labels, List[float]] = {}  # labels -> per-bucket counts + [sum, count]
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self) -> Iterable[Sample]:
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        for key, state in values.items():
+            labels = dict(zip(self.labelnames, key))
+            for index, bound in enumerate(self.buckets):
+                yield "_bucket", {**labels, "le": _format_value(bound)}, state[index]
+            yield "_bucket", {**labels, "le": "+Inf"}, state[-1]
+            yield "_sum", labels, state[-2]
+            yield "_count", labels, state[-1]
+
+
+class Registry:
+    """
+    Holds the metrics and renders them. Collectors are called at scrape time and return
+    (name, type, help, [(labels, value)]) tuples for values that live elsewhere.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing  # Re-imports (e.g. reloads) reuse the same metric.
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def add_collector(self, collector: Callable):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                lines.append(f"# collector error: {str(e)}")
+                continue
+            for name, metric_type, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ===== HTTP =====
+http_requests = REGISTRY.counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_request_duration = REGISTRY.histogram("http_request_duration_seconds", "HTTP request latency (until the body is sent).", ("method", "route"))
+http_in_flight = REGISTRY.gauge("http_requests_in_flight", "HTTP requests being handled.", ("route",))
+
+# ===== UPSTREAM LLM =====
+llm_request_duration = REGISTRY.histogram("llm_request_duration_seconds", "Upstream LLM call latency (per attempt).", ("model", "stream"))
+llm_requests = REGISTRY.counter("llm_requests_total", "Upstream LLM calls (per attempt) by outcome.", ("model", "outcome"))
+llm_errors = REGISTRY.counter("llm_errors_total", "Upstream LLM errors by model and error type.", ("model", "error"))
+llm_tokens = REGISTRY.counter("llm_tokens_total", "Tokens used by upstream LLM calls.", ("model", "kind"))
+
+# ===== STORAGE AND EXPORTS =====
+store_duration = REGISTRY.histogram("user_store_operation_duration_seconds", "User store operation latency.", ("backend", "operation"))
+export_render_duration = REGISTRY.histogram("export_render_duration_seconds", "Export render time.", ("format", "mode"))
+export_size = REGISTRY.histogram("export_artifact_bytes", "Rendered export size.", ("format",), buckets=SIZE_BUCKETS)
+
+
+def record_llm_call(model: str, stream: bool, seconds: float, error: Optional[Exception] = None, usage=None):
+    # Called by llm.py for every upstream attempt.
+    llm_request_duration.observe(seconds, model=model, stream=str(stream).lower())
+    llm_requests.inc(model=model, outcome="error" if error is not None else "ok")
+    if error is not None:
+        llm_errors.inc(model=model, error=type(error).__name__)
+    if usage is not None:
+        llm_tokens.inc(getattr(usage, "prompt_tokens", 0) or 0, model=model, kind="prompt")
+        llm_tokens.inc(getattr(usage, "completion_tokens", 0) or 0, model=model, kind="completion")
+        # Prompt tokens served from the provider's prompt cache (part of the prompt count above).
+        details = getattr(usage, "prompt_tokens_details", None)
+        llm_tokens.inc(getattr(details, "cached_tokens", 0) or 0, model=model, kind="cached_prompt")
+
+
+def stats_collector(prefix: str, stats: Callable[[], Dict], counters: Sequence[str] = (), gauges: Sequence[str] = ()):
+    """
+    Builds a collector that exposes numeric fields of a component's stats() dict.
+    """
+    def collect():
+        values = stats()
+        for field in counters:
+            if isinstance(values.get(field), (int, float)):
+                yield f"{prefix}_{field}_total", "counter", f"{prefix} {field}.", [({}, values[field])]
+        for field in gauges:
+            if isinstance(values.get(field), (int, float)):
+                yield f"{prefix}_{field}", "gauge", f"{prefix} {field}.", [({}, values[field])]
+    return collect
+
+
+# ===== SAMPLING PROFILER =====
+class SlowRequestProfiler:
+    """
+    Profiles a random `sample_rate` share of requests with cProfile (one at a time - cProfile profiles the whole
+    event loop thread, so concurrent requests show up too) and keeps the `keep` slowest profiles above `min_seconds`.
+    Profiles are also written to `directory` as .prof files when it is set.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, keep: int = 20, min_seconds: float = 0.5, directory: str = ""):
+        self.sample_rate = sample_rate
+        self.keep = keep
+        self.min_seconds = min_seconds
+        self.directory = directory
+        self._active = False
+        self._slowest: List[Tuple[float, int, Dict]] = []  # Min-heap of (duration, seq, entry)
+        self._seq = itertools.count()
+
+    def start(self) -> Optional[cProfile.Profile]:
+        if self.sample_rate <= 0 or self._active or random.random() >= self.sample_rate:
+            return None
+        self._active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def finish(self, profile: cProfile.Profile, method: str, route: str, seconds: float):
+        profile.disable()
+        self._active = False
+        if seconds < self.min_seconds:
+            return
+        if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+            return
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(25)
+        entry = {"method": method, "route": route, "duration_ms": round(seconds * 1000, 1), "at": time.time(), "profile": output.getvalue()}
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{int(entry['at'] * 1000)}-{route.strip('/').replace('/', '_') or 'root'}.prof")
+            profile.dump_stats(path)
+            entry["file"] = path
+        heapq.heappush(self._slowest, (seconds, next(self._seq), entry))
+        if len(self._slowest) > self.keep:
+            heapq.heappop(self._slowest)
+
+    def slowest(self) -> List[Dict]:
+        return [entry for _, _, entry in sorted(self._slowest, key=lambda item: -item[0])]
+
+
+class MetricsMiddleware:
+    """
+    Records latency, status and in-flight count per route template (e.g. /export-jobs/{job_id}), so
+    path parameters do not create new series. Unmatched paths are grouped under "unmatched".
+    """
+
+    def __init__(self, app: ASGIApp, routes: Callable[[], Sequence], profiler: Optional[SlowRequestProfiler] = None):
+        self.app = app
+        self.routes = routes
+        self.profiler = profiler
+
+    def _route(self, scope: Scope) -> str:
+        from starlette.routing import Match
+        for route in self.routes():
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return getattr(route, "path", "unmatched")
+        return "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        route = self._route(scope)
+        status = {"code": 500}
+
+        async def send_with_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        profile = self.profiler.start() if self.profiler is not None else None
+        http_in_flight.inc(route=route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            http_in_flight.dec(route=route)
+            http_request_duration.observe(seconds, method=method, route=route)
+            http_requests.inc(method=method, route=route, status=str(status["code"]))
+            if profile is not None:
+                self.profiler.finish(profile, method, route, seconds)
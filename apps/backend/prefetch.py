@@ -0,0 +1,165 @@
+'''
+Speculative prefetch for the Pitch Deck Generator backend.
+
+After a deck is generated, the editor almost always asks for design suggestions and visual data for the
+first slides it opens. The Prefetcher runs those calls in the background at the lowest scheduler priority,
+so their results are already in the response cache (under the keys the endpoints look up) by the time they
+are requested. A request that arrives while a prefetch is still running joins it through single-flight.
+
+Jobs are tied to the slide content they were built from. If the user edits that slide first, its jobs are
+cancelled, and the upstream call is dropped unless a real request has already joined it. Jobs belong to an
+owner - the deck context or signed-in user they were made for - and each owner has a budget of estimated
+prefetch cost per time window; jobs beyond it are skipped.
+'''
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from cache import SingleFlight
+
+
+@dataclass(eq=False)
+class PrefetchJob:
+    endpoint: str
+    slide: str  # Title of the slide the job belongs to.
+    content: str  # Slide content the job was built from - any other content makes it stale.
+    cache_key: str
+    cost: float  # Estimated $ for the upstream call.
+    run: Callable[[], Awaitable[Any]]
+    task: Optional["asyncio.Task"] = field(default=None, repr=False)
+
+
+class Prefetcher:
+    """
+    Background jobs per owner, with a per-owner cost budget and a cap on jobs running at once.
+    """
+
+    def __init__(self, inflight: SingleFlight, is_cached: Callable[[str], bool], user_budget: float = 0.05,
+                 budget_window: float = 3600, concurrency: int = 2, remember: int = 1000):
+        self.inflight = inflight
+        self.is_cached = is_cached
+        self.user_budget = user_budget
+        self.budget_window = budget_window
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._jobs: Dict[str, List[PrefetchJob]] = {}
+        self._spent: Dict[str, Deque[Tuple[float, float]]] = {}  # owner -> (time, $) per started job within the window
+        self._pruned = time.monotonic()
+        self._prefetched: "OrderedDict[str, None]" = OrderedDict()  # Recently filled cache keys, to count hits.
+        self._remember = remember
+        self.scheduled = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.skipped_cached = 0
+        self.skipped_budget = 0
+        self.failed = 0
+        self.hits = 0
+        self.spent = 0.0
+
+    def submit(self, owner: str, jobs: List[PrefetchJob]) -> int:
+        """
+        Replaces the owner's pending jobs with `jobs` (a new deck makes the old ones pointless).
+        Returns the number of jobs started.
+        """
+        self.cancel(owner)
+        self._prune_spent(time.monotonic())
+        started = []
+        for job in jobs:
+            if self.is_cached(job.cache_key) or self.inflight.in_flight(job.cache_key):
+                self.skipped_cached += 1
+                continue
+            job.task = asyncio.ensure_future(self._run(owner, job))
+            job.task.add_done_callback(lambda task, owner=owner, job=job: self._finish(owner, job, task))
+            started.append(job)
+        if started:
+            self._jobs[owner] = started
+            self.scheduled += len(started)
+        return len(started)
+
+    def _budget_left(self, owner: str, now: float) -> float:
+        spent = self._spent.setdefault(owner, deque())
+        while spent and spent[0][0] <= now - self.budget_window:
+            spent.popleft()
+        return self.user_budget - sum(cost for _, cost in spent)
+
+    def _prune_spent(self, now: float):
+        # Forgets owners whose spending has all left the budget window (at most once per tenth of a window).
+        if now - self._pruned < self.budget_window / 10:
+            return
+        self._pruned = now
+        for owner in [owner for owner, spent in self._spent.items() if not spent or spent[-1][0] <= now - self.budget_window]:
+            del self._spent[owner]
+
+    async def _run(self, owner: str, job: PrefetchJob):
+        async with self._semaphore:
+            if self.is_cached(job.cache_key):
+                self.skipped_cached += 1  # A real request got there first.
+                return
+            now = time.monotonic()
+            if job.cost > self._budget_left(owner, now):
+                self.skipped_budget += 1
+                return
+            self._spent[owner].append((now, job.cost))
+            self.spent += job.cost
+            await job.run()
+            self.completed += 1
+            self._prefetched[job.cache_key] = None
+            while len(self._prefetched) > self._remember:
+                self._prefetched.popitem(last=False)
+
+    def _finish(self, owner: str, job: PrefetchJob, task: "asyncio.Task"):
+        jobs = self._jobs.get(owner)
+        if jobs and job in jobs:
+            jobs.remove(job)
+            if not jobs:
+                del self._jobs[owner]
+        if not task.cancelled() and task.exception() is not None:
+            self.failed += 1
+            print(f"Prefetch of {job.endpoint} for '{job.slide}' failed: {str(task.exception())}")
+
+    def _cancel_job(self, job: PrefetchJob):
+        if job.task is not None and not job.task.done():
+            job.task.cancel()  # SingleFlight cancels the call too unless a real request has joined it.
+            self.cancelled += 1
+
+    def cancel(self, owner: str, slide: Optional[str] = None) -> int:
+        # Cancels the owner's pending jobs (only those for `slide` if given).
+        jobs = [job for job in self._jobs.get(owner, []) if slide is None or job.slide == slide]
+        for job in jobs:
+            self._cancel_job(job)
+        return len(jobs)
+
+    def slides_edited(self, owner: str, contents: Dict[str, Optional[str]]) -> int:
+        """
+        Cancels jobs for slides whose content is no longer what the job was built from.
+        `contents` maps slide titles to their new content (None for a deleted slide); other slides are untouched.
+        """
+        stale = [job for job in self._jobs.get(owner, []) if job.slide in contents and contents[job.slide] != job.content]
+        for job in stale:
+            self._cancel_job(job)
+        return len(stale)
+
+    def pending(self, owner: str) -> bool:
+        return bool(self._jobs.get(owner))
+
+    def record_hit(self, cache_key: str):
+        # Called on response cache hits - counts the first use of each prefetched result.
+        if cache_key in self._prefetched:
+            del self._prefetched[cache_key]
+            self.hits += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": sum(len(jobs) for jobs in self._jobs.values()),
+            "owners": len(self._spent),
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "skipped_cached": self.skipped_cached,
+            "skipped_budget": self.skipped_budget,
+            "failed": self.failed,
+            "hits": self.hits,
+            "spent": round(self.spent, 4),
+        }
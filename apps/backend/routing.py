@@ -0,0 +1,241 @@
+'''
+Model routing for the Pitch Deck Generator backend.
+
+Each AI route is served by the most capable model that meets the route's latency and cost SLOs.
+Short editor actions (suggestions, visual data, design tips) land on smaller, faster models, while
+deck generation and analysis stay on GPT-4. When an answer fails validation (e.g. visual data that
+is not valid JSON), the call is retried one tier up. Latency is recorded per route and model, and
+observed p95 latency replaces the configured estimate once there are enough samples, so routing
+follows real performance.
+
+Configuration (.env):
+    LLM_MODEL_TIERS=gpt-4o-mini:0.0006:1500,gpt-4o:0.01:3000,gpt-4:0.06:8000  # name:$ per 1K tokens:expected ms, cheapest first
+    LLM_ROUTE_SLOS=generate-suggestion:2000:0.002,generate-visual-data:3000:0.005  # route:max p95 ms:max $ per call
+    LLM_ROUTE_MODELS=generate-slides:gpt-4  # Pin a route to a model (skips SLO routing)
+'''
+
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import llm
+import metrics
+from scheduler import PRIORITY_STANDARD
+
+DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL", "gpt-4")  # Used by routes without an SLO.
+MIN_SAMPLES = 20  # Observed latencies needed before they replace the configured estimate.
+
+route_duration = metrics.REGISTRY.histogram("llm_route_duration_seconds", "LLM latency by route and model.", ("route", "model"))
+route_prompt_tokens = metrics.REGISTRY.histogram("llm_route_prompt_tokens", "Estimated prompt tokens sent per call, by route.", ("route",),
+                                                 buckets=metrics.TOKEN_BUCKETS)
+route_escalations = metrics.REGISTRY.counter("llm_route_escalations_total", "Answers that failed validation and moved up a tier.", ("route", "model"))
+
+
+@dataclass
+class ModelTier:
+    name: str
+    cost_per_1k: float  # Blended $ per 1K tokens.
+    latency_ms: float  # Expected p95 latency until real samples are available.
+
+
+@dataclass
+class RouteSLO:
+    max_latency_ms: Optional[float] = None
+    max_cost: Optional[float] = None  # $ per call.
+
+
+DEFAULT_TIERS = "gpt-4o-mini:0.0006:1500,gpt-4o:0.01:3000,gpt-4:0.06:8000"
+DEFAULT_SLOS = (
+    "generate-suggestion:2000:0.002,"
+    "generate-visual-data:3000:0.005,"
+    "generate-design-suggestions:4000:0.02"
+)
+
+
+def parse_tiers(value: str) -> List[ModelTier]:
+    tiers = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, cost, latency = item.split(":")
+        tiers.append(ModelTier(name, float(cost), float(latency)))
+    return tiers
+
+
+def parse_slos(value: str) -> Dict[str, RouteSLO]:
+    slos = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, latency, cost = (item.split(":") + ["", ""])[:3]
+        slos[route] = RouteSLO(float(latency) if latency else None, float(cost) if cost else None)
+    return slos
+
+
+def parse_pins(value: str) -> Dict[str, str]:
+    return dict(item.strip().split(":", 1) for item in value.split(",") if item.strip())
+
+
+class ModelRouter:
+    """
+    Picks a model per route and records per-route, per-model latency and validation failures.
+    """
+
+    def __init__(self, tiers: List[ModelTier], slos: Dict[str, RouteSLO], pins: Optional[Dict[str, str]] = None,
+                 default_model: str = DEFAULT_MODEL, window: int = 200):
+        self.tiers = tiers
+        self.slos = slos
+        self.pins = pins or {}
+        self.default_model = default_model
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self._window = window
+        self.calls: Dict[Tuple[str, str], int] = {}
+        self.validation_failures: Dict[Tuple[str, str], int] = {}
+        self.prompt_tokens: Dict[str, int] = {}  # route -> estimated prompt tokens sent
+        self.prompts: Dict[str, int] = {}  # route -> calls counted in prompt_tokens
+
+    def _tier_index(self, model: str) -> Optional[int]:
+        for index, tier in enumerate(self.tiers):
+            if tier.name == model:
+                return index
+        return None
+
+    def expected_latency_ms(self, route: str, tier: ModelTier) -> float:
+        samples = self._latencies.get((route, tier.name))
+        if samples and len(samples) >= MIN_SAMPLES:
+            ordered = sorted(samples)
+            return ordered[int(0.95 * (len(ordered) - 1))] * 1000
+        return tier.latency_ms
+
+    def choose(self, route: str, tokens: int) -> str:
+        """
+        The most capable tier that meets the route's SLOs for a call of about `tokens` tokens,
+        or the cheapest tier when none does. Routes without an SLO use the pinned or default model.
+        """
+        if route in self.pins:
+            return self.pins[route]
+        slo = self.slos.get(route)
+        if slo is None or not self.tiers:
+            return self.default_model
+        for tier in reversed(self.tiers):
+            if slo.max_latency_ms is not None and self.expected_latency_ms(route, tier) > slo.max_latency_ms:
+                continue
+            if slo.max_cost is not None and tokens / 1000 * tier.cost_per_1k > slo.max_cost:
+                continue
+            return tier.name
+        return self.tiers[0].name
+
+    def estimate_cost(self, route: str, tokens: int) -> float:
+        # $ for a call of about `tokens` tokens on the model `route` gets now (unknown models are priced as the largest tier).
+        index = self._tier_index(self.choose(route, tokens))
+        tier = self.tiers[index] if index is not None else (self.tiers[-1] if self.tiers else None)
+        return tokens / 1000 * tier.cost_per_1k if tier else 0.0
+
+    def escalate(self, model: str) -> Optional[str]:
+        # Next tier up, or None if `model` is already the largest (or not a known tier).
+        index = self._tier_index(model)
+        if index is None or index + 1 >= len(self.tiers):
+            return None
+        return self.tiers[index + 1].name
+
+    def record(self, route: str, model: str, seconds: float):
+        self._latencies.setdefault((route, model), deque(maxlen=self._window)).append(seconds)
+        self.calls[(route, model)] = self.calls.get((route, model), 0) + 1
+        route_duration.observe(seconds, route=route, model=model)
+
+    def record_prompt(self, route: str, tokens: int):
+        self.prompt_tokens[route] = self.prompt_tokens.get(route, 0) + tokens
+        self.prompts[route] = self.prompts.get(route, 0) + 1
+        route_prompt_tokens.observe(tokens, route=route)
+
+    def record_validation_failure(self, route: str, model: str):
+        self.validation_failures[(route, model)] = self.validation_failures.get((route, model), 0) + 1
+        route_escalations.inc(route=route, model=model)
+
+    def stats(self) -> Dict[str, Any]:
+        routes: Dict[str, Dict[str, Any]] = {}
+        for (route, model), count in self.calls.items():
+            samples = sorted(self._latencies.get((route, model), ()))
+            routes.setdefault(route, {})[model] = {
+                "calls": count,
+                "validation_failures": self.validation_failures.get((route, model), 0),
+                "p50_ms": round(samples[len(samples) // 2] * 1000, 1) if samples else None,
+                "p95_ms": round(samples[int(0.95 * (len(samples) - 1))] * 1000, 1) if samples else None,
+            }
+        return {
+            "tiers": [tier.__dict__ for tier in self.tiers],
+            "slos": {route: slo.__dict__ for route, slo in self.slos.items()},
+            "pins": self.pins,
+            "default_model": self.default_model,
+            "current": {route: self.choose(route, 500) for route in self.slos},
+            "routes": routes,
+            "prompt_tokens": {
+                route: {"calls": self.prompts[route], "total": tokens, "mean": round(tokens / self.prompts[route], 1)}
+                for route, tokens in self.prompt_tokens.items()
+            },
+        }
+
+
+router = ModelRouter(
+    parse_tiers(os.getenv("LLM_MODEL_TIERS", DEFAULT_TIERS)),
+    parse_slos(os.getenv("LLM_ROUTE_SLOS", DEFAULT_SLOS)),
+    parse_pins(os.getenv("LLM_ROUTE_MODELS", "")),
+)
+
+
+class ValidationError(ValueError):
+    """
+    An answer that failed validation on every tier; `text` is the last raw answer.
+    """
+
+    def __init__(self, message: str, text: str = ""):
+        super().__init__(message)
+        self.text = text
+
+
+async def routed_completion(route: str, messages: List[Dict[str, str]], max_tokens: int = 2000, timeout: Optional[float] = None,
+                            priority: int = PRIORITY_STANDARD, validate: Optional[Callable[[str], Any]] = None,
+                            response_format: Optional[Dict[str, Any]] = None) -> Tuple[str, Any, str]:
+    """
+    Runs a chat completion on the model chosen for `route` and returns (text, validated value, model).
+    `validate` turns the text into the value and raises ValueError if it is not acceptable; the call is then
+    repeated one tier up. If the largest tier also fails, a ValidationError carrying the last answer is raised.
+    """
+    model = router.choose(route, llm.estimate_tokens(messages, max_tokens))
+    while True:
+        started = time.perf_counter()
+        router.record_prompt(route, llm.estimate_tokens(messages, 0))
+        response = await llm.chat_completion(model=model, messages=messages, max_tokens=max_tokens, timeout=timeout, priority=priority,
+                                             response_format=response_format)
+        router.record(route, model, time.perf_counter() - started)
+        text = (response.choices[0].message.content or "").strip()
+        if validate is None:
+            return text, text, model
+        try:
+            return text, validate(text), model
+        except ValueError as e:
+            router.record_validation_failure(route, model)
+            next_model = router.escalate(model)
+            if next_model is None:
+                raise ValidationError(str(e), text) from e
+            model = next_model
+
+
+async def routed_stream(route: str, messages: List[Dict[str, str]], max_tokens: int = 2000, timeout: Optional[float] = None,
+                        priority: int = PRIORITY_STANDARD, response_format: Optional[Dict[str, Any]] = None):
+    """
+    Streams a chat completion on the model chosen for `route` and records the full stream time.
+    Streamed text is forwarded as it arrives, so it is never validated or escalated.
+    """
+    model = router.choose(route, llm.estimate_tokens(messages, max_tokens))
+    router.record_prompt(route, llm.estimate_tokens(messages, 0))
+    started = time.perf_counter()
+    async for chunk in llm.stream_chat_completion(model=model, messages=messages, max_tokens=max_tokens, timeout=timeout, priority=priority,
+                                                  response_format=response_format):
+        yield chunk
+    router.record(route, model, time.perf_counter() - started)
+
+
+def require_text(text: str) -> str:
+    # Validator for free-text answers: anything but an empty reply.
+    if not text:
+        raise ValidationError("Empty response content received from OpenAI")
+    return text
@@ -0,0 +1,332 @@
+'''
+Upstream call scheduler for the Pitch Deck Generator backend.
+
+Every OpenAI call goes through one UpstreamScheduler, so all AI endpoints share one budget:
+
+- Token buckets for requests/min and tokens/min. The rate adapts (AIMD): it is halved when
+  OpenAI returns a rate-limit error and grows back slowly while calls succeed.
+- Priority classes: waiting calls are admitted in priority order, so interactive editor
+  actions go ahead of batch and background work.
+- Jittered exponential retry on retryable errors (rate limits, timeouts, connection errors, 5xx),
+  honouring Retry-After and the caller's deadline.
+- A circuit breaker that fails fast while the provider is degraded, plus a bound on queue depth.
+'''
+
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Priority classes - lower runs first.
+PRIORITY_INTERACTIVE = 0  # Single-slide editor actions (suggestions, visual data, slide content).
+PRIORITY_STANDARD = 1  # Whole-deck generation and analysis.
+PRIORITY_BATCH = 2  # Batch endpoint items.
+PRIORITY_BACKGROUND = 3  # Speculative / background work.
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_STANDARD: "standard",
+    PRIORITY_BATCH: "batch",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+class SchedulerError(Exception):
+    """
+    Raised instead of calling upstream. `retry_after` is a hint in seconds for the client.
+    """
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(SchedulerError):
+    pass
+
+
+class QueueFullError(SchedulerError):
+    pass
+
+
+def is_openai_error(error: BaseException) -> bool:
+    # Checked before importing openai, so other errors (validation, bugs) never load the SDK.
+    return type(error).__module__.partition(".")[0] == "openai"
+
+
+def is_rate_limited(error: Exception) -> bool:
+    if not is_openai_error(error):
+        return False
+    import openai  # Imported on use - the client that raised `error` has already loaded it.
+    return isinstance(error, openai.RateLimitError)
+
+
+def is_retryable(error: Exception) -> bool:
+    if not is_openai_error(error):
+        return False
+    import openai
+    return isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError))
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    # Seconds from the Retry-After header of an API error, if it sent one.
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Refills continuously at `per_minute * factor` per minute, holding at most one minute of budget.
+    """
+
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float, factor: float):
+        capacity = self.per_minute * factor
+        self.tokens = min(capacity, self.tokens + (now - self.updated) * capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float, factor: float) -> float:
+        """
+        Seconds until `amount` is available (0 if it is available now).
+        """
+        self._refill(now, factor)
+        amount = min(amount, self.per_minute * factor)  # A single call larger than the bucket waits for a full bucket.
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) * 60 / (self.per_minute * factor)
+
+    def take(self, amount: float):
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        # Negative amounts charge extra (the call used more than estimated).
+        self.tokens += amount
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and fails fast for `reset_timeout` seconds.
+    Then one probe call is let through (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        return max(1.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def release_probe(self):
+        # The probe ended without an answer from the provider (cancelled, or timed out waiting) - let the next call probe.
+        self.probing = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.trips += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+class UpstreamScheduler:
+    """
+    Admits upstream calls in priority order under shared request and token budgets, retries retryable
+    errors with jittered exponential backoff and fails fast while the circuit breaker is open.
+    """
+
+    def __init__(self, requests_per_minute: float = 500, tokens_per_minute: float = 80000, max_queue: int = 1000,
+                 max_retries: int = 3, retry_base: float = 0.5, retry_max_delay: float = 20,
+                 failure_threshold: int = 5, reset_timeout: float = 30, min_rate_factor: float = 0.1):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max_delay = retry_max_delay
+        self.min_rate_factor = min_rate_factor
+        self.rate_factor = 1.0  # Adaptive share of the configured limits currently in use.
+        self.paused_until = 0.0
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self._queue: List[list] = []  # Heap of [priority, seq, waiter] - waiters are removed when admitted.
+        self._seq = itertools.count()
+        self._changed: Optional[asyncio.Event] = None
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.rejected = 0
+        self.failures = 0
+        self.admitted_by_priority: Dict[str, int] = {name: 0 for name in PRIORITY_NAMES.values()}
+
+    def _reserve(self, tokens: float) -> float:
+        # Takes one request and `tokens` tokens from the buckets, or returns the seconds to wait for them.
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        wait = max(self.requests.wait_time(1, now, self.rate_factor), self.tokens.wait_time(tokens, now, self.rate_factor))
+        if wait > 0:
+            return wait
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        return 0.0
+
+    def _notify(self):
+        # Wakes every waiter so the new head of the queue can re-check the buckets.
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = None
+
+    async def acquire(self, tokens: float, priority: int = PRIORITY_STANDARD, deadline: Optional[float] = None) -> bool:
+        """
+        Waits for this call's turn and budget. Calls of the same priority are admitted first come, first served.
+        Returns True if the call is the circuit breaker's half-open probe.
+        """
+        if len(self._queue) >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError("Too many requests are waiting for the upstream API. Please try again later.", 5.0)
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise CircuitOpenError("Upstream API is unavailable. Please try again later.", self.breaker.retry_after())
+        probe = self.breaker.state == "half_open"  # allow() only lets the probe through while half-open.
+        entry = [priority, next(self._seq), object()]
+        heapq.heappush(self._queue, entry)
+        try:
+            while True:
+                # Only the head of the queue checks the buckets; the others wait for it to be admitted.
+                wait = self._reserve(tokens) if self._queue[0] is entry else None
+                if wait == 0:
+                    break
+                timeout = wait
+                if deadline is not None:
+                    # Every waiter bounds its sleep by its own deadline, not only the head.
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or (wait is not None and wait > remaining):
+                        raise asyncio.TimeoutError("Deadline exceeded while waiting for upstream capacity")
+                    timeout = remaining if wait is None else min(wait, remaining)
+                if self._changed is None:
+                    self._changed = asyncio.Event()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if probe:
+                self.breaker.release_probe()
+            raise
+        finally:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._notify()
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        self.admitted_by_priority[name] = self.admitted_by_priority.get(name, 0) + 1
+        return probe
+
+    def _throttle(self, error: Exception):
+        # Multiplicative decrease on a rate-limit error, and a pause for as long as the API asked.
+        self.rate_limited += 1
+        self.rate_factor = max(self.min_rate_factor, self.rate_factor * 0.5)
+        pause = retry_after(error)
+        if pause:
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        # Full jitter: a random delay up to base * 2^attempt (capped), but never less than the API's Retry-After.
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base * (2 ** attempt)))
+        return max(delay, retry_after(error) or 0)
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], tokens: float, priority: int = PRIORITY_STANDARD,
+                   deadline: Optional[float] = None) -> Any:
+        """
+        Runs `fn` once admitted, retrying retryable errors. `tokens` is the estimated cost of the call; when the
+        result reports its usage the token bucket is corrected. `deadline` (time.monotonic()) bounds waits and retries.
+        """
+        attempt = 0
+        while True:
+            probe = await self.acquire(tokens, priority, deadline)
+            self.calls += 1
+            self.in_flight += 1
+            try:
+                result = await fn()
+            except Exception as e:
+                if is_rate_limited(e):
+                    self._throttle(e)
+                    self.breaker.release_probe()
+                elif is_retryable(e):
+                    self.failures += 1
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()  # The provider answered - the request itself was bad.
+                    raise
+                delay = self._backoff(attempt, e)
+                if attempt >= self.max_retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                    raise
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                if probe:
+                    self.breaker.release_probe()  # Cancelled mid-call - the provider's health is still unknown.
+                raise
+            finally:
+                self.in_flight -= 1
+                self._notify()
+            self.breaker.record_success()
+            self.rate_factor = min(1.0, self.rate_factor + 0.05)  # Additive increase back towards the configured limits.
+            usage = getattr(result, "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                self.tokens.refund(tokens - usage.total_tokens)
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": len(self._queue),
+            "in_flight": self.in_flight,
+            "requests_per_minute": self.requests.per_minute,
+            "tokens_per_minute": self.tokens.per_minute,
+            "rate_factor": round(self.rate_factor, 3),
+            "requests_available": int(self.requests.tokens),
+            "tokens_available": int(self.tokens.tokens),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 2),
+            "circuit": self.breaker.state,
+            "circuit_trips": self.breaker.trips,
+            "calls": self.calls,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "admitted_by_priority": dict(self.admitted_by_priority),
+        }
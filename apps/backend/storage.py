@@ -0,0 +1,557 @@
+'''
+User data storage for the Pitch Deck Generator backend.
+
+Replaces the whole-file rewrite of user_data.json with a pluggable store that reads and
+writes one user at a time. The default backend is a local SQLite database in WAL mode:
+writes are atomic and durable, and several uvicorn/gunicorn workers can use it at once.
+The store methods are blocking - async handlers call them through asyncio.to_thread.
+
+Each user's slides form a versioned deck. Saves are applied as per-slide changes
+(insert, update, delete by slide id), so a backend only rewrites the slides that changed,
+and clients can ask for the changes made since a given version.
+'''
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+UserData = Dict[str, Any]
+Slide = Dict[str, Any]
+
+# Number of deck changes kept by document-based backends for "changes since version N" queries.
+DECK_CHANGELOG_LIMIT = 500
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a deck patch is based on an older version than the stored deck.
+    """
+
+    def __init__(self, current_version: int):
+        super().__init__(f"Deck has changed (current version is {current_version})")
+        self.current_version = current_version
+
+
+class SlideNotFound(Exception):
+    """
+    Raised when a deck patch updates or deletes a slide id that does not exist.
+    """
+
+
+def new_slide_id() -> str:
+    return uuid.uuid4().hex
+
+
+def assign_slide_ids(slides: List[Slide], current: List[Slide]) -> List[Slide]:
+    """
+    Gives every slide of a full save an id. Slides sent without one (older clients) take the id
+    of the current slide at the same position, so an unchanged deck is detected as unchanged.
+    """
+    used = set()
+    result = []
+    for index, slide in enumerate(slides):
+        slide_id = slide.get("id")
+        if not slide_id and index < len(current) and current[index].get("id") not in used:
+            slide_id = current[index].get("id")
+        if not slide_id or slide_id in used:
+            slide_id = new_slide_id()
+        used.add(slide_id)
+        result.append({**slide, "id": slide_id})
+    return result
+
+
+def apply_changes(slides: List[Slide], changes: List[Dict[str, Any]]) -> Tuple[List[Slide], List[str]]:
+    """
+    Applies insert/update/delete changes to a list of slides. Returns the new list and the ids that changed.
+    `update` merges the given fields into the slide; `insert` places the slide at `index` (default: the end).
+    """
+    slides = list(slides)
+    changed = []
+    for change in changes:
+        op = change["op"]
+        if op == "insert":
+            slide = dict(change.get("slide") or {})
+            slide["id"] = change.get("id") or slide.get("id") or new_slide_id()
+            index = change.get("index")
+            slides.insert(len(slides) if index is None else max(0, min(index, len(slides))), slide)
+            changed.append(slide["id"])
+            continue
+        position = next((i for i, slide in enumerate(slides) if slide.get("id") == change.get("id")), None)
+        if position is None:
+            raise SlideNotFound(f"Slide '{change.get('id')}' not found")
+        if op == "update":
+            updated = {**slides[position], **(change.get("slide") or {}), "id": change["id"]}
+            if updated == slides[position]:
+                continue  # Same content (a repeated autosave) - not a change, so no new version.
+            slides[position] = updated
+        elif op == "delete":
+            del slides[position]
+        else:
+            raise ValueError(f"Unknown slide change '{op}'")
+        changed.append(change["id"])
+    return slides, changed
+
+
+class UserStore:
+    """
+    Base class for user data backends. Each user's data is a JSON-serializable dict.
+    """
+
+    def get(self, user_id: str) -> UserData:
+        raise NotImplementedError
+
+    def put(self, user_id: str, user_data: UserData):
+        raise NotImplementedError
+
+    def update(self, user_id: str, fn: Callable[[UserData], UserData]) -> UserData:
+        """
+        Atomically applies `fn` to the user's current data and stores the result (read-modify-write).
+        """
+        raise NotImplementedError
+
+    def import_users(self, users: Dict[str, UserData]) -> int:
+        """
+        Adds users that are not in the store yet. Returns the number of users imported.
+        """
+        raise NotImplementedError
+
+    # ----- Versioned deck -----
+    # Default implementation keeps the deck inside the user's data ("slides", "deckVersion" and a bounded
+    # "deckChanges" log). Backends with per-slide storage override these methods.
+
+    def get_deck(self, user_id: str) -> Tuple[int, List[Slide]]:
+        """
+        Returns (version, slides) for the user's deck.
+        """
+        user_data = self.get(user_id)
+        return user_data.get("deckVersion", 0), user_data.get("slides", [])
+
+    def get_deck_info(self, user_id: str) -> Tuple[int, int]:
+        """
+        Returns (version, slide count) without loading the slides where the backend allows it.
+        """
+        version, slides = self.get_deck(user_id)
+        return version, len(slides)
+
+    def get_deck_changes(self, user_id: str, since: int) -> Dict[str, Any]:
+        """
+        Returns the changes made after version `since`: {"version", "changes", "order"}, where each change is
+        {"op": "upsert", "id", "slide"} or {"op": "delete", "id"} and "order" is the current slide id order.
+        If the changes are no longer available, returns {"version", "slides", "full": True} instead.
+        """
+        user_data = self.get(user_id)
+        version, slides = user_data.get("deckVersion", 0), user_data.get("slides", [])
+        log = user_data.get("deckChanges", [])
+        if since > version or (since < version and (not log or log[0]["version"] > since + 1)):
+            return {"version": version, "slides": slides, "full": True}
+        changed_ids = {entry["id"] for entry in log if entry["version"] > since}
+        by_id = {slide.get("id"): slide for slide in slides}
+        changes = [
+            {"op": "upsert", "id": slide_id, "slide": by_id[slide_id]} if slide_id in by_id else {"op": "delete", "id": slide_id}
+            for slide_id in sorted(changed_ids)
+        ]
+        return {"version": version, "changes": changes, "order": [slide.get("id") for slide in slides]}
+
+    def save_deck(self, user_id: str, slides: List[Slide]) -> Tuple[int, List[Slide]]:
+        """
+        Replaces the whole deck. Only a changed deck gets a new version. Returns (version, slides with ids).
+        """
+        result = {}
+
+        def replace(user_data: UserData) -> UserData:
+            current = user_data.get("slides", [])
+            new_slides = assign_slide_ids(slides, current)
+            old_by_id = {slide.get("id"): slide for slide in current}
+            new_ids = {slide["id"] for slide in new_slides}
+            changed = [slide["id"] for slide in new_slides if old_by_id.get(slide["id"]) != slide]
+            changed += [slide_id for slide_id in old_by_id if slide_id not in new_ids]
+            reordered = [slide.get("id") for slide in current] != [slide["id"] for slide in new_slides]
+            result["slides"] = new_slides
+            if not changed and not reordered:
+                result["version"] = user_data.get("deckVersion", 0)
+                return user_data
+            return self._record_deck(user_data, new_slides, changed or [new_slides[0]["id"]], result)
+
+        self.update(user_id, replace)
+        return result["version"], result["slides"]
+
+    def patch_deck(self, user_id: str, base_version: int, changes: List[Dict[str, Any]]) -> int:
+        """
+        Applies per-slide changes on top of `base_version`. Raises VersionConflict if the deck has moved on.
+        Returns the new version.
+        """
+        result = {}
+
+        def patch(user_data: UserData) -> UserData:
+            version = user_data.get("deckVersion", 0)
+            if base_version != version:
+                raise VersionConflict(version)
+            new_slides, changed = apply_changes(user_data.get("slides", []), changes)
+            if not changed:
+                result["version"] = version
+                return user_data
+            return self._record_deck(user_data, new_slides, changed, result)
+
+        self.update(user_id, patch)
+        return result["version"]
+
+    def purge_tombstones(self, retention: float) -> int:
+        """
+        Forgets deleted slides older than `retention` seconds. "Changes since" a version before the purge then
+        returns the full deck. Returns the number of tombstones removed (this default's change log is already bounded).
+        """
+        return 0
+
+    def _record_deck(self, user_data: UserData, slides: List[Slide], changed: List[str], result: Dict[str, Any]) -> UserData:
+        version = user_data.get("deckVersion", 0) + 1
+        log = user_data.get("deckChanges", []) + [{"version": version, "id": slide_id} for slide_id in changed]
+        result["version"] = version
+        return {**user_data, "slides": slides, "deckVersion": version, "deckChanges": log[-DECK_CHANGELOG_LIMIT:]}
+
+    def close(self):
+        pass
+
+
+class SQLiteUserStore(UserStore):
+    """
+    Default backend - one row per user in a local SQLite database (WAL mode, full fsync on commit).
+    Decks are stored one row per slide, each tagged with the deck version that last changed it;
+    deleted slides are kept as tombstones so "changes since version N" can report them, until purge_tombstones()
+    drops them after a retention period (and moves the deck's `history_from` past their versions).
+    """
+
+    def __init__(self, path: str = "user_data.db"):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            "user_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS decks ("
+            "user_id TEXT PRIMARY KEY, version INTEGER NOT NULL, history_from INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS slides ("
+            "user_id TEXT NOT NULL, slide_id TEXT NOT NULL, position REAL NOT NULL, data TEXT NOT NULL, "
+            "version INTEGER NOT NULL, deleted INTEGER NOT NULL DEFAULT 0, deleted_at REAL, PRIMARY KEY (user_id, slide_id))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS slides_by_version ON slides (user_id, version)")
+        self._add_tombstone_columns()
+
+    def _add_tombstone_columns(self):
+        # Databases created before tombstones were purged: add the columns, and start the clock on existing tombstones.
+        with self._transaction() as conn:
+            if "history_from" not in {row[1] for row in conn.execute("PRAGMA table_info(decks)")}:
+                conn.execute("ALTER TABLE decks ADD COLUMN history_from INTEGER NOT NULL DEFAULT 0")
+            if "deleted_at" not in {row[1] for row in conn.execute("PRAGMA table_info(slides)")}:
+                conn.execute("ALTER TABLE slides ADD COLUMN deleted_at REAL")
+                conn.execute("UPDATE slides SET deleted_at = ? WHERE deleted = 1", (time.time(),))
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; the busy timeout makes concurrent writers from other workers wait instead of failing.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")  # Durable: a committed save survives a crash.
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self, write: bool = True):
+        # Write transactions take the write lock up front (BEGIN IMMEDIATE), so concurrent updates cannot lose each
+        # other's changes; read transactions see one consistent snapshot.
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, user_id: str) -> UserData:
+        row = self._connect().execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def put(self, user_id: str, user_data: UserData):
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO users (user_id, data, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(user_id) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at",
+            (user_id, json.dumps(user_data), time.time()),
+        )
+
+    def update(self, user_id: str, fn: Callable[[UserData], UserData]) -> UserData:
+        with self._transaction() as conn:
+            row = conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            user_data = fn(json.loads(row[0]) if row else {})
+            self.put(user_id, user_data)
+        return user_data
+
+    def import_users(self, users: Dict[str, UserData]) -> int:
+        with self._transaction() as conn:
+            cursor = conn.executemany(
+                "INSERT OR IGNORE INTO users (user_id, data, updated_at) VALUES (?, ?, ?)",
+                [(user_id, json.dumps(user_data), time.time()) for user_id, user_data in users.items()],
+            )
+        return cursor.rowcount
+
+    # ----- Versioned deck (one row per slide) -----
+
+    def get_deck(self, user_id: str) -> Tuple[int, List[Slide]]:
+        with self._transaction(write=False) as conn:
+            deck = conn.execute("SELECT version FROM decks WHERE user_id = ?", (user_id,)).fetchone()
+            if deck is None:
+                return 0, self._legacy_slides(conn, user_id)
+            rows = conn.execute(
+                "SELECT data FROM slides WHERE user_id = ? AND deleted = 0 ORDER BY position", (user_id,)
+            ).fetchall()
+        return deck[0], [json.loads(row[0]) for row in rows]
+
+    def get_deck_info(self, user_id: str) -> Tuple[int, int]:
+        with self._transaction(write=False) as conn:
+            deck = conn.execute("SELECT version FROM decks WHERE user_id = ?", (user_id,)).fetchone()
+            if deck is None:
+                return 0, len(self._legacy_slides(conn, user_id))
+            count = conn.execute("SELECT COUNT(*) FROM slides WHERE user_id = ? AND deleted = 0", (user_id,)).fetchone()[0]
+        return deck[0], count
+
+    def get_deck_changes(self, user_id: str, since: int) -> Dict[str, Any]:
+        with self._transaction(write=False) as conn:
+            deck = conn.execute("SELECT version, history_from FROM decks WHERE user_id = ?", (user_id,)).fetchone()
+            if deck is None or since > deck[0] or since < deck[1]:  # Before history_from, deletes may have been purged.
+                version, slides = (deck[0], None) if deck else (0, self._legacy_slides(conn, user_id))
+                if slides is None:
+                    slides = [json.loads(row[0]) for row in conn.execute(
+                        "SELECT data FROM slides WHERE user_id = ? AND deleted = 0 ORDER BY position", (user_id,)
+                    )]
+                return {"version": version, "slides": slides, "full": True}
+            rows = conn.execute(
+                "SELECT slide_id, data, deleted FROM slides WHERE user_id = ? AND version > ? ORDER BY position",
+                (user_id, since),
+            ).fetchall()
+            order = [row[0] for row in conn.execute(
+                "SELECT slide_id FROM slides WHERE user_id = ? AND deleted = 0 ORDER BY position", (user_id,)
+            )]
+        changes = [
+            {"op": "delete", "id": slide_id} if deleted else {"op": "upsert", "id": slide_id, "slide": json.loads(data)}
+            for slide_id, data, deleted in rows
+        ]
+        return {"version": deck[0], "changes": changes, "order": order}
+
+    def save_deck(self, user_id: str, slides: List[Slide]) -> Tuple[int, List[Slide]]:
+        with self._transaction() as conn:
+            version, current = self._ensure_deck(conn, user_id)
+            new_slides = assign_slide_ids(slides, [slide for _, _, slide in current])
+            old = {slide_id: (position, slide) for slide_id, position, slide in current}
+            new_ids = {slide["id"] for slide in new_slides}
+            # Only slides whose content or position changed are rewritten.
+            upserts = [
+                (slide, float(index)) for index, slide in enumerate(new_slides)
+                if slide["id"] not in old or old[slide["id"]] != (float(index), slide)
+            ]
+            deletes = [slide_id for slide_id in old if slide_id not in new_ids]
+            if upserts or deletes:
+                version = self._write_deck(conn, user_id, version + 1, upserts, deletes)
+        return version, new_slides
+
+    def patch_deck(self, user_id: str, base_version: int, changes: List[Dict[str, Any]]) -> int:
+        with self._transaction() as conn:
+            version, current = self._ensure_deck(conn, user_id)
+            if base_version != version:
+                raise VersionConflict(version)
+            new_slides, changed = apply_changes([slide for _, _, slide in current], changes)
+            if not changed:
+                return version
+            positions = {slide_id: position for slide_id, position, _ in current}
+            new_positions = self._place(positions, [slide["id"] for slide in new_slides])
+            changed_ids = set(changed) | {slide_id for slide_id, position in new_positions.items() if positions.get(slide_id) != position}
+            upserts = [(slide, new_positions[slide["id"]]) for slide in new_slides if slide["id"] in changed_ids]
+            deletes = [slide_id for slide_id in positions if slide_id not in new_positions]
+            return self._write_deck(conn, user_id, version + 1, upserts, deletes)
+
+    def purge_tombstones(self, retention: float) -> int:
+        cutoff = time.time() - retention
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE decks SET history_from = MAX(history_from, (SELECT MAX(version) FROM slides "
+                "WHERE slides.user_id = decks.user_id AND deleted = 1 AND deleted_at <= ?)) "
+                "WHERE user_id IN (SELECT user_id FROM slides WHERE deleted = 1 AND deleted_at <= ?)",
+                (cutoff, cutoff),
+            )
+            return conn.execute("DELETE FROM slides WHERE deleted = 1 AND deleted_at <= ?", (cutoff,)).rowcount
+
+    @staticmethod
+    def _place(positions: Dict[str, float], order: List[str]) -> Dict[str, float]:
+        """
+        Keeps the positions of existing slides and gives inserted slides a position between their neighbours,
+        so an insert only writes the new row. Falls back to renumbering when the gap runs out of precision.
+        """
+        placed: Dict[str, float] = {}
+        previous = None
+        for index, slide_id in enumerate(order):
+            position = positions.get(slide_id)
+            if position is None:
+                following = next((positions[other] for other in order[index + 1:] if other in positions), None)
+                if previous is not None and following is not None:
+                    position = (previous + following) / 2
+                elif previous is not None:
+                    position = previous + 1
+                elif following is not None:
+                    position = following - 1
+                else:
+                    position = 0.0
+                if position == previous or position == following:
+                    return {other: float(i) for i, other in enumerate(order)}
+            placed[slide_id] = position
+            previous = position
+        return placed
+
+    def _write_deck(self, conn: sqlite3.Connection, user_id: str, version: int,
+                    upserts: List[Tuple[Slide, float]], deletes: List[str]) -> int:
+        conn.executemany(
+            "INSERT INTO slides (user_id, slide_id, position, data, version, deleted) VALUES (?, ?, ?, ?, ?, 0) "
+            "ON CONFLICT(user_id, slide_id) DO UPDATE SET position = excluded.position, data = excluded.data, "
+            "version = excluded.version, deleted = 0, deleted_at = NULL",
+            [(user_id, slide["id"], position, json.dumps(slide), version) for slide, position in upserts],
+        )
+        conn.executemany(
+            "UPDATE slides SET deleted = 1, deleted_at = ?, version = ? WHERE user_id = ? AND slide_id = ?",
+            [(time.time(), version, user_id, slide_id) for slide_id in deletes],
+        )
+        conn.execute("UPDATE decks SET version = ? WHERE user_id = ?", (version, user_id))
+        return version
+
+    def _legacy_slides(self, conn: sqlite3.Connection, user_id: str) -> List[Slide]:
+        # Slides saved before decks were versioned live in the user's data.
+        row = conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]).get("slides", []) if row else []
+
+    def _ensure_deck(self, conn: sqlite3.Connection, user_id: str) -> Tuple[int, List[Tuple[str, float, Slide]]]:
+        """
+        Returns (version, [(slide_id, position, slide)]) in deck order, first moving any legacy slides
+        out of the user's data into the slides table. Must run inside a write transaction.
+        """
+        deck = conn.execute("SELECT version FROM decks WHERE user_id = ?", (user_id,)).fetchone()
+        if deck is None:
+            legacy = assign_slide_ids(self._legacy_slides(conn, user_id), [])
+            conn.execute("INSERT INTO decks (user_id, version) VALUES (?, 0)", (user_id,))
+            if legacy:
+                self._write_deck(conn, user_id, 1, [(slide, float(i)) for i, slide in enumerate(legacy)], [])
+                row = conn.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+                self.put(user_id, {key: value for key, value in json.loads(row[0]).items() if key != "slides"})
+            return (1 if legacy else 0), [(slide["id"], float(i), slide) for i, slide in enumerate(legacy)]
+        rows = conn.execute(
+            "SELECT slide_id, position, data FROM slides WHERE user_id = ? AND deleted = 0 ORDER BY position", (user_id,)
+        ).fetchall()
+        return deck[0], [(slide_id, position, json.loads(data)) for slide_id, position, data in rows]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class JSONFileUserStore(UserStore):
+    """
+    The original single JSON file, kept for small single-worker setups. Writes go to a temp file
+    that is fsynced and atomically renamed over the old one, so a crash never leaves a half-written file.
+    Updates are serialized within one process only.
+    """
+
+    def __init__(self, path: str = "user_data.json"):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read_all(self) -> Dict[str, UserData]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _write_all(self, data: Dict[str, UserData]):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".user_data.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, user_id: str) -> UserData:
+        with self._lock:
+            return self._read_all().get(user_id, {})
+
+    def put(self, user_id: str, user_data: UserData):
+        self.update(user_id, lambda _: user_data)
+
+    def update(self, user_id: str, fn: Callable[[UserData], UserData]) -> UserData:
+        with self._lock:
+            data = self._read_all()
+            data[user_id] = fn(data.get(user_id, {}))
+            self._write_all(data)
+            return data[user_id]
+
+    def import_users(self, users: Dict[str, UserData]) -> int:
+        with self._lock:
+            data = self._read_all()
+            new_users = {user_id: user_data for user_id, user_data in users.items() if user_id not in data}
+            data.update(new_users)
+            self._write_all(data)
+            return len(new_users)
+
+
+# Available backends - selected with the USER_STORE environment variable.
+STORE_BACKENDS: Dict[str, Callable[[str], UserStore]] = {
+    "sqlite": SQLiteUserStore,
+    "json": JSONFileUserStore,
+}
+
+
+def create_store(backend: str = "sqlite", path: Optional[str] = None) -> UserStore:
+    if backend not in STORE_BACKENDS:
+        raise ValueError(f"Unknown user store backend '{backend}'. Must be one of: {', '.join(STORE_BACKENDS)}")
+    return STORE_BACKENDS[backend](path) if path else STORE_BACKENDS[backend]()
+
+
+def migrate_json_file(json_path: str, store: UserStore) -> int:
+    """
+    One-shot migration of the legacy user_data.json into `store`. Users already in the store are kept as they are,
+    and the file is renamed to '<name>.migrated' so the migration does not run again. Returns the number of users imported.
+    """
+    if isinstance(store, JSONFileUserStore) and os.path.abspath(store.path) == os.path.abspath(json_path):
+        return 0  # The JSON file is the store itself.
+    if not os.path.exists(json_path):
+        return 0
+    with open(json_path, "r") as f:
+        users = json.load(f)
+    imported = store.import_users(users)
+    try:
+        os.replace(json_path, json_path + ".migrated")
+    except FileNotFoundError:
+        pass  # Another worker finished the migration first.
+    return imported
+
+
+if __name__ == "__main__":
+    # Manual migration: python storage.py [user_data.json] [user_data.db]
+    import sys
+    json_path = sys.argv[1] if len(sys.argv) > 1 else "user_data.json"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "user_data.db"
+    count = migrate_json_file(json_path, SQLiteUserStore(db_path))
+    print(f"Imported {count} users from {json_path} into {db_path}")
@@ -0,0 +1,312 @@
+'''
+Structured (JSON-schema) model output for the Pitch Deck Generator backend.
+
+Slides, analyses and visual data are requested as JSON that follows a schema. Models that support
+structured outputs receive the schema as `response_format`. Other models get it as a prompt instruction
+(see llm.structured_request). Answers are read by JSONStreamParser in one pass: it can run over a stream
+and hand back each array item (e.g. each slide) once that item is complete. If the output is cut off
+(max_tokens, a dropped stream), the parser repairs it by closing the open string and containers and
+dropping any half-written key or literal, so a truncated answer is still usable without a second call.
+'''
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, ValidationError
+
+import metrics
+
+output_repairs = metrics.REGISTRY.counter("llm_output_repairs_total", "Truncated JSON answers repaired instead of regenerated.", ("schema",))
+
+_WHITESPACE = " \t\r\n"
+_SCALAR_END = _WHITESPACE + ",]}"
+_PARTIAL_UNICODE_ESCAPE = re.compile(r'(\\+)u[0-9a-fA-F]{0,3}$')
+
+
+def _closers(stack: List[str]) -> str:
+    return "".join("}" if opener == "{" else "]" for opener in reversed(stack))
+
+
+class JSONStreamParser:
+    """
+    Single-pass, incremental JSON parser for model output.
+
+    feed() scans only the new text and returns the items completed by it: values that sit directly in an
+    array at nesting depth `item_depth` (2 for the items of {"slides": [...]}). finish() returns the whole
+    value, repaired if the text ended early. Text before the first '{' or '[' (e.g. a ```json fence) and
+    after the end of the value is ignored.
+    """
+
+    def __init__(self, item_depth: Optional[int] = None):
+        self.item_depth = item_depth
+        self.text = ""
+        self.repaired = False
+        self._pos = 0
+        self._stack: List[str] = []  # Open containers, '{' or '['.
+        self._state: List[str] = []  # Per container: 'key', 'colon', 'value' or 'comma'.
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+        self._scalar_start: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._start: Optional[int] = None  # Start of the top-level value.
+        self._end: Optional[int] = None  # End of the top-level value, once complete.
+        self._safe_end = 0  # Last position where the text can be cut and closed with _safe_closers.
+        self._safe_closers = ""
+
+    def feed(self, chunk: str) -> List[Any]:
+        self.text += chunk
+        text, items = self.text, []
+        i, n = self._pos, len(self.text)
+        while i < n and self._end is None:
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._state[-1] = "colon"
+                    else:
+                        self._value_end(i + 1, items)
+                i += 1
+                continue
+            if self._scalar_start is not None:
+                if c not in _SCALAR_END:
+                    i += 1
+                    continue
+                self._value_end(i, items)  # The delimiter is handled below.
+                if self._end is not None:
+                    break
+            if c in _WHITESPACE:
+                pass
+            elif self._start is None and c not in "{[":
+                pass  # Prose or a code fence before the JSON.
+            elif c in "{[":
+                self._value_start(i)
+                self._stack.append(c)
+                self._state.append("key" if c == "{" else "value")
+                self._mark_safe(i + 1)
+            elif c in "}]":
+                if self._stack:
+                    self._stack.pop()
+                    self._state.pop()
+                self._value_end(i + 1, items)
+            elif c == '"':
+                self._in_string = True
+                self._string_is_key = bool(self._stack) and self._stack[-1] == "{" and self._state[-1] == "key"
+                if not self._string_is_key:
+                    self._value_start(i)
+            elif c == ":" and self._stack:
+                self._state[-1] = "value"
+            elif c == "," and self._stack:
+                self._state[-1] = "key" if self._stack[-1] == "{" else "value"
+            else:
+                self._value_start(i)
+                self._scalar_start = i
+            i += 1
+        self._pos = i
+        return items
+
+    def _value_start(self, index: int):
+        if self._start is None:
+            self._start = index
+        if self.item_depth is not None and len(self._stack) == self.item_depth and self._stack[-1] == "[":
+            self._item_start = index
+
+    def _value_end(self, end: int, items: List[Any]):
+        self._scalar_start = None
+        if self._item_start is not None and len(self._stack) == self.item_depth:
+            try:
+                items.append(json.loads(self.text[self._item_start:end]))
+            except ValueError:
+                pass  # Malformed item - left to finish() and the caller's validation.
+            self._item_start = None
+        if not self._stack:
+            self._end = end
+            return
+        self._state[-1] = "comma"
+        self._mark_safe(end)
+
+    def _mark_safe(self, end: int):
+        self._safe_end = end
+        self._safe_closers = _closers(self._stack)
+
+    def finish(self) -> Any:
+        """
+        The parsed value. Raises ValueError if the text holds no JSON value, or one that cannot be repaired.
+        """
+        if self._start is None:
+            raise ValueError("No JSON value in the model output")
+        if self._end is not None:
+            return json.loads(self.text[self._start:self._end])
+        self.repaired = True
+        text = self.text
+        if self._in_string and not self._string_is_key:
+            # Keep the partial string value, minus a dangling escape sequence.
+            if self._escape:
+                text = text[:-1]
+            else:
+                match = _PARTIAL_UNICODE_ESCAPE.search(text)
+                if match and len(match.group(1)) % 2:
+                    text = text[:match.end(1) - 1]
+            return json.loads(text[self._start:] + '"' + _closers(self._stack))
+        if self._scalar_start is not None:
+            try:
+                json.loads(text[self._scalar_start:])
+                return json.loads(text[self._start:] + _closers(self._stack))
+            except ValueError:
+                pass  # Half-written literal (e.g. 'tru' or '1e') - cut back to the last complete value.
+        return json.loads(text[self._start:self._safe_end] + self._safe_closers)
+
+
+def parse(text: str, schema: str, item_depth: Optional[int] = None) -> Any:
+    parser = JSONStreamParser(item_depth)
+    parser.feed(text)
+    value = parser.finish()
+    if parser.repaired:
+        output_repairs.inc(schema=schema)
+    return value
+
+
+def response_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+def _object(**properties) -> Dict[str, Any]:
+    # Strict structured outputs need every property listed as required and no additional properties.
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+Number = Union[int, float]  # Keeps whole numbers as ints in the response.
+
+_STRING = {"type": "string"}
+_NUMBER = {"type": "number"}
+
+
+# ===== SLIDES =====
+class GeneratedSlide(BaseModel):
+    title: str
+    headline: str = ""
+    bullets: List[str] = []
+
+    def line(self) -> str:
+        # One /generate-slides line per slide: "Title: headline", with the bullets on "- bullet" lines inside it.
+        # The editor files each line under the slide title it starts with, so the bullets stay on their own slide.
+        return (f"{self.title}: {self.headline}" if self.headline else self.title) + "".join(f"\n- {bullet}" for bullet in self.bullets)
+
+
+SLIDES_SCHEMA_NAME = "pitch_deck_slides"
+SLIDE_ITEM_DEPTH = 2  # {"slides": [<item>, ...]}
+
+
+def slides_schema(titles: List[str]) -> Dict[str, Any]:
+    slide = _object(title={"type": "string", "enum": titles}, headline=_STRING, bullets={"type": "array", "items": _STRING})
+    return _object(slides={"type": "array", "items": slide})
+
+
+def to_slide(item: Any) -> Optional[GeneratedSlide]:
+    # A streamed or repaired slide item, or None if it is not a usable slide (e.g. cut off before its title).
+    try:
+        return GeneratedSlide.model_validate(item)
+    except ValidationError:
+        return None
+
+
+def slide_items(value: Any) -> List[Any]:
+    if isinstance(value, dict):
+        value = value.get("slides")
+    return value if isinstance(value, list) else []
+
+
+def parse_slides(text: str) -> List[GeneratedSlide]:
+    slides = [slide for slide in map(to_slide, slide_items(parse(text, SLIDES_SCHEMA_NAME, SLIDE_ITEM_DEPTH))) if slide]
+    if not slides:
+        raise ValueError("Empty response content received from OpenAI")
+    return slides
+
+
+# ===== ANALYSIS =====
+class SlideReview(BaseModel):
+    score: Optional[float] = None
+    review: str = ""
+
+
+class DeckAnalysis(BaseModel):
+    # Defaults fill in sections lost to truncation.
+    score: float = 75.0
+    narrative_flow: str = "No narrative flow analysis provided."
+    visual_design: str = "No visual design analysis provided."
+    data_credibility: str = "No data credibility analysis provided."
+    feedback: str = "No specific feedback provided."
+
+
+SLIDE_REVIEW_FORMAT = response_format("slide_review", _object(score=_NUMBER, review=_STRING))
+DECK_ANALYSIS_FORMAT = response_format("deck_analysis", _object(
+    score=_NUMBER, narrative_flow=_STRING, visual_design=_STRING, data_credibility=_STRING, feedback=_STRING,
+))
+
+
+def parse_slide_review(text: str) -> SlideReview:
+    return SlideReview.model_validate(parse(text, "slide_review"))
+
+
+def parse_deck_analysis(text: str) -> DeckAnalysis:
+    return DeckAnalysis.model_validate(parse(text, "deck_analysis"))
+
+
+# ===== VISUAL DATA =====
+class ChartPoint(BaseModel):
+    name: str
+    value: Number
+
+
+class ScatterPoint(BaseModel):
+    x: Number
+    y: Number
+
+
+class TableData(BaseModel):
+    columns: List[str]
+    rows: List[List[str]] = []
+
+
+_POINT_SCHEMAS = {
+    "scatter": _object(points={"type": "array", "items": _object(x=_NUMBER, y=_NUMBER)}),
+    "default": _object(points={"type": "array", "items": _object(name=_STRING, value=_NUMBER)}),
+}
+_TABLE_SCHEMA = _object(columns={"type": "array", "items": _STRING}, rows={"type": "array", "items": {"type": "array", "items": _STRING}})
+
+
+def visual_data_format(visual_type: str) -> Dict[str, Any]:
+    if visual_type == "table":
+        return response_format("visual_data_table", _TABLE_SCHEMA)
+    if visual_type == "scatter":
+        return response_format("visual_data_scatter", _POINT_SCHEMAS["scatter"])
+    return response_format("visual_data_points", _POINT_SCHEMAS["default"])
+
+
+def parse_visual_data(visual_type: str, text: str) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Chart points (a list) or table data ({columns, rows}) in the shape /generate-visual-data returns.
+    Raises ValueError if the answer holds no usable data.
+    """
+    value = parse(text, visual_data_format(visual_type)["json_schema"]["name"])
+    if visual_type == "table":
+        return TableData.model_validate(value).model_dump()
+    points = value.get("points") if isinstance(value, dict) else value  # Bare lists are accepted too.
+    if not isinstance(points, list):
+        raise ValueError("Visual data is missing its points")
+    model = ScatterPoint if visual_type == "scatter" else ChartPoint
+    parsed = []
+    for point in points:
+        try:
+            parsed.append(model.model_validate(point).model_dump())
+        except ValidationError:
+            continue  # A point cut off by truncation.
+    if not parsed:
+        raise ValueError("Visual data has no complete points")
+    return parsed
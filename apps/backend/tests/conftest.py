@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# The backend is a flat set of modules - make them importable, and keep main.py's stores out of the source tree.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_TMP = tempfile.mkdtemp(prefix="pitchdeck-tests-")
+os.environ.setdefault("USER_STORE_PATH", os.path.join(_TMP, "user_data.db"))
+os.environ.setdefault("DECK_CONTEXT_DB_PATH", os.path.join(_TMP, "deck_contexts.db"))
+os.environ.setdefault("EXPORT_DIR", os.path.join(_TMP, "exports"))
+os.environ.setdefault("ENV_FILE", os.path.join(_TMP, ".env"))  # Ignore a developer's .env.
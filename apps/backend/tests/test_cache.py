@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+
+from cache import DiskCache, ResponseCache, SingleFlight, make_cache_key
+
+
+def test_keys_ignore_whitespace_and_case():
+    assert make_cache_key("slides", "An  AI\nDeck", 3) == make_cache_key("slides", "an ai deck", 3)
+    assert make_cache_key("slides", "a") != make_cache_key("visual", "a")
+
+
+def test_response_cache_hits_expires_and_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2, ttl=60)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # Now "b" is the least recently used.
+    cache.set("c", {"v": 3})
+    assert "b" not in cache and cache.get("b") is None
+    cache.set("short", {"v": 4}, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["expirations"]) == (1, 2, 2, 1)
+
+
+def test_response_cache_sweep_removes_expired_entries_and_skips_oversized_values():
+    cache = ResponseCache(max_bytes=100, ttl=0)
+    cache.set("a", "x")
+    cache.set("big", "x" * 200)
+    assert cache.sweep() == 1 and len(cache) == 0 and cache.stats()["bytes"] == 0
+
+
+def test_disk_cache_reads_pending_writes_and_persists_them(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = DiskCache(path, ttl=60)
+    cache.put("a", {"v": 1})
+    cache.put("old", {"v": 2}, ttl=0)
+    assert cache.get("a") == {"v": 1}  # Served from the write-behind queue before the flush.
+    cache.flush()
+    other = DiskCache(path)  # Another worker on the same node.
+    assert other.get("a") == {"v": 1} and other.get("old") is None
+    assert cache.compact() == 1 and other.stats()["entries"] == 1
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"v": len(calls)}
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert results == [{"v": 1}] * 5 and len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4, "abandoned": 0}
+
+
+def test_errors_are_shared_by_every_caller():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    async def scenario():
+        flight = SingleFlight()
+        return await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+
+    assert [str(error) for error in asyncio.run(scenario())] == ["upstream down"] * 2
+
+
+@pytest.mark.parametrize("cancelled", ["leader", "follower"])
+def test_cancelled_caller_leaves_the_work_to_the_others(cancelled):
+    async def scenario():
+        flight = SingleFlight()
+        leader = asyncio.ensure_future(flight.do("k", lambda: asyncio.sleep(0.02, result="done")))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", lambda: asyncio.sleep(0.02, result="other")))
+        await asyncio.sleep(0)
+        (leader if cancelled == "leader" else follower).cancel()
+        survivor = follower if cancelled == "leader" else leader
+        return await survivor, flight.stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == "done" and stats["abandoned"] == 0
+
+
+def test_work_is_cancelled_when_every_caller_gives_up():
+    started = []
+
+    async def slow():
+        started.append(1)
+        await asyncio.sleep(10)
+
+    async def scenario():
+        flight = SingleFlight()
+        callers = [asyncio.ensure_future(flight.do("k", slow)) for _ in range(3)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert not flight.in_flight("k")
+        await flight.do("k", lambda: asyncio.sleep(0))  # The key is free for a fresh call.
+        return flight.stats()
+
+    stats = asyncio.run(scenario())
+    assert started == [1] and stats["abandoned"] == 1 and stats["leaders"] == 2
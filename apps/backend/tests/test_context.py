@@ -0,0 +1,54 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from context import ContextStore, SQLiteContextTier
+
+SLIDES = [{"title": "The Problem", "content": "Decks take weeks"}, {"title": "Traction", "content": "1,200 decks"}]
+
+
+def test_context_stored_by_one_worker_resolves_on_another(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "contexts.db")
+        first, second = ContextStore(shared=SQLiteContextTier(path)), ContextStore(shared=SQLiteContextTier(path))
+        stored = await first.put("deck-1", "Decks take weeks", "An AI deck writer", SLIDES)
+        loaded = await second.get("deck-1")
+        assert loaded.prompt() == stored.prompt()
+        updated = await second.update_slides("deck-1", {"Traction": "2,000 decks"})
+        assert updated.version == 2
+        assert (await first.get("deck-1")).slide_content("Traction") == "2,000 decks"
+        assert await first.update_slides("unknown", {"Traction": "x"}) is None
+
+    asyncio.run(scenario())
+
+
+def test_expired_shared_context_is_unknown_and_swept(tmp_path):
+    async def scenario():
+        store = ContextStore(ttl=0, shared=SQLiteContextTier(str(tmp_path / "contexts.db")), sweep_interval=0)
+        await store.put("deck-1", "p", "s", SLIDES)
+        assert await store.get("deck-1") is None
+        await store.put("deck-2", "p", "s", SLIDES)  # Sweeps deck-1 (and deck-2, already past its TTL of 0).
+        return store.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["misses"] == 1 and stats["expirations"] >= 1
+
+
+def test_unknown_context_falls_back_to_the_fields_sent():
+    request = main.SlideContentRequest(problem="p", solution="s", slide_title="Traction", contextId="gone")
+    resolved, deck_context = asyncio.run(main.resolve_slide_request(request, "generate-slide-content"))
+    assert resolved is request and deck_context.problem == "p"
+
+
+def test_patch_slides_refreshes_the_deck_context():
+    with TestClient(main.create_app()) as client:
+        client.post("/deck-context", json={"contextId": "patch-ctx", "problem": "p", "solution": "s", "slides": SLIDES})
+        saved = client.post("/save-slides", json={"userId": "patch-user", "slides": SLIDES, "contextId": "patch-ctx"}).json()
+        response = client.post("/patch-slides", json={
+            "userId": "patch-user", "baseVersion": saved["version"], "contextId": "patch-ctx",
+            "changes": [{"op": "update", "id": saved["ids"][1], "slide": {"content": "2,000 decks"}}],
+        })
+        assert response.status_code == 200
+        slides = client.get("/deck-context/patch-ctx").json()["slides"]
+        assert {"title": "Traction", "content": "2,000 decks"} in slides
@@ -0,0 +1,100 @@
+import asyncio
+import re
+import zlib
+from typing import Dict
+
+from fastapi.testclient import TestClient
+
+import exports
+import main
+
+SLIDES = [
+    {"title": "The “Problem” – naïve Ωmega", "content": "Founders’ decks take weeks (and \\ effort)\n中文 and 😀 survive as text"},
+    {"title": "Traction", "content": "\n".join(f"Line {n}: 1,200 decks generated €" for n in range(80))},
+]
+
+
+def objects(pdf: bytes) -> Dict[int, bytes]:
+    # Object number -> body, located through the xref table (so the offsets are checked too).
+    xref_at = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", pdf).group(1))
+    assert pdf[xref_at:].startswith(b"xref\n")
+    size = int(re.match(rb"xref\n0 (\d+)\n", pdf[xref_at:]).group(1))
+    entries = re.findall(rb"(\d{10}) 00000 n \n", pdf[xref_at:])
+    assert len(entries) == size - 1
+    bodies = {}
+    for number, offset in enumerate((int(entry) for entry in entries), 1):
+        header = b"%d 0 obj\n" % number
+        assert pdf[offset:offset + len(header)] == header
+        bodies[number] = pdf[offset + len(header):pdf.index(b"\nendobj\n", offset)]
+    return bodies
+
+
+def stream(body: bytes) -> bytes:
+    length = int(re.search(rb"/Length (\d+)", body).group(1))
+    start = body.index(b"stream\n") + len(b"stream\n")
+    return zlib.decompress(body[start:start + length])
+
+
+def page_text(pdf: bytes) -> str:
+    # Maps the CIDs drawn on every page back to characters through each font's ToUnicode CMap.
+    bodies = objects(pdf)
+    cmaps = {}
+    for name, font_id in re.findall(rb"/(F\d) (\d+) 0 R", bodies[int(re.search(rb"/Kids \[(\d+)", pdf).group(1))]):
+        cmap = stream(bodies[int(re.search(rb"/ToUnicode (\d+) 0 R", bodies[int(font_id)]).group(1))])
+        cmaps[name.decode()] = {int(cid, 16): bytes.fromhex(text.decode()).decode("utf-16-be")
+                       for cid, text in re.findall(rb"<([0-9A-F]{4})> <([0-9A-F]+)>", cmap)}
+    text = []
+    for body in bodies.values():
+        if b"/Type /Page " in body:
+            content = stream(bodies[int(re.search(rb"/Contents (\d+) 0 R", body).group(1))])
+            for font, strings in re.findall(rb"/(F\d) \d+ Tf(.*?)ET", content, re.S):
+                for hex_string in re.findall(rb"<([0-9A-F]*)> Tj", strings):
+                    text.append("".join(cmaps[font.decode()][int(hex_string[i:i + 4], 16)] for i in range(0, len(hex_string), 4)))
+    return "\n".join(text)
+
+
+def test_pdf_xref_page_count_and_unicode_text():
+    pdf = b"".join(exports.iter_pdf(SLIDES))
+    bodies = objects(pdf)
+    pages = [body for body in bodies.values() if b"/Type /Page " in body]
+    assert len(pages) == 3  # The 80-line slide flows onto two more pages.
+    assert b"/Count 3" in bodies[2]
+    text = page_text(pdf)
+    for expected in ("The “Problem” – naïve Ωmega", "Founders’ decks take weeks (and \\ effort)", "中文 and 😀", "Line 79: 1,200 decks generated €"):
+        assert expected in text
+    assert b"/FontFile2" in pdf and b"/Identity-H" in pdf
+
+
+def test_rendered_artifact_matches_the_streamed_pdf(tmp_path):
+    path = str(tmp_path / "deck.pdf")
+    exports.render_pdf(SLIDES, path)
+    with open(path, "rb") as f:
+        assert f.read() == b"".join(exports.iter_pdf(SLIDES))
+
+
+def test_empty_deck_is_a_valid_one_page_pdf():
+    pdf = b"".join(exports.iter_pdf([]))
+    assert b"/Count 1" in objects(pdf)[2]
+
+
+def test_streamed_pdf_is_not_compressed_again():
+    with TestClient(main.create_app()) as client:
+        response = client.post("/export-pdf?stream=true", json={"slides": SLIDES}, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert "中文" in page_text(response.content)
+
+
+def test_resubmitting_a_cached_export_reuses_its_job(tmp_path):
+    async def scenario():
+        manager = exports.ExportManager(str(tmp_path))
+        exports.render_pdf(SLIDES, manager.artifact_path("pdf", exports.artifact_key("pdf", SLIDES)))
+        first = manager.submit("pdf", SLIDES)
+        assert all(manager.submit("pdf", SLIDES) is first for _ in range(3))
+        assert first.status == "done" and first.cached
+        manager.job_ttl = 0
+        assert manager.submit("pdf", SLIDES) is not first  # The expired record is replaced, not kept alongside.
+        return manager.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["jobs"] == 1 and stats["cache_hits"] == 5 and stats["renders"] == 0
@@ -0,0 +1,34 @@
+import asyncio
+
+import main
+from cache import SingleFlight
+from prefetch import PrefetchJob, Prefetcher
+
+
+def job(key: str) -> PrefetchJob:
+    return PrefetchJob(endpoint="generate-design-suggestions", slide="Traction", content="", cache_key=key, cost=0.001,
+                       run=lambda: asyncio.sleep(10))
+
+
+def test_anonymous_requests_have_no_prefetch_owner():
+    assert main.prefetch_owner("demo", None) is None
+    assert main.prefetch_owner("demo", "deck-1") == "context:deck-1"
+    assert main.prefetch_owner("alice", None) == "user:alice"
+
+
+def test_owners_keep_their_own_jobs_and_stale_spending_is_pruned():
+    async def scenario():
+        prefetcher = Prefetcher(SingleFlight(), is_cached=lambda key: False, budget_window=0.05)
+        prefetcher.submit("context:a", [job("a")])
+        prefetcher.submit("context:b", [job("b")])  # Does not cancel context:a's job.
+        await asyncio.sleep(0.01)
+        assert prefetcher.pending("context:a") and prefetcher.pending("context:b")
+        assert prefetcher.stats()["owners"] == 2
+        prefetcher.cancel("context:a")
+        prefetcher.cancel("context:b")
+        await asyncio.sleep(0.06)  # Both owners' spending leaves the window.
+        prefetcher.submit("context:c", [])
+        return prefetcher.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["owners"] == 0 and stats["cancelled"] == 2
@@ -0,0 +1,59 @@
+import asyncio
+import time
+
+import pytest
+
+from scheduler import PRIORITY_STANDARD, UpstreamScheduler
+
+
+def test_queued_waiter_times_out_at_its_own_deadline():
+    async def scenario():
+        scheduler = UpstreamScheduler(requests_per_minute=3)
+        for _ in range(3):
+            await scheduler.acquire(1)  # Drain the request bucket - the next admission is ~20 s away.
+        head = asyncio.create_task(scheduler.acquire(1))  # No deadline: stays at the head of the queue.
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler.acquire(1, PRIORITY_STANDARD, deadline=time.monotonic() + 0.2)
+        elapsed = time.monotonic() - started
+        assert len(scheduler._queue) == 1  # The timed-out waiter left the queue; the head is still waiting.
+        head.cancel()
+        return elapsed
+
+    assert asyncio.run(scenario()) < 1.0
+
+
+def half_open_scheduler() -> UpstreamScheduler:
+    scheduler = UpstreamScheduler(failure_threshold=1, reset_timeout=0)
+    scheduler.breaker.record_failure()  # Open; with no reset timeout the next call is the half-open probe.
+    return scheduler
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    async def scenario():
+        scheduler = half_open_scheduler()
+        probe = asyncio.create_task(scheduler.call(lambda: asyncio.sleep(10), 1))
+        await asyncio.sleep(0.01)
+        assert scheduler.breaker.probing
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+        async def ok():
+            return "ok"
+        return await scheduler.call(ok, 1)
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_probe_that_times_out_waiting_is_released():
+    async def scenario():
+        scheduler = half_open_scheduler()
+        scheduler.paused_until = time.monotonic() + 10  # Rate-limit pause: the probe cannot be admitted in time.
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler.acquire(1, deadline=time.monotonic() + 0.05)
+        assert not scheduler.breaker.probing
+        assert scheduler.breaker.allow()
+
+    asyncio.run(scenario())
@@ -0,0 +1,26 @@
+import main
+import structured
+
+
+def test_generated_lines_round_trip_through_editor_grouping():
+    slides = [
+        structured.GeneratedSlide(title="The Problem", headline="Founders waste weeks on decks",
+                                  bullets=["70% rewrite their deck more than five times", "Our team interviewed 50 founders"]),
+        structured.GeneratedSlide(title="Team", headline="Operators who built this before",
+                                  bullets=["Ex-Stripe growth lead", "Solved the problem at two startups"]),
+        structured.GeneratedSlide(title="Traction", bullets=["1,200 decks generated in the beta"]),
+    ]
+    result = main.deck_result(slides)
+    assert len(result["slides"]) == len(main.STANDARD_SLIDES)  # One line per slide, back-fill included.
+
+    blocks = main.editor_slide_blocks(result["slides"])
+    assert blocks["The Problem"] == ["Founders waste weeks on decks\n- 70% rewrite their deck more than five times\n- Our team interviewed 50 founders"]
+    assert blocks["Team"] == ["Operators who built this before\n- Ex-Stripe growth lead\n- Solved the problem at two startups"]
+    assert blocks["Traction"] == ["- 1,200 decks generated in the beta"]
+    assert blocks["Funding Ask"] == []  # Back-filled titles have no content.
+
+
+def test_editor_grouping_falls_back_to_the_first_title_named():
+    blocks = main.editor_slide_blocks(["Slide 5 - Traction: 40% month-over-month growth", "Unrelated line"])
+    assert blocks["Traction"] == ["Slide 5 - Traction: 40% month-over-month growth"]
+    assert sum(len(lines) for lines in blocks.values()) == 1
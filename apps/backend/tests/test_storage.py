@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from storage import JSONFileUserStore, SQLiteUserStore, VersionConflict, create_store, migrate_json_file
+
+SLIDES = [{"title": "The Problem", "content": "Decks take weeks"}, {"title": "Traction", "content": "1,200 decks"}]
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def store(request, tmp_path):
+    store = create_store(request.param, str(tmp_path / f"users.{request.param}"))
+    yield store
+    store.close()
+
+
+def test_saves_version_only_changed_decks(store):
+    version, saved = store.save_deck("u", SLIDES)
+    assert version == 1 and all(slide["id"] for slide in saved)
+    assert store.save_deck("u", SLIDES)[0] == 1  # Same slides (ids taken by position) - no new version.
+    assert store.save_deck("u", saved)[0] == 1
+    version, _ = store.save_deck("u", [saved[0], {**saved[1], "content": "2,000 decks"}])
+    assert version == 2
+    assert store.get_deck("u") == (2, [saved[0], {**saved[1], "content": "2,000 decks"}])
+    assert store.get_deck_info("u") == (2, 2)
+
+
+def test_patch_conflicts_and_no_op_patches(store):
+    version, saved = store.save_deck("u", SLIDES)
+    version = store.patch_deck("u", version, [{"op": "update", "id": saved[0]["id"], "slide": {"content": "New"}}])
+    assert version == 2
+    with pytest.raises(VersionConflict) as conflict:
+        store.patch_deck("u", 1, [{"op": "delete", "id": saved[1]["id"]}])
+    assert conflict.value.current_version == 2
+    assert store.patch_deck("u", 2, [{"op": "update", "id": saved[0]["id"], "slide": {"content": "New"}}]) == 2
+
+
+def test_changes_since_report_upserts_deletes_and_order(store):
+    version, saved = store.save_deck("u", SLIDES)
+    version = store.patch_deck("u", version, [
+        {"op": "delete", "id": saved[0]["id"]},
+        {"op": "insert", "index": 0, "slide": {"id": "new", "title": "Team", "content": "Operators"}},
+    ])
+    changes = store.get_deck_changes("u", 1)
+    assert changes["version"] == version and changes["order"] == ["new", saved[1]["id"]]
+    assert {"op": "delete", "id": saved[0]["id"]} in changes["changes"]
+    assert {"op": "upsert", "id": "new", "slide": {"id": "new", "title": "Team", "content": "Operators"}} in changes["changes"]
+    assert store.get_deck_changes("u", version)["changes"] == []
+    assert store.get_deck_changes("u", version + 1)["full"]  # A version from the future - resync.
+
+
+def test_purged_tombstones_send_older_readers_the_full_deck(tmp_path):
+    store = SQLiteUserStore(str(tmp_path / "users.db"))
+    version, saved = store.save_deck("u", SLIDES)
+    version = store.patch_deck("u", version, [{"op": "delete", "id": saved[0]["id"]}])
+    assert store.purge_tombstones(retention=3600) == 0  # Still within the retention period.
+    assert store.purge_tombstones(retention=0) == 1
+    assert store.get_deck_changes("u", 1) == {"version": version, "slides": [saved[1]], "full": True}
+    assert store.get_deck_changes("u", version)["changes"] == []
+
+
+def test_json_file_migrates_into_sqlite_with_legacy_slides(tmp_path):
+    json_path = tmp_path / "user_data.json"
+    json_path.write_text(json.dumps({"u": {"slides": SLIDES, "legalDocsGenerated": 2}}))
+    store = SQLiteUserStore(str(tmp_path / "users.db"))
+    assert migrate_json_file(str(json_path), store) == 1
+    assert not json_path.exists() and os.path.exists(f"{json_path}.migrated")
+    assert migrate_json_file(str(json_path), store) == 0
+    assert store.get_deck("u") == (0, SLIDES)  # Legacy slides are read until the first write versions them.
+    version, saved = store.save_deck("u", SLIDES)
+    assert version == 1 and [slide["title"] for slide in saved] == ["The Problem", "Traction"]
+    assert store.get("u") == {"legalDocsGenerated": 2}  # The slides moved out of the user's data.
+
+
+def test_json_store_does_not_migrate_itself(tmp_path):
+    path = str(tmp_path / "user_data.json")
+    store = JSONFileUserStore(path)
+    store.put("u", {"slides": SLIDES})
+    assert migrate_json_file(path, store) == 0 and os.path.exists(path)
+
+
+def test_patch_endpoint_returns_409_on_conflict():
+    with TestClient(main.create_app()) as client:
+        saved = client.post("/save-slides", json={"userId": "conflict-user", "slides": SLIDES}).json()
+        change = {"op": "update", "id": saved["ids"][0], "slide": {"content": "New"}}
+        ok = client.post("/patch-slides", json={"userId": "conflict-user", "baseVersion": saved["version"], "changes": [change]})
+        stale = client.post("/patch-slides", json={"userId": "conflict-user", "baseVersion": saved["version"], "changes": [change]})
+    assert ok.status_code == 200
+    assert stale.status_code == 409 and stale.json()["detail"]["version"] == ok.json()["version"]
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import structured
+from structured import SLIDE_ITEM_DEPTH, JSONStreamParser
+
+SLIDES = {"slides": [
+    {"title": "The Problem", "headline": "Decks say \"weeks\" and C:\\decks\\ }] still", "bullets": ["naïve \u00e9 ✓", "{not: json}"]},
+    {"title": "Traction", "headline": "", "bullets": ["1,200 decks", "ARR \\\"up\\\""], "score": 12.5, "live": True, "note": None},
+]}
+ANSWER = "```json\n" + json.dumps(SLIDES, indent=1) + "\n```"
+ESCAPED_ANSWER = json.dumps(SLIDES, ensure_ascii=True)  # Non-ASCII characters as \\uXXXX escapes.
+
+
+def consistent(partial, full) -> bool:
+    # A repaired value may only lose what came after the cut: trailing keys, items and characters.
+    if isinstance(full, dict):
+        return isinstance(partial, dict) and all(key in full and consistent(value, full[key]) for key, value in partial.items())
+    if isinstance(full, list):
+        return isinstance(partial, list) and len(partial) <= len(full) and all(map(consistent, partial, full))
+    if isinstance(full, str):
+        return isinstance(partial, str) and full.startswith(partial)
+    if isinstance(full, (int, float)) and not isinstance(full, bool):
+        return str(full).startswith(str(partial))  # A number cut short reads as the digits sent so far.
+    return partial == full
+
+
+@pytest.mark.parametrize("answer", [ANSWER, ESCAPED_ANSWER])
+def test_every_prefix_is_repaired_into_a_consistent_value(answer):
+    start = answer.index("{")
+    for cut in range(len(answer) + 1):
+        parser = JSONStreamParser(SLIDE_ITEM_DEPTH)
+        parser.feed(answer[:cut])
+        if cut <= start:
+            with pytest.raises(ValueError):
+                parser.finish()
+            continue
+        value = parser.finish()
+        assert consistent(value, SLIDES), answer[:cut]
+    assert value == SLIDES and not parser.repaired
+
+
+def test_escaped_quotes_and_backslashes_stay_inside_strings():
+    parser = JSONStreamParser()
+    parser.feed(r'{"headline": "say \"hi\" to C:\\ and \\", "bullets": ["a\\\"b", "}]"]}')
+    assert parser.finish() == {"headline": 'say "hi" to C:\\ and \\', "bullets": ['a\\"b', "}]"]}
+    assert not parser.repaired
+
+
+@pytest.mark.parametrize("cut, expected", [
+    ('{"headline": "ends with \\', "ends with "),  # A dangling backslash is dropped.
+    ('{"headline": "caf\\u00', "caf"),  # So is half a \uXXXX escape.
+    ('{"headline": "C:\\\\u00', "C:\\u00"),  # But an escaped backslash before 'u' is kept.
+    ('{"headline": "say \\"hi', 'say "hi'),
+])
+def test_truncated_escapes_are_repaired(cut, expected):
+    parser = JSONStreamParser()
+    parser.feed(cut)
+    assert parser.finish() == {"headline": expected} and parser.repaired
+
+
+def test_items_stream_out_as_soon_as_they_close():
+    parser = JSONStreamParser(SLIDE_ITEM_DEPTH)
+    streamed = []
+    for i, c in enumerate(ANSWER):
+        for item in parser.feed(c):
+            streamed.append(item)
+            assert ANSWER[i] == "}"  # Emitted by the character that closes the item, not later.
+    assert streamed == SLIDES["slides"]
+    assert parser.feed("") == [] and parser.finish() == SLIDES
+
+
+def test_only_items_at_the_item_depth_are_streamed():
+    parser = JSONStreamParser(item_depth=1)
+    assert parser.feed('[{"a": [1, 2]}, "x", ') == [{"a": [1, 2]}, "x"]
+    assert parser.feed("3") == []  # A number is complete only once its delimiter arrives.
+    assert parser.feed("]") == [3]
+
+
+def test_parse_slides_keeps_complete_slides_of_a_truncated_answer():
+    cut = ANSWER.index('"Traction"') + len('"Traction", "head')
+    assert [slide.title for slide in structured.parse_slides(ANSWER[:cut])] == ["The Problem", "Traction"]
+    with pytest.raises(ValueError):
+        structured.parse_slides(ANSWER[:ANSWER.index('"title"')])
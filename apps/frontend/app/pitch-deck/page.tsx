@@ -381,16 +381,17 @@ export default function PitchDeckBuilder() {
         return acc;
       }, {} as Record<string, string[]>);
 
-      // Group content by slide type
+      // Group content by slide type - a line belongs to the slide it starts with (its bullets may mention other
+      // slides), otherwise to the first slide it names. Keep in step with editor_slide_blocks in the backend.
       data.slides.forEach((item: string) => {
-        for (const slideTitle of STANDARD_SLIDES) {
-          if (item.toLowerCase().includes(slideTitle.toLowerCase())) {
-            // Remove the slide title if it exists at the start
-            const content = item.replace(new RegExp(`^${slideTitle}:?\\s*`, 'i'), '').trim();
-            if (content) {
-              contentMap[slideTitle].push(content);
-            }
-            break;
+        const lowered = item.toLowerCase();
+        const slideTitle = STANDARD_SLIDES.find(title => lowered.startsWith(title.toLowerCase()))
+          ?? STANDARD_SLIDES.find(title => lowered.includes(title.toLowerCase()));
+        if (slideTitle) {
+          // Remove the slide title if it exists at the start
+          const content = item.replace(new RegExp(`^${slideTitle}:?\\s*`, 'i'), '').trim();
+          if (content) {
+            contentMap[slideTitle].push(content);
           }
         }
       });